@@ -7,9 +7,11 @@ from fetchdep import __version__ as fetchdep_version
 from fetchdep.engine import FetchdepEngine
 from fetchdep.exceptions import FetchdepError
 from fetchdep.opts import FetchdepEngineOptions
+from fetchdep.util.log import LOG_FLUSH_LINE
 from fetchdep.util.log import debug
 from fetchdep.util.log import err
 from fetchdep.util.log import fetchdep_log_configuration
+from fetchdep.util.log import fetchdep_log_flush_configuration
 from fetchdep.util.log import log
 from fetchdep.util.log import warn
 from fetchdep.util.win32 import enable_ansi as enable_ansi_win32
@@ -37,18 +39,24 @@ def main():
         parser.add_argument('--all-tags', action='store_true')
         parser.add_argument('--assume-no', action='store_true')
         parser.add_argument('--assume-yes', '-y', action='store_true')
+        parser.add_argument('--cache-dir')
         parser.add_argument('--config', '-C')
         parser.add_argument('--debug', action='store_true')
         parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--events-file')
         parser.add_argument('--help', '-h', action='store_true')
+        parser.add_argument('--live-output', action='store_true')
         parser.add_argument('--nocolorout', action='store_true')
         parser.add_argument('--parallel', '-p', '--jobs', '-j',
             const=0, nargs='?', type=type_nonnegativeint)
+        parser.add_argument('--progress', action='store_true')
         parser.add_argument('--recursive', '-R', action='store_true')
         parser.add_argument('--required', action='store_true')
         parser.add_argument('--skip-missing', '-s', action='store_true')
         parser.add_argument('--state', action='store_true')
         parser.add_argument('--tag', action='append')
+        parser.add_argument('--timings', action='store_true')
+        parser.add_argument('--update', '-U', action='store_true')
         parser.add_argument('--verbose', '-V', action='store_true')
         parser.add_argument('--version', '-v', action='version',
             version='%(prog)s ' + fetchdep_version)
@@ -70,6 +78,14 @@ def main():
         # prepare logging
         fetchdep_log_configuration(args.debug, args.nocolorout, args.verbose)
 
+        # prepare how logged messages are flushed (e.g. to avoid flushing
+        # each message when output is redirected into a file)
+        flush_policy = os.getenv('FETCHDEP_LOG_FLUSH', LOG_FLUSH_LINE)
+        fsync = os.getenv('FETCHDEP_LOG_FSYNC', '').lower() in ('1', 'true')
+        if not fetchdep_log_flush_configuration(flush_policy.lower(), fsync):
+            warn('ignoring invalid log flush policy: {}', flush_policy)
+            fetchdep_log_flush_configuration(LOG_FLUSH_LINE, fsync)
+
         # toggle on ansi colors by default for commands
         if not args.nocolorout:
             os.environ['CLICOLOR_FORCE'] = '1'
@@ -138,17 +154,23 @@ def usage():
  --all-tags                Include all dependencies that have a tag
  --assume-no               Automatically answer no for any question
  --assume-yes, -y          Automatically answer yes for any question
+ --cache-dir <dir>         Directory to cache content between workspaces
  --config <file>, -C       Configuration file to load
  --debug                   Show debug-related messages
  --dry-run                 Perform a dry-run of what will be fetched
+ --events-file <file>      Write JSON events of the run into a file
  --help, -h                Show this help
+ --live-output             Show output of parallel fetches as it occurs
  --nocolorout              Explicitly disable colorized output
  --parallel [<count>], -p  Enable parallel fetching
+ --progress                Show an aggregated progress display
  --recursive, -R           Allow fetching dependency's dependencies
  --required                Require a configuration to exist
  --skip-missing, -s        Continue even if a dependency cannot be fetched
  --state                   Dump the state of this tool
  --tag <value>             Tags to use
+ --timings                 Report the time spent in each phase of a run
+ --update, -U              Update existing dependencies
  --verbose, -V             Show additional messages
  --version, -v             Show the version
  --work-dir <dir>          Directory to fetch content
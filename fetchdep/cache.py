@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from contextlib import contextmanager
+from fetchdep.util.io import makedirs
+from fetchdep.util.io import path_remove
+from fetchdep.util.lock import file_lock
+from fetchdep.util.log import debug
+from fetchdep.util.log import verbose
+import hashlib
+import os
+import tempfile
+
+# suffix used for lock files associated with a cache entry
+CACHE_LOCK_SUFFIX = '.lock'
+
+
+def cache_entry_path(cache_dir, category, site):
+    """
+    return the path of a cache entry for a site
+
+    Provides the path in the cache which holds content for a given site. Each
+    category (e.g. a VCS type) has its own container in the cache directory.
+    The returned path may not exist yet.
+
+    Args:
+        cache_dir: the cache directory
+        category: the category of the entry
+        site: the site the entry is associated with
+
+    Returns:
+        the entry's path
+    """
+    key = hashlib.sha1(site.encode('utf_8')).hexdigest()  # noqa: S324
+    return os.path.join(cache_dir, category, key)
+
+
+@contextmanager
+def cache_entry_lock(entry, blocking=True):
+    """
+    lock a cache entry for the duration of a context
+
+    Provides a context-supported lock over a cache entry, ensuring only a
+    single fetchdep process manipulates the entry at a time. The container of
+    the entry will be created if it does not exist.
+
+    Args:
+        entry: the cache entry's path
+        blocking (optional): whether to wait for the lock
+
+    Yields:
+        whether the lock was acquired
+    """
+
+    if not makedirs(os.path.dirname(entry)):
+        yield False
+        return
+
+    with file_lock(entry + CACHE_LOCK_SUFFIX, blocking=blocking) as locked:
+        yield locked
+
+
+def touch_cache_entry(entry):
+    """
+    flag a cache entry as recently used
+
+    Updates the modification time of a cache entry which is used to track the
+    least recently used entries when pruning the cache.
+
+    Args:
+        entry: the cache entry's path
+    """
+
+    try:
+        os.utime(entry, None)
+    except OSError:
+        pass
+
+
+def populate_cache_entry(entry, builder):
+    """
+    populate a new cache entry
+
+    Builds a new cache entry using the provided ``builder`` callable. The
+    builder is invoked with an interim path (which does not exist yet) that
+    it is expected to populate. On success, the interim path is moved into
+    the cache entry's location, ensuring that an interrupted build never
+    leaves a partial entry in the cache. A caller is expected to hold the
+    entry's lock.
+
+    Args:
+        entry: the cache entry's path
+        builder: the callable used to populate the entry
+
+    Returns:
+        whether the entry was populated
+    """
+
+    container_dir = os.path.dirname(entry)
+    if not makedirs(container_dir):
+        return False
+
+    interim_dir = tempfile.mkdtemp(prefix='.tmp-', dir=container_dir)
+    try:
+        interim_entry = os.path.join(interim_dir, 'entry')
+        if not builder(interim_entry):
+            return False
+
+        os.rename(interim_entry, entry)
+    finally:
+        path_remove(interim_dir)
+
+    return True
+
+
+def prune_cache(cache_dir, max_size):
+    """
+    prune a cache directory to a maximum size
+
+    Removes the least recently used entries in a cache directory until the
+    total size of the cache no longer exceeds ``max_size``. Entries which are
+    actively locked by another process are left untouched.
+
+    Args:
+        cache_dir: the cache directory
+        max_size: the maximum size (in bytes) of the cache
+
+    Returns:
+        the number of entries removed
+    """
+
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    total = 0
+    for category in sorted(os.listdir(cache_dir)):
+        category_dir = os.path.join(cache_dir, category)
+        if not os.path.isdir(category_dir):
+            continue
+
+        for name in os.listdir(category_dir):
+            # ignore lock files and any temporary content
+            if name.startswith('.') or name.endswith(CACHE_LOCK_SUFFIX):
+                continue
+
+            entry = os.path.join(category_dir, name)
+            if not os.path.isdir(entry):
+                continue
+
+            size = _path_size(entry)
+            entries.append((os.path.getmtime(entry), size, entry))
+            total += size
+
+    debug('cache size: {} (max: {})', total, max_size)
+
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= max_size:
+            break
+
+        with cache_entry_lock(entry, blocking=False) as locked:
+            if not locked:
+                debug('cache entry is in use: {}', entry)
+                continue
+
+            verbose('pruning cache entry: {}', entry)
+            if path_remove(entry):
+                total -= size
+                removed += 1
+
+    return removed
+
+
+def _path_size(path):
+    """
+    calculate the size used by a path
+
+    Args:
+        path: the path
+
+    Returns:
+        the size (in bytes)
+    """
+
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                size += os.lstat(os.path.join(root, f)).st_size
+            except OSError:  # noqa: PERF203
+                pass
+
+    return size
@@ -3,6 +3,7 @@
 # Copyright fetchdep
 
 from fetchdep.defs import CONFIG_BASE_KEY
+from fetchdep.defs import CONFIG_EXT_KEYS
 from fetchdep.defs import CONFIG_NAME_KEY
 from fetchdep.defs import CONFIG_RECURSIVE_KEY
 from fetchdep.defs import CONFIG_SITE_KEY
@@ -56,16 +57,8 @@ class Config:
         try:
             verbose('attempting to load configuration file: {}', path)
             with open(path, encoding='utf_8') as f:
-                try:
-                    raw_config = yaml.safe_load(f)
-                    if CONFIG_BASE_KEY in raw_config:
-                        self.config = raw_config[CONFIG_BASE_KEY]
-                        return True
-
-                    err('invalid fetchdep configuration: {}', path)
-                except yaml.YAMLError as e:
-                    err('unable to load configuration file: {}', path)
-                    err(e)
+                if self._parse(f):
+                    return True
         except FileNotFoundError:
             if expected:
                 err('configuration file does not exist: {}', path)
@@ -75,6 +68,52 @@ class Config:
 
         return not expected
 
+    def loads(self, content, path):
+        """
+        load configuration information from provided content
+
+        This call will parse YAML configuration content and populate various
+        configuration options. This can be used to process a configuration
+        which has not been written to the local filesystem (e.g. acquired
+        from a remote site).
+
+        Args:
+            content: the configuration content
+            path: the path associated with the configuration
+
+        Returns:
+            whether the content was loaded
+        """
+
+        self.path = path
+
+        verbose('attempting to load configuration content: {}', path)
+        return self._parse(content)
+
+    def _parse(self, stream):
+        """
+        parse configuration information from a stream
+
+        Args:
+            stream: the stream (or string) to parse
+
+        Returns:
+            whether the configuration was parsed
+        """
+
+        try:
+            raw_config = yaml.safe_load(stream)
+            if isinstance(raw_config, dict) and CONFIG_BASE_KEY in raw_config:
+                self.config = raw_config[CONFIG_BASE_KEY]
+                return True
+
+            err('invalid fetchdep configuration: {}', self.path)
+        except yaml.YAMLError as e:
+            err('unable to load configuration file: {}', self.path)
+            err(e)
+
+        return False
+
     def extract(self):
         deps = []
 
@@ -99,8 +138,13 @@ class Config:
                     tag = resolve_tag(raw_tag)
                     tags.add(tag)
 
+            ext = {}
+            for key in CONFIG_EXT_KEYS:
+                if key in entry:
+                    ext[key] = entry[key]
+
             dep = build_dependency(self.path, name, site,
-                tags=tags, recursive=recursive)
+                tags=tags, recursive=recursive, ext=ext)
             deps.append(dep)
 
         return deps
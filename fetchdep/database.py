@@ -3,6 +3,9 @@
 # Copyright fetchdep
 
 from collections import OrderedDict
+from fetchdep.defs import SiteVcsType
+from fetchdep.dependency import dependency_site_key
+from fetchdep.dependency import dependency_upstream_key
 
 
 class ConfigDatabase:
@@ -16,11 +19,15 @@ class ConfigDatabase:
         Attributes:
             db: the raw database
             deps: detected dependencies
+            sites: mapping of site keys to the first project using a site
             tags: detected tags
+            upstreams: mapping of upstream keys to the site keys using them
         """
         self.db = OrderedDict()
         self.deps = set()
+        self.sites = {}
         self.tags = set()
+        self.upstreams = {}
 
     def entries(self):
         """
@@ -58,6 +65,48 @@ class ConfigDatabase:
         """
         return self.db.get(name)
 
+    def primary(self, name):
+        """
+        return the primary project of a duplicate project
+
+        When multiple projects fetch the same site, the first registered
+        project is considered the primary project, where the remaining
+        projects are considered duplicates.
+
+        Args:
+            name: the project name
+
+        Returns:
+            the primary project's name; ``None`` if the project is not a
+            duplicate
+        """
+        dependency = self.db.get(name)
+        if not dependency:
+            return None
+
+        primary = self.sites.get(dependency_site_key(dependency))
+        return primary if primary != name else None
+
+    def shares_upstream(self, name):
+        """
+        return whether a project shares its upstream with other projects
+
+        Projects which fetch different content (e.g. different branches) from
+        the same git upstream can share a single repository.
+
+        Args:
+            name: the project name
+
+        Returns:
+            whether the project shares its upstream
+        """
+        dependency = self.db.get(name)
+        if not dependency or dependency.vcs != SiteVcsType.GIT:
+            return False
+
+        site_keys = self.upstreams.get(dependency_upstream_key(dependency))
+        return len(site_keys) > 1
+
     def store(self, name, dependency):
         """
         track a dependency entry for a project
@@ -68,6 +117,11 @@ class ConfigDatabase:
         """
         self.db[name] = dependency
 
+        site_key = dependency_site_key(dependency)
+        self.sites.setdefault(site_key, name)
+        self.upstreams.setdefault(dependency_upstream_key(dependency),
+            set()).add(site_key)
+
     def track_dependency(self, dependency):
         """
         track a known dependency
@@ -8,21 +8,66 @@ from fetchdep.util.enum import Enum
 # configuration key for the base yaml dictionary expected
 CONFIG_BASE_KEY = 'fetchdep'
 
+# configuration key for a branch of a dependency to fetch
+CONFIG_BRANCH_KEY = 'branch'
+
+# configuration key for exporting a dependency (no vcs metadata)
+CONFIG_EXPORT_KEY = 'export'
+
+# configuration key for allowing hardlinks when populating a local path
+CONFIG_HARDLINK_KEY = 'hardlink'
+
 # configuration key for a dependency's name
 CONFIG_NAME_KEY = 'name'
 
+# configuration key for paths to sparsely checkout from a dependency
+CONFIG_PATHS_KEY = 'paths'
+
+# configuration key for a revision (e.g. commit) of a dependency to fetch
+CONFIG_REVISION_KEY = 'revision'
+
 # configuration key for recursive flag associated to a dependency
 CONFIG_RECURSIVE_KEY = 'recursive'
 
+# configuration key for fetching submodules of a dependency
+CONFIG_SUBMODULES_KEY = 'submodules'
+
+# configuration key for a tag of a dependency to fetch
+CONFIG_TAG_KEY = 'tag'
+
 # configuration key for tags associated to a dependency
 CONFIG_TAGS_KEY = 'tags'
 
+# configuration key for the sha256 checksum of an archive dependency
+CONFIG_SHA256_KEY = 'sha256'
+
 # configuration key for the site value of a dependency
 CONFIG_SITE_KEY = 'site'
 
+# configuration keys passed through to a dependency's fetch-type handler
+CONFIG_EXT_KEYS = [
+    CONFIG_BRANCH_KEY,
+    CONFIG_EXPORT_KEY,
+    CONFIG_HARDLINK_KEY,
+    CONFIG_PATHS_KEY,
+    CONFIG_REVISION_KEY,
+    CONFIG_SHA256_KEY,
+    CONFIG_SUBMODULES_KEY,
+    CONFIG_TAG_KEY,
+]
+
+# default maximum size (in bytes) of a cache directory before pruning
+DEFAULT_CACHE_MAX_SIZE = 10 * 1024 * 1024 * 1024
+
+# submodules option value to fetch submodules with a history depth of one
+GIT_SUBMODULES_SHALLOW = 'shallow'
+
 # number of requests that can be processed before asking a user to continue
 MAX_REQUEST_BEFORE_CONFIRM = 25
 
+# directory (in a working directory) holding repositories shared by worktrees
+WORKTREES_DIR_NAME = '.fetchdep-worktrees'
+
 # list of support configuration names
 SUPPORTED_CONFIG_NAMES = [
     '.fetchdep',
@@ -39,14 +84,35 @@ class SiteVcsType(Enum):
     processing is used when acquiring resources.
 
     Attributes:
+        ARCHIVE: archive (tarball/zip)
         CVS: concurrent versions system
         GIT: git
         HG: mercurial
         MKDIR: mkdir (for testing; undocumented)
+        PATH: local path
         SVN: subversion
     """
+    ARCHIVE = 'archive'
     CVS = 'cvs'
     GIT = 'git'
     HG = 'hg'
     MKDIR = 'mkdir'
+    PATH = 'path'
     SVN = 'svn'
+
+
+class UpdateResult(Enum):
+    """
+    update results
+
+    Defines the possible results of a fetch-type handler's update request on
+    an existing dependency.
+
+    Attributes:
+        FAILED: the dependency could not be updated
+        UNCHANGED: the dependency was already up-to-date
+        UPDATED: the dependency has been updated
+    """
+    FAILED = 'failed'
+    UNCHANGED = 'unchanged'
+    UPDATED = 'updated'
@@ -6,10 +6,18 @@ from fetchdep.defs import SiteVcsType
 from fetchdep.util.io import resolve_dirname
 from fetchdep.exceptions import InvalidNameConfigurationError
 from fetchdep.exceptions import UnknownVcsTypeConfigurationError
+import os
+
+try:
+    from urllib.parse import urlparse
+    from urllib.parse import urlunparse
+except ImportError:
+    from urlparse import urlparse
+    from urlparse import urlunparse
 
 
 class Dependency:
-    def __init__(self, vcs, name, site, origin, tags, recursive):
+    def __init__(self, vcs, name, site, origin, tags, recursive, ext=None):
         """
         a project dependency
 
@@ -23,8 +31,10 @@ class Dependency:
             origin: origin (configuration) of this dependency
             tags: tags associated to this dependency
             recursive: whether if recursive mode is allowed
+            ext (optional): extension (pass-through) options
 
         Attributes:
+            ext: extension (pass-through) options
             name: the name of the dependency
             origin: origin (configuration) of this dependency
             recursive: whether if recursive mode is allowed
@@ -32,6 +42,7 @@ class Dependency:
             tags: tags associated to this dependency
             vcs: the vcs type
         """
+        self.ext = dict(ext) if ext else {}
         self.name = name
         self.origin = origin
         self.recursive = recursive
@@ -40,7 +51,7 @@ class Dependency:
         self.vcs = vcs
 
 
-def build_dependency(origin, name, site, tags, recursive):
+def build_dependency(origin, name, site, tags, recursive, ext=None):
     """
     build a dependency entry
 
@@ -54,6 +65,7 @@ def build_dependency(origin, name, site, tags, recursive):
         site: the site/source of the dependency
         tags: tags associated to this dependency
         recursive: whether if recursive mode is allowed
+        ext (optional): extension (pass-through) options
 
     Returns:
         the built dependency
@@ -71,7 +83,10 @@ def build_dependency(origin, name, site, tags, recursive):
     # determine the type of dependency this is
     final_site = site
     site_lc = site.lower()
-    if site_lc.startswith('cvs+'):
+    if site_lc.startswith('archive+'):
+        final_site = site[8:]
+        vcs_type = SiteVcsType.ARCHIVE
+    elif site_lc.startswith('cvs+'):
         final_site = site[4:]
         vcs_type = SiteVcsType.CVS
     elif site_lc.startswith((
@@ -92,6 +107,14 @@ def build_dependency(origin, name, site, tags, recursive):
         vcs_type = SiteVcsType.HG
     elif site_lc.startswith('mkdir'):
         vcs_type = SiteVcsType.MKDIR
+    elif site_lc.startswith('path+'):
+        # relative paths are relative to the origin's directory
+        final_site = os.path.expanduser(site[5:])
+        if not os.path.isabs(final_site) and origin:
+            origin_dir = os.path.dirname(os.path.abspath(origin))
+            final_site = os.path.join(origin_dir, final_site)
+        final_site = os.path.normpath(final_site)
+        vcs_type = SiteVcsType.PATH
     elif site_lc.startswith('svn+'):
         final_site = site[4:]
         vcs_type = SiteVcsType.SVN
@@ -106,4 +129,57 @@ def build_dependency(origin, name, site, tags, recursive):
         origin,
         tags,
         recursive,
+        ext=ext,
     )
+
+
+def dependency_site_key(dep):
+    """
+    return a key identifying the content fetched for a dependency
+
+    Provides a key which is shared by dependencies that would fetch the same
+    content (e.g. the same upstream vendored under different names). The key
+    is built from the dependency's upstream key (see
+    ``dependency_upstream_key``) and any extension options which influence
+    what is fetched.
+
+    Args:
+        dep: the dependency
+
+    Returns:
+        the site key
+    """
+
+    ext = tuple(sorted((k, repr(v)) for k, v in dep.ext.items()))
+    return dependency_upstream_key(dep) + (ext,)
+
+
+def dependency_upstream_key(dep):
+    """
+    return a key identifying the upstream of a dependency
+
+    Provides a key which is shared by dependencies that fetch from the same
+    upstream (regardless of which content is fetched from it, e.g. different
+    branches). The key is built from the dependency's type and its
+    normalized site.
+
+    Args:
+        dep: the dependency
+
+    Returns:
+        the upstream key
+    """
+
+    site = dep.site.strip()
+
+    # hosts and schemes are case-insensitive
+    parsed = urlparse(site)
+    if parsed.scheme and parsed.netloc:
+        site = urlunparse(parsed._replace(
+            scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()))
+
+    site = site.rstrip('/')
+    if dep.vcs == SiteVcsType.GIT and site.endswith('.git'):
+        site = site[:-4]
+
+    return (dep.vcs, site)
@@ -2,19 +2,35 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.cache import prune_cache
 from fetchdep.config import Config
 from fetchdep.config import find_configuration
 from fetchdep.database import ConfigDatabase
 from fetchdep.defs import MAX_REQUEST_BEFORE_CONFIRM
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.events import EventLog
 from fetchdep.exceptions import FetchdepMissingConfigurationError
+from fetchdep.fetch import FetchBatchRequest
+from fetchdep.fetch import batch_fetch_requests
+from fetchdep.fetch import fetch_type_tools
+from fetchdep.fetch import prepare_discover_request
+from fetchdep.fetch import prepare_duplicate_request
 from fetchdep.fetch import prepare_fetch_request
 from fetchdep.processor import ProcessState
+from fetchdep.processor import discover
 from fetchdep.processor import process
 from fetchdep.processor import process_initialization
+from fetchdep.progress import ProgressRenderer
+from fetchdep.staging import prune_staging
+from fetchdep.timings import Timings
+from fetchdep.timings import monotonic
+from fetchdep.tool import probe_tools
 from fetchdep.util.compat import compat_input
 from fetchdep.util.log import debug
 from fetchdep.util.log import err
+from fetchdep.util.log import flush_policy
 from fetchdep.util.log import is_debug
+from fetchdep.util.log import is_fsync
 from fetchdep.util.log import is_nocolor
 from fetchdep.util.log import is_verbose
 from fetchdep.util.log import log
@@ -42,10 +58,14 @@ class FetchdepEngine:
 
         Attributes:
             cfgdb: configuration database
+            events: machine-readable log of events for a run
             opts: options used to configure the engine
+            timings: timing measurements of a run
         """
         self.cfgdb = ConfigDatabase()
+        self.events = EventLog()
         self.opts = opts
+        self.timings = Timings()
 
         # find implementation location (mainly for debugging)
         if sys.version_info < (3, 0) and not os.path.isabs(__file__):
@@ -68,6 +88,38 @@ class FetchdepEngine:
             configuration/package definitions
         """
 
+        start = monotonic()
+        self.events = EventLog(self.opts.events_file)
+        self.timings = Timings()
+
+        rv = False
+        try:
+            rv = self._run()
+        finally:
+            duration = monotonic() - start
+            self.timings.record('total', duration)
+
+            if self.opts.timings:
+                log('timings:')
+                for line in self.timings.report():
+                    log('  ' + line)
+
+            events = self.events
+            events.emit('summary',
+                bytes=events.bytes,
+                dependencies=len(self.cfgdb.db),
+                duration=duration,
+                failed=events.failed,
+                finished=events.finished,
+                success=rv,
+                unchanged=events.unchanged,
+                updated=events.updated,
+            )
+            events.close()
+
+        return rv
+
+    def _run(self):
         opts = self.opts
 
         # verify the configuration exists before processing
@@ -90,7 +142,10 @@ class FetchdepEngine:
                 return True
 
         # first pass configuration processing
-        if not self._process_configuration(conf_point):
+        with self.timings.measure('configuration'):
+            loaded = self._process_configuration(conf_point)
+
+        if not loaded:
             return False
 
         # if a user only wants an initial state information, dump and stop
@@ -98,39 +153,76 @@ class FetchdepEngine:
             self._dump_state()
             return True
 
-        # compile a list of dependencies that look to be missing
+        # compile a list of dependencies that look to be missing (as well as
+        # existing dependencies to refresh, if updating)
         missing_deps = []
+        update_deps = []
         for dep in self.cfgdb.db.values():
             target_dir = os.path.join(opts.work_dir, dep.name)
             if not os.path.exists(target_dir):
                 missing_deps.append(dep)
+            elif opts.update:
+                update_deps.append(dep)
 
         unknown_tags = set(self.opts.tags) - self.cfgdb.tags
         if unknown_tags:
             warn('unknown tags: {}', ', '.join(sorted(unknown_tags)))
 
-        if not missing_deps:
+        if not missing_deps and not update_deps:
             success('no missing dependencies')
             return True
 
+        # remove any staging content left behind from an interrupted run
+        if not opts.dry_run:
+            debug('pruning stale staging directories: {}', opts.work_dir)
+            prune_staging(opts.work_dir)
+
         debug('prepare worker pool state')
         process_state = ProcessState()
 
         # relay logging configuration state to other processes
         process_state.log_debug = is_debug()
+        process_state.log_flush = flush_policy()
+        process_state.log_fsync = is_fsync()
         process_state.log_nocolor = is_nocolor()
         process_state.log_verbose = is_verbose()
 
+        # probe required host tools once (in parallel) before starting the
+        # worker pool, to share detection results with all workers
+        debug('probing host tools')
+        tools = fetch_type_tools(self.cfgdb.db.values())
+        with self.timings.measure('tool-probe'):
+            process_state.tools = probe_tools(tools, cache_dir=opts.cache_dir)
+
         debug('starting worker pool ({})', opts.parallel)
-        worker_pool = multiprocessing.Pool(processes=opts.parallel,
-            initializer=process_initialization,
-            initargs=(process_state,))
+        with self.timings.measure('pool-start'):
+            worker_pool = multiprocessing.Pool(processes=opts.parallel,
+                initializer=process_initialization,
+                initargs=(process_state,))
+
+        # render an aggregated progress display (if requested)
+        renderer = ProgressRenderer() if opts.progress else None
 
         trouble = False
         partial = False
         try:
+            # when recursive, resolve the complete set of dependencies before
+            # fetching by only acquiring the configurations of each missing
+            # dependency; allowing all dependencies to be fetched at once
+            if opts.recursive:
+                debug('discovering dependency configurations')
+                with self.timings.measure('discovery'):
+                    discovered = self._discover(worker_pool, missing_deps,
+                        update_deps)
+
+                if not discovered and not opts.skip_missing:
+                    trouble = True
+
+            deferred_deps = []
+            fetching = set()
             total_requests = 0
-            while missing_deps:
+            while not trouble and \
+                    (missing_deps or update_deps or deferred_deps):
                 # if we are processing too many requests, ask the user if they
                 # are sure they want to continue
                 total_requests += len(missing_deps)
@@ -158,15 +250,72 @@ class FetchdepEngine:
                         trouble = True
                         break
 
-                # queue up a fetch request for each missing dependency and
-                # pass the job into the work pool
-                for dep in missing_deps:
-                    req = prepare_fetch_request(dep, opts)
-
-                    debug('queuing dependency: {}', dep.name)
-                    process_state.queued()
+                # dependencies sharing a site with a dependency fetched during
+                # this run are populated from the primary dependency's local
+                # copy once available; if the primary can no longer provide
+                # a copy (e.g. failed to fetch), the site is fetched instead
+                # (dependencies sharing an upstream are always fetched, since
+                # a copy of a worktree would share the primary's git state)
+                fetch_deps = []
+                duplicate_reqs = []
+                round_names = set()
+                pending_deps = deferred_deps + missing_deps
+                deferred_deps = []
+                for dep in pending_deps:
+                    primary = self.cfgdb.primary(dep.name)
+                    if primary in fetching and \
+                            not self.cfgdb.shares_upstream(dep.name):
+                        primary_dir = os.path.join(opts.work_dir, primary)
+                        if os.path.exists(primary_dir):
+                            duplicate_reqs.append(prepare_duplicate_request(
+                                dep, primary_dir, opts))
+                            continue
+
+                        if primary in round_names or \
+                                process_state.pending.value > 0:
+                            debug('deferring duplicate dependency: {}',
+                                dep.name)
+                            deferred_deps.append(dep)
+                            continue
+
+                    fetching.add(dep.name)
+                    round_names.add(dep.name)
+                    fetch_deps.append(dep)
+
+                # queue up a fetch request for each missing dependency (and an
+                # update request for each existing dependency, if updating)
+                # and pass the job into the work pool; requests which can be
+                # served together are grouped into a batch
+                reqs = [prepare_fetch_request(dep, opts,
+                    shared=self.cfgdb.shares_upstream(dep.name))
+                    for dep in fetch_deps]
+                reqs = batch_fetch_requests(reqs, opts.parallel)
+                reqs.extend(duplicate_reqs)
+                reqs.extend([prepare_fetch_request(dep, opts, update=True)
+                    for dep in update_deps])
+
+                submit_start = monotonic()
+                for req in reqs:
+                    if isinstance(req, FetchBatchRequest):
+                        batch_reqs = req.requests
+                    else:
+                        batch_reqs = [req]
+
+                    names = ', '.join(r.dep.name for r in batch_reqs)
+                    debug('queuing dependency: {}', names)
+
+                    # record any events reported by workers before recording
+                    # queued events, to keep events in order; queued events
+                    # are recorded directly (before the request is passed to
+                    # a worker), ensuring a dependency's queued event always
+                    # precedes any event reported by its worker
+                    process_state.drain_events(self.events, renderer=renderer)
+                    for batch_req in batch_reqs:
+                        process_state.queued()
+                        self.events.emit('queued', name=batch_req.dep.name,
+                            update=batch_req.update)
                     req = worker_pool.apply_async(process, args=(req, opts))
-                    debug('dependency has been queued: {}', dep.name)
+                    debug('dependency has been queued: {}', names)
 
                     # we primarily only perform a get here to help check for
                     # any immediate failures when invoking the async fetch
@@ -176,12 +325,16 @@ class FetchdepEngine:
                         req.get(1)
                     except multiprocessing.TimeoutError:
                         pass
+                self.timings.record('queue-submit', monotonic() - submit_start)
 
-                # all missing dependencies have been queued; clear
+                # all missing/updating dependencies have been queued; clear
                 missing_deps = []
+                update_deps = []
 
                 debug('waiting for dependencies to be fetched')
-                new_cfg = process_state.wait()
+                with self.timings.measure('wait'):
+                    new_cfg = process_state.wait(renderer=renderer,
+                        events=self.events, timings=self.timings)
 
                 if process_state.failure.value:
                     partial = True
@@ -197,9 +350,14 @@ class FetchdepEngine:
                 if new_cfg and self.opts.recursive:
                     def hne(name):
                         # detected a new dependency; add it to the missing
-                        # list so that it can be fetched next pass
+                        # list so that it can be fetched next pass (or the
+                        # update list, if it already exists and updating)
                         new_dep = self.cfgdb.get(name)
-                        missing_deps.append(new_dep)  # noqa: B023
+                        new_dir = os.path.join(opts.work_dir, name)
+                        if not os.path.exists(new_dir):
+                            missing_deps.append(new_dep)  # noqa: B023
+                        elif opts.update:
+                            update_deps.append(new_dep)  # noqa: B023
 
                     debug('checking for new dependencies in: {}', new_cfg)
                     if not self._process_configuration(new_cfg, new_hook=hne):
@@ -219,7 +377,18 @@ class FetchdepEngine:
             raise
         finally:
             debug('waiting for worker pool to complete')
-            worker_pool.join()
+            with self.timings.measure('pool-join'):
+                worker_pool.join()
+
+            # record any remaining events/timings reported by workers
+            process_state.drain_events(self.events)
+            process_state.drain_timings(self.timings)
+
+        # keep the cache (if any) within its configured size
+        if opts.cache_dir and not opts.dry_run:
+            debug('pruning cache: {}', opts.cache_dir)
+            with self.timings.measure('cache-prune'):
+                prune_cache(opts.cache_dir, opts.cache_max_size)
 
         if trouble:
             return False
@@ -233,19 +402,102 @@ class FetchdepEngine:
         dep_count = len(self.cfgdb.db)
         detected_deps = len(self.cfgdb.deps)
         ignored_deps = detected_deps - dep_count
-        pf = '; ignored: {}'.format(ignored_deps) if ignored_deps else ''
+        details = []
+        if opts.update:
+            details.append('updated: {}'.format(process_state.updated.value))
+            details.append('unchanged: {}'.format(
+                process_state.unchanged.value))
+        if ignored_deps:
+            details.append('ignored: {}'.format(ignored_deps))
+        pf = ''.join('; ' + detail for detail in details)
 
         success('all dependencies prepared (total: {}{})', dep_count, pf)
         return True
 
-    def _process_configuration(self, conf_point, new_hook=None):
+    def _discover(self, worker_pool, missing_deps, update_deps):
+        """
+        discover the configurations of missing dependencies
+
+        Acquires the configurations provided by missing dependencies (without
+        fetching the dependencies) to register any dependencies they define.
+        Newly registered dependencies are added to the missing dependencies
+        (or the update dependencies, if they already exist and updating) and
+        have their configurations discovered as well. Dependencies which
+        cannot be discovered are processed once they have been fetched.
+
+        Args:
+            worker_pool: the worker pool to discover with
+            missing_deps: the missing dependencies
+            update_deps: the dependencies to update
+
+        Returns:
+            ``True`` if all discovered configurations have been processed;
+            ``False`` otherwise
+        """
+
+        opts = self.opts
+        pending = list(missing_deps)
+
+        def hne(name):
+            new_dep = self.cfgdb.get(name)
+            new_dir = os.path.join(opts.work_dir, name)
+            if not os.path.exists(new_dir):
+                missing_deps.append(new_dep)
+                pending.append(new_dep)
+            elif opts.update:
+                update_deps.append(new_dep)
+
+        while pending:
+            jobs = []
+            for dep in pending:
+                if not dep.recursive:
+                    continue
+
+                req = prepare_discover_request(dep, opts)
+                if not req:
+                    debug('discovery not supported: {}', dep.name)
+                    continue
+
+                debug('discovering configuration: {}', dep.name)
+                job = worker_pool.apply_async(discover, args=(req, opts))
+                jobs.append((req, job))
+
+            del pending[:]
+
+            for req, job in jobs:
+                configs = job.get()
+                if configs is None:
+                    verbose('unable to discover configuration: {}',
+                        req.dep.name)
+                    continue
+
+                for cfg_name in SUPPORTED_CONFIG_NAMES:
+                    if cfg_name in configs:
+                        cfg = os.path.join(req.target_dir, cfg_name)
+                        verbose('discovered dependency configuration: {}', cfg)
+                        if not self._process_configuration(cfg, new_hook=hne,
+                                content=configs[cfg_name]):
+                            return False
+                        break
+
+        return True
+
+    def _process_configuration(self, conf_point, new_hook=None, content=None):
         cfg = Config()
-        if not cfg.load(conf_point):
+        with self.timings.measure('config-parse'):
+            if content is not None:
+                loaded = cfg.loads(content, conf_point)
+            else:
+                loaded = cfg.load(conf_point)
+
+        if not loaded:
             return False
 
         additional_cfgs = []
 
         deps = cfg.extract()
+        self.events.emit('config_loaded', dependencies=len(deps),
+            path=conf_point)
         for dep in deps:
             # keep track of all known dependencies and tags
             self.cfgdb.track_dependency(dep.name)
@@ -262,6 +514,8 @@ class FetchdepEngine:
                     continue
 
             self.cfgdb.store(dep.name, dep)
+            self.events.emit('discovered', name=dep.name, site=dep.site,
+                tags=sorted(dep.tags), vcs=dep.vcs)
             if new_hook:
                 new_hook(dep.name)
 
@@ -277,7 +531,8 @@ class FetchdepEngine:
                         additional_cfgs.append(new_conf)
 
         for additional_cfg in additional_cfgs:
-            if not self._process_configuration(additional_cfg):
+            if not self._process_configuration(additional_cfg,
+                    new_hook=new_hook):
                 return False
 
         return True
@@ -287,6 +542,8 @@ class FetchdepEngine:
         log('YAML {}', yaml_version)
         log('Tool: {}', self._base_dir)
         log('Target container: {}', self.opts.work_dir)
+        if self.opts.cache_dir:
+            log('Cache: {}', self.opts.cache_dir)
 
         # report any unused tags
         if not self.opts.all_tags:
@@ -307,5 +564,11 @@ class FetchdepEngine:
                 log('    Site: {}', val.site)
                 log('    Type: {}', val.vcs)
                 log('    Tags: {}', ', '.join(sorted(val.tags)) or '(none)')
+
+                primary = self.cfgdb.primary(name)
+                if primary:
+                    log('    Duplicate of: {}', primary)
+                elif self.cfgdb.shares_upstream(name):
+                    log('    Worktree: (shared upstream)')
         else:
             log('No detected dependencies.')
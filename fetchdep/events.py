@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.defs import UpdateResult
+from fetchdep.util.compat import make_unicode
+from fetchdep.util.log import err
+from io import open  # noqa: A004
+import json
+import os
+import time
+
+
+class EventLog(object):
+    def __init__(self, path=None):
+        """
+        a machine-readable log of events for a run
+
+        Records events of a run (e.g. a dependency being queued or finished)
+        as newline-delimited JSON records into the provided file. Each record
+        holds the ``event`` type and the ``time`` of the event, along with any
+        event-specific fields. If no path is provided, events are ignored.
+
+        Args:
+            path (optional): the file to write events into
+
+        Attributes:
+            bytes: total bytes on disk of finished dependencies
+            failed: the number of failed dependencies
+            finished: the number of finished dependencies
+            unchanged: the number of unchanged dependencies (when updating)
+            updated: the number of updated dependencies (when updating)
+        """
+        self.bytes = 0
+        self.failed = 0
+        self.finished = 0
+        self.unchanged = 0
+        self.updated = 0
+        self._file = None
+
+        if path:
+            try:
+                self._file = open(path, 'w', encoding='utf_8')  # noqa: SIM115
+            except (IOError, OSError) as e:
+                err('unable to open events file: {}\n'
+                    '    {}', path, e)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def emit(self, event, **fields):
+        """
+        emit an event
+
+        Args:
+            event: the type of event
+            **fields: event-specific fields
+        """
+        if not self._file:
+            return
+
+        if event == 'finished':
+            self.finished += 1
+            self.bytes += fields.get('bytes', 0)
+            if fields.get('exit_code'):
+                self.failed += 1
+            if fields.get('result') == UpdateResult.UPDATED:
+                self.updated += 1
+            elif fields.get('result') == UpdateResult.UNCHANGED:
+                self.unchanged += 1
+
+        record = {
+            'event': event,
+            'time': time.time(),
+        }
+        record.update(fields)
+
+        data = json.dumps(record, sort_keys=True) + '\n'
+        self._file.write(make_unicode(data))
+        self._file.flush()
+
+    def enabled(self):
+        """
+        return whether events are being recorded
+
+        Returns:
+            whether events are recorded
+        """
+        return self._file is not None
+
+
+def disk_usage(path):
+    """
+    return the size of a directory tree on disk
+
+    Args:
+        path: the path
+
+    Returns:
+        the total size (in bytes) of all files in the tree
+    """
+
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:  # noqa: PERF203
+                pass
+
+    return total
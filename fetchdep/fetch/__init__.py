@@ -2,57 +2,283 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from collections import OrderedDict
 from fetchdep.defs import SiteVcsType
+from fetchdep.fetch.archive import fetch as fetch_archive
+from fetchdep.fetch.archive import update as update_archive
+from fetchdep.fetch.cvs import CVS_MAX_BATCH
+from fetchdep.fetch.cvs import batch_key as batch_key_cvs
+from fetchdep.fetch.cvs import discover as discover_cvs
 from fetchdep.fetch.cvs import fetch as fetch_cvs
+from fetchdep.fetch.cvs import fetch_batch as fetch_batch_cvs
+from fetchdep.fetch.cvs import update as update_cvs
+from fetchdep.fetch.duplicate import fetch as fetch_duplicate
+from fetchdep.fetch.git import discover as discover_git
 from fetchdep.fetch.git import fetch as fetch_git
+from fetchdep.fetch.git import update as update_git
+from fetchdep.fetch.mercurial import discover as discover_mercurial
 from fetchdep.fetch.mercurial import fetch as fetch_mercurial
+from fetchdep.fetch.mercurial import update as update_mercurial
+from fetchdep.fetch.mkdir import discover as discover_mkdir
 from fetchdep.fetch.mkdir import fetch as fetch_mkdir
+from fetchdep.fetch.mkdir import update as update_mkdir
+from fetchdep.fetch.path import discover as discover_path
+from fetchdep.fetch.path import fetch as fetch_path
+from fetchdep.fetch.path import update as update_path
+from fetchdep.fetch.svn import SVN_MAX_BATCH
+from fetchdep.fetch.svn import batch_key as batch_key_svn
+from fetchdep.fetch.svn import discover as discover_svn
 from fetchdep.fetch.svn import fetch as fetch_svn
+from fetchdep.fetch.svn import fetch_batch as fetch_batch_svn
+from fetchdep.fetch.svn import update as update_svn
+from fetchdep.timings import Timings
+from fetchdep.tool.cvs import CVS
+from fetchdep.tool.git import GIT
+from fetchdep.tool.hg import HG
+from fetchdep.tool.svn import SVN
 from fetchdep.util.log import err
 import os
 
+# fetch types which support serving multiple requests in a single batched
+# fetch call; mapped to a batch key generator, batch fetcher and maximum
+# batch size
+BATCH_FETCH_TYPES = {
+    SiteVcsType.CVS: (batch_key_cvs, fetch_batch_cvs, CVS_MAX_BATCH),
+    SiteVcsType.SVN: (batch_key_svn, fetch_batch_svn, SVN_MAX_BATCH),
+}
+
+# fetch types which support discovering the configurations provided by a site
+# without fetching the site; mapped to a discoverer
+DISCOVER_FETCH_TYPES = {
+    SiteVcsType.CVS: discover_cvs,
+    SiteVcsType.GIT: discover_git,
+    SiteVcsType.HG: discover_mercurial,
+    SiteVcsType.MKDIR: discover_mkdir,
+    SiteVcsType.PATH: discover_path,
+    SiteVcsType.SVN: discover_svn,
+}
+
+
+# host tools used by each fetch type
+FETCH_TYPE_TOOLS = {
+    SiteVcsType.CVS: CVS,
+    SiteVcsType.GIT: GIT,
+    SiteVcsType.HG: HG,
+    SiteVcsType.SVN: SVN,
+}
+
 
 class FetchOptions:
     """
     fetch-type options
 
     Provides a series of options from the fetchdep process into a fetch-type
-    handler. A handler's ``fetch`` method will be passed options to react on.
+    handler. A handler's ``fetch`` (or ``update``) method will be passed
+    options to react on.
 
     Attributes:
+        branch: the branch to fetch (if any)
+        cache_dir: directory to hold cached content (if any)
+        commit_dir: directory fetched content is committed into (which
+            differs from ``target_dir`` when the fetch is staged)
         ext: extension (pass-through) options
+        jobs: number of jobs a handler may use for a single fetch
         name: the name of the dependency being processed
+        post_commit: callback a handler may set to be invoked once fetched
+            content has been committed into ``commit_dir`` (invoked with
+            ``True``) or has been discarded (invoked with ``False``), which
+            returns whether the dependency is prepared
+        revision: the revision (e.g. commit) to fetch (if any)
         site: the site (uri) to acquire a dependency's resources
+        source_dir: local copy of the site to populate from (duplicates)
+        tag: the tag to fetch (if any)
         target_dir: directory to store fetched content
+        timings: timing measurements of a handler's steps (e.g. fetching
+            submodules)
+        worktrees_dir: directory to hold repositories shared with other
+            dependencies of the same upstream (if sharing)
     """
     def __init__(self):
+        self.branch = None
+        self.cache_dir = None
+        self.commit_dir = None
         self.ext = {}
+        self.jobs = 1
         self.name = None
+        self.post_commit = None
+        self.revision = None
         self.site = None
+        self.source_dir = None
+        self.tag = None
         self.target_dir = None
+        self.timings = Timings()
+        self.worktrees_dir = None
 
 
 class FetchRequest:
-    def __init__(self, fetcher, dep, target_dir):
+    def __init__(self, fetcher, dep, target_dir, update=False,
+            source_dir=None, shared=False):
         self.fetcher = fetcher
         self.dep = dep
+        self.shared = shared
+        self.source_dir = source_dir
         self.target_dir = target_dir
+        self.update = update
+
+
+class FetchBatchRequest:
+    def __init__(self, fetcher, requests):
+        """
+        a batch of fetch requests
+
+        Holds multiple fetch requests which are served by a single batched
+        fetch call. A batch fetcher accepts a list of fetch options and
+        returns a list of results (one for each request).
+
+        Args:
+            fetcher: the batch fetcher
+            requests: the fetch requests
+
+        Attributes:
+            fetcher: the batch fetcher
+            requests: the fetch requests
+        """
+        self.fetcher = fetcher
+        self.requests = requests
+
+
+def batch_fetch_requests(reqs, parallel):
+    """
+    group fetch requests into batches (when supported)
+
+    Accepts a list of fetch requests and groups requests that a fetch type can
+    serve using a single batched fetch call. The size of each batch is limited
+    to ensure that all available jobs can still be used. Requests which cannot
+    be batched (including update requests) are returned as-is.
+
+    Args:
+        reqs: the fetch requests
+        parallel: the number of jobs allowed at a given time
+
+    Returns:
+        a list of fetch requests and fetch batch requests
+    """
+
+    final_reqs = []
+    groups = OrderedDict()
+    for req in reqs:
+        batch_type = BATCH_FETCH_TYPES.get(req.dep.vcs)
+        if not batch_type or req.update:
+            final_reqs.append(req)
+            continue
+
+        batch_key, _, _ = batch_type
+        key = (req.dep.vcs, batch_key(req.dep))
+        groups.setdefault(key, []).append(req)
+
+    for (vcs, _), group in groups.items():
+        _, batch_fetcher, max_batch = BATCH_FETCH_TYPES[vcs]
+        jobs = max(parallel, 1)
+        size = min(max_batch, (len(group) + jobs - 1) // jobs)
+
+        for idx in range(0, len(group), size):
+            chunk = group[idx:idx + size]
+            if len(chunk) == 1:
+                final_reqs.extend(chunk)
+            else:
+                final_reqs.append(FetchBatchRequest(batch_fetcher, chunk))
+
+    return final_reqs
+
+
+def fetch_type_tools(deps):
+    """
+    return the host tools required to fetch dependencies
+
+    Args:
+        deps: the dependencies
+
+    Returns:
+        list of host tools
+    """
+
+    tools = []
+    for vcs in sorted({dep.vcs for dep in deps}):
+        tool = FETCH_TYPE_TOOLS.get(vcs)
+        if tool:
+            tools.append(tool)
+
+    return tools
+
+
+def prepare_discover_request(dep, opts):
+    """
+    prepare a discovery request for a dependency
+
+    Builds a request which acquires only the fetchdep configurations provided
+    by a dependency's site (without fetching the dependency itself). Fetch
+    types which cannot discover configurations will not provide a request.
+
+    Args:
+        dep: the dependency
+        opts: engine options
+
+    Returns:
+        the discovery request; ``None`` if the fetch type cannot discover
+        configurations
+    """
+
+    discoverer = DISCOVER_FETCH_TYPES.get(dep.vcs)
+    if not discoverer:
+        return None
+
+    target_dir = os.path.join(opts.work_dir, dep.name)
+
+    return FetchRequest(discoverer, dep, target_dir)
+
+
+def prepare_duplicate_request(dep, source_dir, opts):
+    """
+    prepare a fetch request for a duplicate dependency
+
+    Builds a fetch request for a dependency which shares the same site as
+    another (already fetched) dependency. The request populates the
+    dependency from the local copy of the other dependency instead of
+    fetching the site again.
+
+    Args:
+        dep: the dependency
+        source_dir: the local copy of the dependency's site
+        opts: engine options
+
+    Returns:
+        the fetch request
+    """
+
+    target_dir = os.path.join(opts.work_dir, dep.name)
+
+    return FetchRequest(fetch_duplicate, dep, target_dir,
+        source_dir=source_dir)
 
 
-def prepare_fetch_request(dep, opts):
+def prepare_fetch_request(dep, opts, update=False, shared=False):
 
-    # find fetching method for the target vcs-type
+    # find fetching (or updating) method for the target vcs-type
     fetcher = None
-    if dep.vcs == SiteVcsType.CVS:
-        fetcher = fetch_cvs
+    if dep.vcs == SiteVcsType.ARCHIVE:
+        fetcher = update_archive if update else fetch_archive
+    elif dep.vcs == SiteVcsType.CVS:
+        fetcher = update_cvs if update else fetch_cvs
     elif dep.vcs == SiteVcsType.GIT:
-        fetcher = fetch_git
+        fetcher = update_git if update else fetch_git
     elif dep.vcs == SiteVcsType.HG:
-        fetcher = fetch_mercurial
+        fetcher = update_mercurial if update else fetch_mercurial
     elif dep.vcs == SiteVcsType.MKDIR:
-        fetcher = fetch_mkdir
+        fetcher = update_mkdir if update else fetch_mkdir
+    elif dep.vcs == SiteVcsType.PATH:
+        fetcher = update_path if update else fetch_path
     elif dep.vcs == SiteVcsType.SVN:
-        fetcher = fetch_svn
+        fetcher = update_svn if update else fetch_svn
 
     if not fetcher:
         err('fetch type is not implemented: {}', dep.vcs)
@@ -60,4 +286,5 @@ def prepare_fetch_request(dep, opts):
 
     target_dir = os.path.join(opts.work_dir, dep.name)
 
-    return FetchRequest(fetcher, dep, target_dir)
+    return FetchRequest(fetcher, dep, target_dir, update=update,
+        shared=shared)
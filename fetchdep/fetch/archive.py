@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.defs import CONFIG_SHA256_KEY
+from fetchdep.defs import UpdateResult
+from fetchdep.util.io import makedirs
+from fetchdep.util.io import path_remove
+from fetchdep.util.log import err
+from fetchdep.util.log import note
+from fetchdep.util.log import verbose
+from fetchdep.util.log import warn
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+try:
+    from urllib.parse import urlparse
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+    from urlparse import urlparse
+
+# size of each chunk read from an archive's stream
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+
+def fetch(opts):
+    """
+    support fetching from archive sources
+
+    With provided fetch options (``FetchOptions``), the fetch stage
+    will be processed. A tarball is streamed directly into its extraction,
+    where zip archives (which cannot be extracted from a stream) are spooled
+    to a temporary file first. A sha256 checksum of the archive is calculated
+    while streaming and verified (if configured) before any extracted content
+    is moved into its target directory.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        ``True`` if the fetch stage is completed; ``False`` otherwise
+    """
+
+    assert opts
+    name = opts.name
+    site = opts.site
+    target_dir = opts.target_dir
+
+    note('fetching {}...', name)
+
+    # extract all content into an interim container, to be moved into the
+    # target directory once extracted and verified
+    container_dir = os.path.dirname(target_dir)
+    if not makedirs(container_dir):
+        return False
+
+    staging_dir = tempfile.mkdtemp(prefix='.fetchdep-archive-',
+        dir=container_dir)
+    try:
+        extract_dir = os.path.join(staging_dir, 'content')
+        os.mkdir(extract_dir)
+
+        try:
+            stream = _HashingReader(urlopen(site))
+        except (IOError, OSError, ValueError) as e:
+            err('unable to open archive: {}\n'
+                '    {}', site, e)
+            return False
+
+        try:
+            path = urlparse(site).path.lower()
+            if path.endswith('.zip'):
+                _extract_zip(stream, staging_dir, extract_dir)
+            else:
+                _extract_tar(stream, extract_dir)
+
+            # ensure the entire stream has been hashed (e.g. trailing padding
+            # not consumed by the tarball extraction)
+            stream.drain()
+        except (IOError, OSError, ValueError, tarfile.TarError,
+                zipfile.BadZipfile) as e:
+            err('unable to extract archive: {}\n'
+                '    {}', site, e)
+            return False
+        finally:
+            stream.close()
+
+        digest = stream.hexdigest()
+        verbose('archive sha256: {}', digest)
+
+        expected_digest = opts.ext.get(CONFIG_SHA256_KEY)
+        if expected_digest is not None:
+            if digest != str(expected_digest).strip().lower():
+                err('archive checksum mismatch: {}\n'
+                    '    expected: {}\n'
+                    '      actual: {}', site, expected_digest, digest)
+                return False
+        else:
+            warn('no sha256 configured for archive: {}', name)
+
+        # if an archive holds a single top-level directory, use its contents
+        # as the dependency's contents
+        content_dir = extract_dir
+        entries = os.listdir(extract_dir)
+        if len(entries) == 1:
+            single_entry = os.path.join(extract_dir, entries[0])
+            if os.path.isdir(single_entry) and \
+                    not os.path.islink(single_entry):
+                content_dir = single_entry
+
+        try:
+            os.rename(content_dir, target_dir)
+        except OSError as e:
+            err('unable to move archive contents into place: {}\n'
+                '    {}', target_dir, e)
+            return False
+    finally:
+        path_remove(staging_dir)
+
+    return True
+
+
+def update(opts):
+    """
+    support updating existing archive sources
+
+    Archives are expected to be immutable releases; an existing extracted
+    archive is never updated.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    verbose('archives are not updated: {}', opts.name)
+    return UpdateResult.UNCHANGED
+
+
+class _HashingReader(object):
+    def __init__(self, stream):
+        """
+        a file-like reader which hashes all read content
+
+        Args:
+            stream: the stream to read from
+        """
+        self._hash = hashlib.sha256()
+        self._stream = stream
+
+    def close(self):
+        self._stream.close()
+
+    def drain(self):
+        while self.read(ARCHIVE_CHUNK_SIZE):
+            pass
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._hash.update(data)
+        return data
+
+
+def _extract_tar(stream, extract_dir):
+    """
+    extract a tarball from a stream
+
+    Args:
+        stream: the stream to read from
+        extract_dir: the directory to extract into
+
+    Raises:
+        ValueError: if a member attempts to extract outside the directory
+    """
+
+    with tarfile.open(fileobj=stream, mode='r|*') as tar:
+        for member in tar:
+            _verify_member(extract_dir, member.name)
+            if member.issym() or member.islnk():
+                link_base = os.path.dirname(member.name) \
+                    if member.issym() else ''
+                _verify_member(extract_dir,
+                    os.path.join(link_base, member.linkname))
+
+            # use the data extraction filter when available (Python 3.12+)
+            if hasattr(tarfile, 'data_filter'):
+                tar.extract(member, extract_dir, filter='data')
+            else:
+                tar.extract(member, extract_dir)
+
+
+def _extract_zip(stream, staging_dir, extract_dir):
+    """
+    extract a zip archive from a stream
+
+    Args:
+        stream: the stream to read from
+        staging_dir: the directory to spool the archive into
+        extract_dir: the directory to extract into
+    """
+
+    spool_file = os.path.join(staging_dir, 'archive.zip')
+    with open(spool_file, 'wb') as f:
+        shutil.copyfileobj(stream, f, ARCHIVE_CHUNK_SIZE)
+
+    with zipfile.ZipFile(spool_file) as zip_:
+        for member in zip_.namelist():
+            _verify_member(extract_dir, member)
+        zip_.extractall(extract_dir)  # noqa: S202
+
+
+def _verify_member(extract_dir, name):
+    """
+    verify an archive member extracts into a directory
+
+    Args:
+        extract_dir: the directory to extract into
+        name: the member's name
+
+    Raises:
+        ValueError: if the member is outside the directory
+    """
+
+    base_dir = os.path.realpath(extract_dir)
+    member_path = os.path.realpath(os.path.join(base_dir, name))
+    if os.path.isabs(name) or \
+            os.path.commonprefix([member_path + os.sep, base_dir + os.sep]) \
+            != base_dir + os.sep:
+        msg = 'archive member outside of extraction directory: ' + name
+        raise ValueError(msg)
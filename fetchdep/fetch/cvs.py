@@ -2,12 +2,41 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.defs import CONFIG_BRANCH_KEY
+from fetchdep.defs import CONFIG_EXPORT_KEY
+from fetchdep.defs import CONFIG_REVISION_KEY
+from fetchdep.defs import CONFIG_TAG_KEY
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.defs import UpdateResult
 from fetchdep.tool.cvs import CVS
 from fetchdep.util.io import makedirs
+from fetchdep.util.io import path_remove
 from fetchdep.util.log import err
 from fetchdep.util.log import note
 from fetchdep.util.log import verbose
+from fetchdep.util.log import warn
+from io import open  # noqa: A004
 import os
+import posixpath
+import tempfile
+
+# maximum number of dependencies to checkout in a single cvs invocation
+CVS_MAX_BATCH = 32
+
+# default compression level used when communicating with a remote server
+CVS_DEFAULT_COMPRESSION = 3
+
+# cvsroot methods which do not communicate with a remote server
+CVS_LOCAL_METHODS = (
+    ':fork:',
+    ':local:',
+)
+
+# update status prefixes which indicate a file has been changed from the server
+CVS_UPDATED_PREFIXES = (
+    'P ',
+    'U ',
+)
 
 
 def fetch(opts):
@@ -35,20 +64,12 @@ def fetch(opts):
 
     note('fetching {}...', name)
 
-    try:
-        cvsroot, module = site.rsplit(' ', 1)
-    except ValueError:
-        err('''\
-improper cvs site defined
-
-The provided CVS site does not define both the CVSROOT as well as the target
-module to checkout. For example:
-
-    :pserver:anonymous@cvs.example.com:/var/lib/cvsroot mymodule
-
- Site: {}''', site)
+    parsed = _parse_site(site)
+    if not parsed:
         return False
 
+    cvsroot, module = parsed
+
     # cvs does not allow us to explicitly clone into a specific directory;
     # instead, adjust the working directory to where the folder will be held
     # and execute the checkout to specify the directory stem to use
@@ -60,9 +81,384 @@ module to checkout. For example:
     if not makedirs(container_dir):
         return False
 
-    if not CVS.execute(['-d', cvsroot, 'checkout', '-d', basename, module],
-            cwd=container_dir):
+    args = _build_args(cvsroot, opts) + ['-d', basename, module]
+    if not CVS.execute(args, cwd=container_dir):
         err('unable to checkout module')
         return False
 
     return True
+
+
+def discover(opts):
+    """
+    support discovering configurations from cvs sources
+
+    With provided fetch options (``FetchOptions``), any fetchdep
+    configuration provided by the module is acquired directly from the
+    server (piped to standard output) without performing a checkout.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    site = opts.site
+
+    # listing remote modules requires cvs v1.12+
+    if not CVS.exists() or not CVS.supports('rls'):
+        return None
+
+    parsed = _parse_site(site, quiet=True)
+    if not parsed:
+        return None
+
+    cvsroot, module = parsed
+    base_args = _compression_args(cvsroot) + ['-Q', '-d', cvsroot]
+
+    revision = _configured_rev(opts)
+    revision_args = ['-r', revision] if revision else []
+
+    rv, out = CVS.execute_rv(*(base_args + ['rls'] + revision_args +
+        [module]))
+    if rv != 0:
+        return None
+
+    configs = {}
+    entries = out.splitlines()
+    for cfg_name in SUPPORTED_CONFIG_NAMES:
+        if cfg_name not in entries:
+            continue
+
+        rv, content = CVS.execute_rv(*(base_args + ['checkout', '-p'] +
+            revision_args + [posixpath.join(module, cfg_name)]))
+        if rv != 0:
+            return None
+
+        configs[cfg_name] = content
+
+    return configs
+
+
+def update(opts):
+    """
+    support updating existing cvs sources
+
+    With provided fetch options (``FetchOptions``), an existing checkout will
+    be updated. CVS does not provide a cheap way to compare a checkout with
+    the server; instead, a single quiet update is issued and its output is
+    inspected to determine whether any files have been changed. Exported
+    modules (which have no cvs metadata) are not updated.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    name = opts.name
+    target_dir = opts.target_dir
+
+    if not CVS.exists():
+        err('unable to update package; cvs is not installed')
+        return UpdateResult.FAILED
+
+    root_file = os.path.join(target_dir, 'CVS', 'Root')
+    try:
+        with open(root_file, encoding='utf_8') as f:
+            cvsroot = f.read().strip()
+    except (IOError, OSError):
+        verbose('no cvs metadata; skipping update: {}', name)
+        return UpdateResult.UNCHANGED
+
+    note('updating {}...', name)
+
+    # cvs retains a checkout's revision (sticky tag) when updating; only
+    # provide a revision to switch to a newly configured revision
+    args = _compression_args(cvsroot) + ['-q', 'update', '-d', '-P']
+    revision = _configured_rev(opts)
+    if revision:
+        args.extend(['-r', revision])
+    out = []
+    if not CVS.execute(args, cwd=target_dir, capture=out):
+        err('unable to update module')
+        return UpdateResult.FAILED
+
+    if any(line.startswith(CVS_UPDATED_PREFIXES) for line in out):
+        return UpdateResult.UPDATED
+
+    return UpdateResult.UNCHANGED
+
+
+def fetch_batch(opts_list):
+    """
+    support fetching multiple cvs sources from a single cvsroot
+
+    With a provided list of fetch options (``FetchOptions``), the fetch stage
+    will be processed for each entry. Entries are checked out using a single
+    cvs invocation (where possible), which avoids opening a new server
+    connection for every dependency. If a module cannot be checked out with
+    the batch, the module will be fetched individually to provide an accurate
+    result for each dependency.
+
+    Args:
+        opts_list: list of fetch options
+
+    Returns:
+        list of results for each fetch option entry; ``True`` if the fetch
+        stage is completed; ``False`` otherwise
+    """
+
+    assert opts_list
+
+    if not CVS.exists():
+        err('unable to fetch package; cvs is not installed')
+        return [False] * len(opts_list)
+
+    # cvs checks out each module into a directory of the module's path;
+    # split the batch into rounds where each round has modules which do not
+    # overlap with each other
+    results = [None] * len(opts_list)
+    rounds = []
+    for idx, opts in enumerate(opts_list):
+        parsed = _parse_site(opts.site, quiet=True)
+        if not parsed:
+            results[idx] = fetch(opts)
+            continue
+
+        module = posixpath.normpath(parsed[1]).strip('/')
+        for round_ in rounds:
+            if not any(_modules_overlap(module, m) for m in round_):
+                round_[module] = idx
+                break
+        else:
+            rounds.append({module: idx})
+
+    for round_ in rounds:
+        entries = sorted((idx, module) for module, idx in round_.items())
+
+        round_results = [None] * len(entries)
+        if len(entries) > 1:
+            for idx, _ in entries:
+                note('fetching {}...', opts_list[idx].name)
+
+            round_results = _checkout_batch(opts_list, entries)
+
+        for (idx, _), result in zip(entries, round_results):
+            results[idx] = result if result is not None else fetch(
+                opts_list[idx])
+
+    return results
+
+
+def batch_key(dep):
+    """
+    return the batch key for a cvs dependency
+
+    Provides a key used to group cvs dependencies which can be checked out
+    using a single cvs invocation. Dependencies are grouped by their CVSROOT,
+    the mode used to acquire the module and the configured revision.
+
+    Args:
+        dep: the dependency
+
+    Returns:
+        the batch key
+    """
+
+    parsed = _parse_site(dep.site, quiet=True)
+    cvsroot = parsed[0] if parsed else dep.site
+    revision = [str(dep.ext.get(key)) for key in (CONFIG_REVISION_KEY,
+        CONFIG_TAG_KEY, CONFIG_BRANCH_KEY) if dep.ext.get(key) is not None]
+    return (cvsroot, bool(dep.ext.get(CONFIG_EXPORT_KEY)), tuple(revision))
+
+
+def _build_args(cvsroot, opts):
+    """
+    build the cvs arguments to acquire modules from a cvsroot
+
+    Args:
+        cvsroot: the cvsroot
+        opts: fetch options for the dependency
+
+    Returns:
+        the arguments (excluding module-specific options)
+    """
+
+    args = _compression_args(cvsroot)
+    args.extend(['-d', cvsroot])
+
+    # an export provides the sources without any cvs metadata; cvs requires
+    # an explicit revision for exports
+    revision = _configured_rev(opts)
+    if opts.ext.get(CONFIG_EXPORT_KEY):
+        args.extend(['export', '-r', revision or 'HEAD'])
+    else:
+        args.append('checkout')
+        if revision:
+            args.extend(['-r', revision])
+
+    return args
+
+
+def _checkout_batch(opts_list, entries):
+    """
+    checkout multiple cvs modules with a single cvs invocation
+
+    Args:
+        opts_list: list of fetch options
+        entries: list of 2-tuples (fetch option index, module path)
+
+    Returns:
+        list of results for each entry; ``None`` entries indicate the module
+        was not acquired by the batch
+    """
+
+    first_opts = opts_list[entries[0][0]]
+    cvsroot, _ = _parse_site(first_opts.site)
+
+    # checkout all modules into an interim container, to be moved into their
+    # respective target directories once completed
+    container_dir = os.path.dirname(first_opts.target_dir)
+    if not makedirs(container_dir):
+        return [None] * len(entries)
+
+    interim_dir = tempfile.mkdtemp(prefix='.fetchdep-cvs-', dir=container_dir)
+    try:
+        modules = [module for _, module in entries]
+        args = _build_args(cvsroot, first_opts) + modules
+        if not CVS.execute(args, cwd=interim_dir):
+            verbose('batched checkout failed; checking out individually')
+            return [None] * len(entries)
+
+        results = []
+        for idx, module in entries:
+            opts = opts_list[idx]
+            checkout_dir = os.path.join(interim_dir, *module.split('/'))
+            if not os.path.isdir(checkout_dir):
+                results.append(None)
+                continue
+
+            try:
+                os.rename(checkout_dir, opts.target_dir)
+                results.append(True)
+            except OSError as e:
+                err('unable to move checkout into place: {}\n'
+                    '    {}', opts.target_dir, e)
+                results.append(False)
+
+        return results
+    finally:
+        path_remove(interim_dir)
+
+
+def _configured_rev(opts):
+    """
+    return the revision configured for a dependency (if any)
+
+    CVS does not distinguish between revisions, tags and branches; any of
+    these can be used as a revision.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the revision; ``None`` if not configured
+    """
+    return opts.revision or opts.tag or opts.branch
+
+
+def _compression_args(cvsroot):
+    """
+    build the cvs arguments to compress communication with a cvsroot
+
+    Compression is only enabled when communicating with a remote server.
+
+    Args:
+        cvsroot: the cvsroot
+
+    Returns:
+        the arguments (if any)
+    """
+
+    level = _compression_level()
+    if level and cvsroot.startswith(':') and \
+            not cvsroot.lower().startswith(CVS_LOCAL_METHODS):
+        return ['-z{}'.format(level)]
+
+    return []
+
+
+def _compression_level():
+    """
+    return the compression level to use for remote servers
+
+    Returns:
+        the compression level
+    """
+
+    raw_level = os.getenv('FETCHDEP_CVS_COMPRESSION')
+    if raw_level is None:
+        return CVS_DEFAULT_COMPRESSION
+
+    try:
+        level = int(raw_level)
+    except ValueError:
+        level = None
+
+    if level is None or not 0 <= level <= 9:  # noqa: PLR2004
+        warn('ignoring invalid cvs compression level: {}', raw_level)
+        return CVS_DEFAULT_COMPRESSION
+
+    return level
+
+
+def _modules_overlap(module_a, module_b):
+    """
+    return whether two module paths overlap
+
+    Args:
+        module_a: the first module path
+        module_b: the second module path
+
+    Returns:
+        whether the module paths overlap
+    """
+    return module_a == module_b or \
+        module_a.startswith(module_b + '/') or \
+        module_b.startswith(module_a + '/')
+
+
+def _parse_site(site, quiet=False):
+    """
+    parse a cvs site into its cvsroot and module
+
+    Args:
+        site: the site
+        quiet (optional): whether or not to suppress output
+
+    Returns:
+        2-tuple (cvsroot, module); ``None`` if the site is invalid
+    """
+
+    try:
+        cvsroot, module = site.rsplit(' ', 1)
+    except ValueError:
+        if not quiet:
+            err('''\
+improper cvs site defined
+
+The provided CVS site does not define both the CVSROOT as well as the target
+module to checkout. For example:
+
+    :pserver:anonymous@cvs.example.com:/var/lib/cvsroot mymodule
+
+ Site: {}''', site)
+        return None
+
+    return cvsroot, module
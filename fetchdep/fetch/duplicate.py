@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.util.io import path_remove
+from fetchdep.util.log import err
+from fetchdep.util.log import note
+from fetchdep.util.tree import copy_tree
+import os
+
+
+def fetch(opts):
+    """
+    support fetching a duplicate dependency
+
+    With provided fetch options (``FetchOptions``), the fetch stage
+    will be processed. A duplicate dependency (a dependency sharing the same
+    site as another dependency) is populated from the local copy of the
+    other dependency, using reflinks (when supported by the filesystem) or a
+    parallel copy.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        ``True`` if the fetch stage is completed; ``False`` otherwise
+    """
+
+    assert opts
+    name = opts.name
+    source_dir = opts.source_dir
+    target_dir = opts.target_dir
+
+    if not os.path.isdir(source_dir):
+        err('unable to fetch package; local copy does not exist: {}',
+            source_dir)
+        return False
+
+    note('fetching {} (from {})...', name, os.path.basename(source_dir))
+
+    try:
+        copy_tree(source_dir, target_dir)
+    except (IOError, OSError) as e:
+        err('unable to copy local copy: {}\n'
+            '    {}', source_dir, e)
+        path_remove(target_dir)
+        return False
+
+    return True
@@ -2,9 +2,30 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from contextlib import contextmanager
+from fetchdep.cache import cache_entry_lock
+from fetchdep.cache import cache_entry_path
+from fetchdep.cache import populate_cache_entry
+from fetchdep.cache import touch_cache_entry
+from fetchdep.defs import CONFIG_PATHS_KEY
+from fetchdep.defs import CONFIG_SUBMODULES_KEY
+from fetchdep.defs import GIT_SUBMODULES_SHALLOW
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.defs import UpdateResult
 from fetchdep.tool.git import GIT
+from fetchdep.util.io import path_remove
+from fetchdep.util.log import debug
 from fetchdep.util.log import err
 from fetchdep.util.log import note
+from fetchdep.util.log import verbose
+from fetchdep.util.log import warn
+from fetchdep.util.string import is_sequence_not_string
+from io import open  # noqa: A004
+import os
+import tempfile
+
+# cache category used to hold git mirrors
+GIT_CACHE_CATEGORY = 'git'
 
 
 def fetch(opts):
@@ -12,7 +33,9 @@ def fetch(opts):
     support fetching from git sources
 
     With provided fetch options (``FetchOptions``), the fetch stage
-    will be processed.
+    will be processed. A configured revision is fetched without any other
+    history (when supported by the remote), where a configured branch or tag
+    limits the clone to the single branch/tag.
 
     Args:
         opts: fetch options
@@ -30,10 +53,697 @@ def fetch(opts):
         err('unable to fetch package; git is not installed')
         return None
 
+    paths = _sparse_paths(opts)
+    if paths is None:
+        return False
+
+    if paths and not GIT.supports('sparse-checkout'):
+        warn('git does not support sparse checkouts; fetching all paths: {}',
+            name)
+        paths = []
+
     note('fetching {}...', name)
 
-    if not GIT.execute(['clone', site, '--progress', target_dir]):
-        err('unable to clone git repository')
+    # dependencies sharing an upstream (with other dependencies) are
+    # populated as worktrees of a single shared repository
+    if opts.worktrees_dir and not paths and GIT.supports('worktree'):
+        added = _fetch_worktree(opts)
+        if added is not None:
+            return added and _update_submodules(opts, target_dir)
+
+        verbose('branch is used by another worktree; cloning: {}', name)
+
+    # a specific revision is acquired by only fetching the revision into a
+    # new repository
+    if opts.revision:
+        if not GIT.execute(['init', '--quiet', target_dir]):
+            err('unable to initialize git repository')
+            return False
+
+        if not GIT.execute(['remote', 'add', 'origin', site],
+                cwd=target_dir):
+            err('unable to configure git remote')
+            return False
+
+        if paths and not GIT.execute(['sparse-checkout', 'set', '--cone',
+                '--'] + paths, cwd=target_dir):
+            err('unable to configure sparse checkout')
+            return False
+
+        if not _fetch_revision(opts, target_dir, partial=bool(paths)):
+            return False
+
+        return _update_submodules(opts, target_dir)
+
+    # limit the clone to a single branch/tag (if configured)
+    ref_args = []
+    ref = opts.branch or opts.tag
+    if ref:
+        ref_args = ['--branch', ref, '--single-branch']
+
+    # a sparse checkout only requires the blobs of its paths; perform a
+    # partial clone (when supported by the remote) and populate the working
+    # tree once the sparse checkout has been configured
+    if paths:
+        clone_args = ['clone', site, '--progress'] + _filter_args() + \
+            ['--no-checkout'] + ref_args + [target_dir]
+
+        if not GIT.execute(clone_args):
+            err('unable to clone git repository')
+            return False
+
+        if not GIT.execute(['sparse-checkout', 'set', '--cone', '--'] + paths,
+                cwd=target_dir):
+            err('unable to configure sparse checkout')
+            return False
+
+        if not GIT.execute(_checkout_args(opts) + ['checkout',
+                '--progress'], cwd=target_dir):
+            err('unable to checkout git repository')
+            return False
+
+        return _update_submodules(opts, target_dir)
+
+    with _cached_mirror(site, opts.cache_dir) as mirror_dir:
+        clone_args = _checkout_args(opts) + ['clone', site, '--progress'] + \
+            ref_args + [target_dir]
+
+        # if a mirror is available, use it as a reference to only transfer
+        # objects not already known locally; dissociating the reference after
+        # the clone to ensure the clone does not depend on the cache
+        if mirror_dir:
+            clone_args.extend([
+                '--reference-if-able', mirror_dir,
+                '--dissociate',
+            ])
+
+        if not GIT.execute(clone_args):
+            err('unable to clone git repository')
+            return False
+
+    return _update_submodules(opts, target_dir)
+
+
+def discover(opts):
+    """
+    support discovering configurations from git sources
+
+    With provided fetch options (``FetchOptions``), any fetchdep
+    configuration provided by the site's configured revision/branch/tag (or
+    default branch) is acquired without cloning the repository. A shallow,
+    blob-less fetch of the reference is performed into a temporary
+    repository, after which only the blobs of configuration files are
+    downloaded.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    site = opts.site
+
+    if not GIT.exists():
+        return None
+
+    discover_dir = tempfile.mkdtemp(prefix='.fetchdep-discover-')
+    try:
+        if not GIT.execute(['init', '--quiet', '--bare'],
+                cwd=discover_dir, quiet=True):
+            return None
+
+        if not GIT.execute(['remote', 'add', 'origin', site],
+                cwd=discover_dir, quiet=True):
+            return None
+
+        ref = opts.revision or opts.branch or opts.tag or 'HEAD'
+        if not GIT.execute(['fetch', '--quiet', '--depth', '1'] +
+                _filter_args() + ['origin', ref],
+                cwd=discover_dir, quiet=True):
+            debug('unable to fetch configurations from site: {}', site)
+            return None
+
+        rv, out = GIT.execute_rv('ls-tree', '--name-only', 'FETCH_HEAD',
+            cwd=discover_dir)
+        if rv != 0:
+            return None
+
+        configs = {}
+        entries = out.splitlines()
+        for cfg_name in SUPPORTED_CONFIG_NAMES:
+            if cfg_name not in entries:
+                continue
+
+            rv, content = GIT.execute_output('cat-file', 'blob',
+                'FETCH_HEAD:' + cfg_name, cwd=discover_dir)
+            if rv != 0:
+                return None
+
+            configs[cfg_name] = content
+    finally:
+        path_remove(discover_dir)
+
+    return configs
+
+
+def update(opts):
+    """
+    support updating existing git sources
+
+    With provided fetch options (``FetchOptions``), an existing clone will be
+    updated with its upstream. Before pulling any content, the upstream's
+    reference is compared with the local history; if the upstream commit is
+    already known locally, no pull is performed. A clone pinned to a revision
+    or tag is only updated if the configured reference has changed. If the
+    configured branch has changed, the clone is switched to the new branch.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    name = opts.name
+    target_dir = opts.target_dir
+
+    if not GIT.exists():
+        err('unable to update package; git is not installed')
+        return UpdateResult.FAILED
+
+    pinned_ref = opts.revision or opts.tag
+    if pinned_ref:
+        _, old_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+        _, rev = GIT.execute_rv('rev-parse', '--verify', '--quiet',
+            pinned_ref + '^{commit}', cwd=target_dir)
+        if rev and rev == old_rev:
+            verbose('already at configured revision: {}', name)
+            return UpdateResult.UNCHANGED
+
+        note('updating {}...', name)
+
+        if not _fetch_revision(opts, target_dir):
+            return UpdateResult.FAILED
+
+        if not _update_submodules(opts, target_dir):
+            return UpdateResult.FAILED
+
+        _, new_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+        if old_rev == new_rev:
+            return UpdateResult.UNCHANGED
+
+        return UpdateResult.UPDATED
+
+    rv, branch = GIT.execute_rv('symbolic-ref', '--quiet', '--short', 'HEAD',
+        cwd=target_dir)
+    if opts.branch and (rv != 0 or branch != opts.branch):
+        return _switch_branch(opts, target_dir)
+
+    if rv != 0:
+        verbose('not on a branch; skipping update: {}', name)
+        return UpdateResult.UNCHANGED
+
+    _, remote = GIT.execute_rv('config', 'branch.{}.remote'.format(branch),
+        cwd=target_dir)
+    _, merge = GIT.execute_rv('config', 'branch.{}.merge'.format(branch),
+        cwd=target_dir)
+    if not remote or not merge:
+        verbose('no upstream configured; skipping update: {}', name)
+        return UpdateResult.UNCHANGED
+
+    # compare the upstream's reference against the local history, to avoid
+    # a pull when the upstream commit is already known
+    rv, out = GIT.execute_rv('ls-remote', '--quiet', remote, merge,
+        cwd=target_dir)
+    if rv == 0 and out:
+        upstream_rev = out.split()[0]
+        rv, _ = GIT.execute_rv('merge-base', '--is-ancestor', upstream_rev,
+            'HEAD', cwd=target_dir)
+        if rv == 0:
+            verbose('already up-to-date: {}', name)
+            return UpdateResult.UNCHANGED
+
+    note('updating {}...', name)
+
+    _, old_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+    if not GIT.execute(['pull', '--ff-only', '--progress'], cwd=target_dir):
+        err('unable to update git repository')
+        return UpdateResult.FAILED
+
+    if not _update_submodules(opts, target_dir):
+        return UpdateResult.FAILED
+
+    _, new_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+    if old_rev == new_rev:
+        return UpdateResult.UNCHANGED
+
+    return UpdateResult.UPDATED
+
+
+def _fetch_worktree(opts):
+    """
+    fetch a dependency as a worktree of a shared repository
+
+    Ensures a shared bare repository for the dependency's upstream exists
+    (and is up-to-date) and adds a new worktree for the configured reference
+    (or the upstream's default branch). Object storage and transfers are
+    shared by all dependencies of the same upstream. Since a branch can only
+    be checked out by a single worktree, a dependency tracking a branch
+    already used by another worktree cannot be added.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        ``True`` if the worktree has been added; ``False`` if the worktree
+        could not be added; ``None`` if the dependency's branch is already
+        used by another worktree
+    """
+
+    site = opts.site
+    target_dir = opts.target_dir
+
+    repo_dir = cache_entry_path(opts.worktrees_dir, GIT_CACHE_CATEGORY, site)
+    with cache_entry_lock(repo_dir) as locked:
+        if not locked:
+            return False
+
+        if os.path.isdir(repo_dir):
+            verbose('refreshing shared repository: {}', repo_dir)
+            if not GIT.execute(['fetch', '--prune', '--tags', '--progress',
+                    'origin'], cwd=repo_dir):
+                warn('unable to refresh shared repository; may be outdated')
+        else:
+            verbose('creating shared repository: {}', repo_dir)
+
+            def build_repo(path):
+                with _cached_mirror(site, opts.cache_dir) as mirror_dir:
+                    clone_args = ['clone', '--bare', '--progress', site, path]
+                    if mirror_dir:
+                        clone_args.extend([
+                            '--reference-if-able', mirror_dir,
+                            '--dissociate',
+                        ])
+
+                    if not GIT.execute(clone_args):
+                        return False
+
+                # track remote branches (a bare clone maps remote branches
+                # directly to local branches), allowing worktrees to track
+                # their upstream branch
+                return GIT.execute(['config', 'remote.origin.fetch',
+                    '+refs/heads/*:refs/remotes/origin/*'], cwd=path) and \
+                    GIT.execute(['fetch', '--quiet', 'origin'], cwd=path)
+
+            if not populate_cache_entry(repo_dir, build_repo):
+                err('unable to prepare shared repository')
+                return False
+
+        # forget any worktrees which no longer exist (e.g. a removed
+        # dependency or an interrupted staged fetch), which would otherwise
+        # prevent their branches from being checked out again
+        if not GIT.execute(['worktree', 'prune'], cwd=repo_dir, quiet=True):
+            warn('unable to prune worktrees of shared repository: {}',
+                repo_dir)
+
+        # determine the branch to track (if any) when no revision/tag is
+        # configured, defaulting to the upstream's default branch
+        worktree_args = _checkout_args(opts) + ['worktree', 'add']
+        if opts.revision or opts.tag:
+            ref = opts.revision or opts.tag
+            rv, _ = GIT.execute_rv('cat-file', '-e', ref + '^{commit}',
+                cwd=repo_dir)
+            if rv != 0 and not GIT.execute(['fetch', '--progress', 'origin',
+                    ref], cwd=repo_dir):
+                err('unable to fetch revision: {}', ref)
+                return False
+
+            worktree_args.extend(['--detach', target_dir, ref])
+        else:
+            branch = opts.branch
+            if not branch:
+                _, branch = GIT.execute_rv('symbolic-ref', '--short', 'HEAD',
+                    cwd=repo_dir)
+
+            if _worktree_branch_used(repo_dir, branch):
+                return None
+
+            worktree_args.extend(['--track', '-B', branch, target_dir,
+                'origin/' + branch])
+
+        if not GIT.execute(worktree_args, cwd=repo_dir):
+            err('unable to add git worktree')
+            return False
+
+    # the shared repository tracks the location of each worktree; if the
+    # worktree is staged, update the repository once the worktree has been
+    # committed into its final location
+    commit_dir = opts.commit_dir
+    if commit_dir and commit_dir != target_dir:
+        def post_commit(committed):
+            if not committed:
+                _remove_worktree(repo_dir, target_dir)
+                return True
+
+            return _relocate_worktree(repo_dir, commit_dir)
+
+        opts.post_commit = post_commit
+
+    return True
+
+
+def _relocate_worktree(repo_dir, worktree_dir):
+    """
+    update a shared repository's reference to a moved worktree
+
+    Args:
+        repo_dir: the shared repository
+        worktree_dir: the worktree's new location
+
+    Returns:
+        whether the reference has been updated
+    """
+
+    if GIT.supports('worktree-repair'):
+        if not GIT.execute(['worktree', 'repair', worktree_dir],
+                cwd=repo_dir, quiet=True):
+            err('unable to repair git worktree: {}', worktree_dir)
+            return False
+
+        return True
+
+    # older git versions do not support repairing worktrees; update the
+    # worktree's administrative entry directly (where the worktree's git
+    # file may provide a path relative to the worktree)
+    gitfile = os.path.join(worktree_dir, '.git')
+    try:
+        with open(gitfile, encoding='utf_8') as f:
+            admin_dir = f.read().strip().split('gitdir:', 1)[-1].strip()
+        admin_dir = os.path.join(worktree_dir, admin_dir)
+
+        with open(os.path.join(admin_dir, 'gitdir'), 'w',
+                encoding='utf_8') as f:
+            f.write(gitfile + u'\n')
+    except (IOError, OSError) as e:
+        err('unable to relocate git worktree: {}\n'
+            '    {}', worktree_dir, e)
+        return False
+
+    return True
+
+
+def _remove_worktree(repo_dir, worktree_dir):
+    """
+    remove a worktree from a shared repository
+
+    Args:
+        repo_dir: the shared repository
+        worktree_dir: the worktree
+    """
+
+    # if the worktree cannot be removed (e.g. an older git version), its
+    # registration is pruned once the worktree no longer exists
+    if not GIT.execute(['worktree', 'remove', '--force', worktree_dir],
+            cwd=repo_dir, quiet=True):
+        verbose('unable to remove git worktree: {}', worktree_dir)
+
+
+def _worktree_branch_used(repo_dir, branch):
+    """
+    return whether a branch is checked out by a worktree of a repository
+
+    Args:
+        repo_dir: the shared repository
+        branch: the branch
+
+    Returns:
+        whether the branch is checked out
+    """
+
+    rv, out = GIT.execute_rv('worktree', 'list', '--porcelain', cwd=repo_dir)
+    if rv != 0:
+        return False
+
+    return 'branch refs/heads/' + branch in out.splitlines()
+
+
+def _switch_branch(opts, target_dir):
+    """
+    switch a clone to its configured branch
+
+    Fetches the configured branch from the remote and checks out a local
+    branch tracking it (replacing any existing local branch of the same
+    name).
+
+    Args:
+        opts: fetch options
+        target_dir: the repository's directory
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    branch = opts.branch
+
+    note('updating {} (switching to branch: {})...', opts.name, branch)
+
+    _, old_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+
+    # a clone may be limited to its original branch; include the configured
+    # branch in the remote's fetched branches (allowing it to be tracked)
+    if not GIT.execute(['remote', 'set-branches', '--add', 'origin', branch],
+            cwd=target_dir):
+        err('unable to configure git remote')
+        return UpdateResult.FAILED
+
+    if not GIT.execute(['fetch', '--progress', 'origin', branch],
+            cwd=target_dir):
+        err('unable to fetch branch: {}', branch)
+        return UpdateResult.FAILED
+
+    if not GIT.execute(_checkout_args(opts) + ['checkout', '--progress',
+            '-B', branch, '--track', 'origin/' + branch], cwd=target_dir):
+        err('unable to checkout branch: {}', branch)
+        return UpdateResult.FAILED
+
+    if not _update_submodules(opts, target_dir):
+        return UpdateResult.FAILED
+
+    _, new_rev = GIT.execute_rv('rev-parse', 'HEAD', cwd=target_dir)
+    if old_rev == new_rev:
+        return UpdateResult.UNCHANGED
+
+    return UpdateResult.UPDATED
+
+
+def _fetch_revision(opts, target_dir, partial=False):
+    """
+    fetch and checkout a configured revision (or tag)
+
+    Attempts to fetch only the configured revision (or tag) from the remote.
+    If the remote does not allow fetching the revision directly (e.g. an
+    abbreviated commit), all history is fetched instead.
+
+    Args:
+        opts: fetch options
+        target_dir: the repository's directory
+        partial (optional): whether to only fetch blobs when needed
+
+    Returns:
+        ``True`` if the revision has been checked out; ``False`` otherwise
+    """
+
+    filter_args = _filter_args() if partial else []
+
+    # a tag is fetched into its local tag, allowing a later update to detect
+    # that the configured tag is already checked out
+    ref = opts.revision or opts.tag
+    fetch_ref = opts.revision
+    if not fetch_ref:
+        fetch_ref = '+refs/tags/{0}:refs/tags/{0}'.format(opts.tag)
+
+    # a worktree's repository is shared; never make it shallow
+    depth_args = ['--depth', '1']
+    if os.path.isfile(os.path.join(target_dir, '.git')):
+        depth_args = []
+
+    checkout_ref = 'FETCH_HEAD'
+    if not GIT.execute(['fetch', '--progress'] + depth_args +
+            filter_args + ['origin', fetch_ref], cwd=target_dir):
+        verbose('unable to fetch revision directly; fetching all history')
+        fetch_args = ['fetch', '--progress', '--tags'] + filter_args
+        if os.path.exists(os.path.join(target_dir, '.git', 'shallow')):
+            fetch_args.append('--unshallow')
+
+        if not GIT.execute(fetch_args + ['origin'], cwd=target_dir):
+            err('unable to fetch git repository')
+            return False
+
+        checkout_ref = ref
+
+    if not GIT.execute(_checkout_args(opts) + ['-c',
+            'advice.detachedHead=false', 'checkout', '--progress', '--detach',
+            checkout_ref], cwd=target_dir):
+        err('unable to checkout revision: {}', ref)
         return False
 
     return True
+
+
+def _update_submodules(opts, target_dir):
+    """
+    initialize and update the submodules of a repository (if configured)
+
+    When submodules are enabled for a dependency, all submodules (including
+    nested submodules) are fetched in parallel, using the number of jobs
+    allotted to the fetch. Shallow submodules only fetch the commit required
+    by the superproject.
+
+    Args:
+        opts: fetch options
+        target_dir: the repository's directory
+
+    Returns:
+        ``True`` if submodules are prepared (or not configured); ``False``
+        otherwise
+    """
+
+    submodules = opts.ext.get(CONFIG_SUBMODULES_KEY)
+    if not submodules:
+        return True
+
+    args = ['submodule', 'update', '--init', '--recursive', '--progress']
+    if GIT.supports('submodule-jobs'):
+        args.extend(['--jobs', str(opts.jobs)])
+    if str(submodules).lower() == GIT_SUBMODULES_SHALLOW:
+        args.extend(['--depth', '1', '--recommend-shallow'])
+
+    with opts.timings.measure('submodules'):
+        if not GIT.execute(args, cwd=target_dir):
+            err('unable to fetch git submodules')
+            return False
+
+    verbose('submodules fetched for {} ({:.2f}s; jobs: {})',
+        opts.name, opts.timings.phases['submodules'][-1], opts.jobs)
+
+    return True
+
+
+def _checkout_args(opts):
+    """
+    return configuration arguments used when populating a working tree
+
+    Allows git to checkout files in parallel (using the number of jobs
+    allotted to the fetch), when supported by the host's git.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        list of arguments
+    """
+
+    if opts.jobs > 1 and GIT.supports('checkout-workers'):
+        return ['-c', 'checkout.workers={}'.format(opts.jobs)]
+
+    return []
+
+
+def _filter_args():
+    """
+    return arguments used to request a partial (blob-less) transfer
+
+    Returns:
+        list of arguments (empty if partial clones are not supported by the
+        host's git)
+    """
+
+    if GIT.supports('partial-clone'):
+        return ['--filter=blob:none']
+
+    return []
+
+
+def _sparse_paths(opts):
+    """
+    return the sparse checkout paths configured for a dependency
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        list of paths (empty if no sparse checkout is configured); ``None``
+        if the configured paths are invalid
+    """
+
+    paths = opts.ext.get(CONFIG_PATHS_KEY)
+    if not paths:
+        return []
+
+    if not is_sequence_not_string(paths):
+        paths = [paths]
+
+    final_paths = []
+    for path in paths:
+        final_path = str(path).strip('/') if path is not None else None
+        if not final_path or isinstance(path, dict) or \
+                is_sequence_not_string(path):
+            err('invalid sparse checkout path configured: {}', path)
+            return None
+
+        final_paths.append(final_path)
+
+    return final_paths
+
+
+@contextmanager
+def _cached_mirror(site, cache_dir):
+    """
+    prepare a cached mirror for a site (if any)
+
+    When a cache directory is configured, this call will ensure a bare mirror
+    of the provided site exists in the cache and is up-to-date. The mirror is
+    locked for the duration of the context, preventing other fetchdep
+    processes from refreshing or pruning it while in use.
+
+    Args:
+        site: the site to mirror
+        cache_dir: the cache directory (if any)
+
+    Yields:
+        the mirror's path; ``None`` if no mirror is available
+    """
+
+    if not cache_dir:
+        yield None
+        return
+
+    mirror_dir = cache_entry_path(cache_dir, GIT_CACHE_CATEGORY, site)
+    with cache_entry_lock(mirror_dir) as locked:
+        if not locked:
+            yield None
+            return
+
+        if os.path.isdir(mirror_dir):
+            verbose('refreshing cached mirror: {}', mirror_dir)
+            if not GIT.execute(['fetch', '--prune', '--quiet'],
+                    cwd=mirror_dir):
+                warn('unable to refresh cached mirror; may be outdated')
+        else:
+            verbose('creating cached mirror: {}', mirror_dir)
+
+            def build_mirror(path):
+                return GIT.execute(['clone', '--mirror', '--quiet', site, path])
+
+            if not populate_cache_entry(mirror_dir, build_mirror):
+                warn('unable to prepare cached mirror')
+
+        if os.path.isdir(mirror_dir):
+            touch_cache_entry(mirror_dir)
+            yield mirror_dir
+        else:
+            yield None
@@ -2,9 +2,23 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from contextlib import contextmanager
+from fetchdep.cache import cache_entry_lock
+from fetchdep.cache import cache_entry_path
+from fetchdep.cache import populate_cache_entry
+from fetchdep.cache import touch_cache_entry
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.defs import UpdateResult
 from fetchdep.tool.hg import HG
 from fetchdep.util.log import err
 from fetchdep.util.log import note
+from fetchdep.util.log import verbose
+from fetchdep.util.log import warn
+from io import open  # noqa: A004
+import os
+
+# cache category used to hold pooled mercurial repositories
+HG_CACHE_CATEGORY = 'hg'
 
 
 def fetch(opts):
@@ -12,7 +26,8 @@ def fetch(opts):
     support fetching from mercurial sources
 
     With provided fetch options (``FetchOptions``), the fetch stage
-    will be processed.
+    will be processed. A configured revision, tag or branch limits a clone to
+    the ancestors of the reference.
 
     Args:
         opts: fetch options
@@ -32,8 +47,283 @@ def fetch(opts):
 
     note('fetching {}...', name)
 
-    if not HG.execute(['--verbose', 'clone', site, target_dir]):
+    ref = _configured_ref(opts)
+
+    with _cached_pool(site, opts.cache_dir) as pool_dir:
+        # if a pooled repository is available, perform a local clone from
+        # the pool (which hardlinks the store where possible) and restore
+        # the default path back to the original site
+        if pool_dir:
+            clone_args = ['--verbose', 'clone', pool_dir, target_dir]
+            if ref:
+                clone_args.extend(['--updaterev', ref])
+
+            if not HG.execute(clone_args):
+                err('unable to clone mercurial repository from pool')
+                return False
+
+            return _configure_default_path(target_dir, site)
+
+    clone_args = ['--verbose', 'clone', site, target_dir]
+    if ref:
+        clone_args.extend(['--rev', ref])
+    else:
+        clone_args.extend(_stream_args())
+
+    if not HG.execute(clone_args):
         err('unable to clone mercurial repository')
         return False
 
     return True
+
+
+def discover(opts):
+    """
+    support discovering configurations from mercurial sources
+
+    With provided fetch options (``FetchOptions``), any fetchdep
+    configuration provided by the site's configured reference (or default
+    branch) is acquired without cloning the repository. Mercurial cannot read
+    files from a remote repository; configurations can only be discovered
+    from a pooled repository (requiring a configured cache directory).
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    site = opts.site
+
+    if not HG.exists() or not opts.cache_dir:
+        return None
+
+    ref = _configured_ref(opts) or 'default'
+
+    with _cached_pool(site, opts.cache_dir) as pool_dir:
+        if not pool_dir:
+            return None
+
+        rv, out = HG.execute_rv('files', '--repository', pool_dir,
+            '--rev', ref)
+        if rv != 0:
+            return None
+
+        configs = {}
+        entries = out.splitlines()
+        for cfg_name in SUPPORTED_CONFIG_NAMES:
+            if cfg_name not in entries:
+                continue
+
+            rv, content = HG.execute_output('cat', '--repository', pool_dir,
+                '--rev', ref, cfg_name)
+            if rv != 0:
+                return None
+
+            configs[cfg_name] = content
+
+    return configs
+
+
+def update(opts):
+    """
+    support updating existing mercurial sources
+
+    With provided fetch options (``FetchOptions``), an existing clone will be
+    updated from its default path. Before pulling any content, the default
+    path's head of the active branch is compared with the local history; if
+    the head is already an ancestor of the working directory, no pull is
+    performed. A clone pinned to a revision or tag is only updated if the
+    configured reference has changed.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    name = opts.name
+    target_dir = opts.target_dir
+
+    if not HG.exists():
+        err('unable to update package; hg (mercurial) is not installed')
+        return UpdateResult.FAILED
+
+    pinned_ref = opts.revision or opts.tag
+    if pinned_ref:
+        old_rev = _working_rev(target_dir)
+        rv, rev = HG.execute_rv('log', '--rev', pinned_ref,
+            '--template', '{node}', cwd=target_dir)
+        if rv == 0 and rev and rev == old_rev:
+            verbose('already at configured revision: {}', name)
+            return UpdateResult.UNCHANGED
+
+        note('updating {}...', name)
+
+        if not HG.execute(['--verbose', 'pull', '--rev', pinned_ref],
+                cwd=target_dir):
+            err('unable to update mercurial repository')
+            return UpdateResult.FAILED
+
+        if not HG.execute(['--verbose', 'update', '--rev', pinned_ref],
+                cwd=target_dir):
+            err('unable to update mercurial repository')
+            return UpdateResult.FAILED
+
+        if old_rev == _working_rev(target_dir):
+            return UpdateResult.UNCHANGED
+
+        return UpdateResult.UPDATED
+
+    _, branch = HG.execute_rv('branch', cwd=target_dir)
+
+    # compare the remote head against the local history, to avoid a pull
+    # when the head is already known
+    rv, remote_rev = HG.execute_rv('identify', '--id', '--rev', branch,
+        'default', cwd=target_dir)
+    if rv == 0 and remote_rev:
+        revset = '{} and ancestors(.)'.format(remote_rev)
+        rv, out = HG.execute_rv('log', '--rev', revset,
+            '--template', '{node}', cwd=target_dir)
+        if rv == 0 and out:
+            verbose('already up-to-date: {}', name)
+            return UpdateResult.UNCHANGED
+
+    note('updating {}...', name)
+
+    old_rev = _working_rev(target_dir)
+    if not HG.execute(['--verbose', 'pull', '--update'], cwd=target_dir):
+        err('unable to update mercurial repository')
+        return UpdateResult.FAILED
+
+    if old_rev == _working_rev(target_dir):
+        return UpdateResult.UNCHANGED
+
+    return UpdateResult.UPDATED
+
+
+@contextmanager
+def _cached_pool(site, cache_dir):
+    """
+    prepare a pooled repository for a site (if any)
+
+    When a cache directory is configured, this call will ensure a pooled
+    repository (without a working directory) of the provided site exists in
+    the cache and is up-to-date. The pool is locked for the duration of the
+    context, preventing other fetchdep processes from updating or pruning it
+    while in use.
+
+    Args:
+        site: the site to pool
+        cache_dir: the cache directory (if any)
+
+    Yields:
+        the pool's path; ``None`` if no pool is available
+    """
+
+    if not cache_dir:
+        yield None
+        return
+
+    pool_dir = cache_entry_path(cache_dir, HG_CACHE_CATEGORY, site)
+    with cache_entry_lock(pool_dir) as locked:
+        if not locked:
+            yield None
+            return
+
+        if os.path.isdir(pool_dir):
+            verbose('updating pooled repository: {}', pool_dir)
+            if not HG.execute(['--quiet', 'pull', '--repository', pool_dir,
+                    site]):
+                warn('unable to update pooled repository; may be outdated')
+        else:
+            verbose('creating pooled repository: {}', pool_dir)
+
+            def build_pool(path):
+                return HG.execute(['--quiet', 'clone', '--noupdate'] +
+                    _stream_args() + [site, path])
+
+            if not populate_cache_entry(pool_dir, build_pool):
+                warn('unable to prepare pooled repository')
+
+        if os.path.isdir(pool_dir):
+            touch_cache_entry(pool_dir)
+            yield pool_dir
+        else:
+            yield None
+
+
+def _configured_ref(opts):
+    """
+    return the reference configured for a dependency (if any)
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the revision, tag or branch to fetch; ``None`` if not configured
+    """
+    return opts.revision or opts.tag or opts.branch
+
+
+def _configure_default_path(target_dir, site):
+    """
+    configure the default path of a mercurial repository
+
+    Args:
+        target_dir: the repository
+        site: the site to use as the default path
+
+    Returns:
+        whether the default path was configured
+    """
+
+    hgrc = os.path.join(target_dir, '.hg', 'hgrc')
+    try:
+        with open(hgrc, 'w', encoding='utf_8') as f:
+            f.write(u'[paths]\ndefault = {}\n'.format(site))
+    except (IOError, OSError) as e:
+        err('unable to configure default path: {}\n'
+            '    {}', hgrc, e)
+        return False
+
+    return True
+
+
+def _stream_args():
+    """
+    return arguments used to request a streaming clone
+
+    A streaming clone transfers a repository's store as-is, which avoids the
+    (cpu-bound) processing of changesets by the client. Servers which do not
+    support streaming clones will fallback to a regular clone. Streaming
+    clones cannot be limited to a revision.
+
+    Returns:
+        list of arguments (empty if not supported by the host's mercurial)
+    """
+
+    if HG.supports('stream-clone'):
+        return ['--stream']
+
+    return []
+
+
+def _working_rev(target_dir):
+    """
+    return the working directory's parent revision of a mercurial repository
+
+    Args:
+        target_dir: the repository
+
+    Returns:
+        the revision
+    """
+    _, rev = HG.execute_rv('log', '--rev', '.', '--template', '{node}',
+        cwd=target_dir)
+    return rev
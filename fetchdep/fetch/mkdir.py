@@ -3,6 +3,7 @@
 # Copyright fetchdep
 
 from collections import OrderedDict
+from fetchdep.defs import UpdateResult
 from fetchdep.util.io import makedirs
 from fetchdep.util.log import note
 import os
@@ -30,6 +31,71 @@ def fetch(opts):
 
     note('fetching {}...', name)
 
+    if not makedirs(target_dir):
+        return False
+
+    content = _build_config(site)
+    if content:
+        cfg = os.path.join(target_dir, 'fetchdep.yml')
+        with open(cfg, 'w') as f:
+            f.write(content)
+
+    return True
+
+
+def discover(opts):
+    """
+    test call to emulate discovering a configuration
+
+    With provided fetch options (``FetchOptions``), the configuration which
+    would be provided by a fetch is returned.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    content = _build_config(opts.site)
+    return {'fetchdep.yml': content} if content else {}
+
+
+def update(opts):
+    """
+    test call to emulate updating
+
+    With provided fetch options (``FetchOptions``), the update stage
+    will be processed.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    name = opts.name
+
+    note('updating {}...', name)
+
+    return UpdateResult.UNCHANGED
+
+
+def _build_config(site):
+    """
+    build the configuration content for a site
+
+    Args:
+        site: the site
+
+    Returns:
+        the configuration content; ``None`` if no configuration is needed
+    """
+
     # compile a list of dependencies to add (if any)
     dummy_dependencies = OrderedDict()
     entries = site.split()
@@ -41,15 +107,12 @@ def fetch(opts):
             if name:
                 dummy_dependencies[name] = parts[1] if len(parts) > 1 else ''
 
-    if not makedirs(target_dir):
-        return False
+    if not dummy_dependencies:
+        return None
 
-    if dummy_dependencies:
-        cfg = os.path.join(target_dir, 'fetchdep.yml')
-        with open(cfg, 'w') as f:
-            f.write('fetchdep:\n')
-            for name, extra in dummy_dependencies.items():
-                f.write('  - name: fetchdep-{}\n'.format(name))
-                f.write('    site: mkdir {}\n'.format(extra))
+    content = 'fetchdep:\n'
+    for name, extra in dummy_dependencies.items():
+        content += '  - name: fetchdep-{}\n'.format(name)
+        content += '    site: mkdir {}\n'.format(extra)
 
-    return True
+    return content
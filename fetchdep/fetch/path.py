@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.defs import CONFIG_HARDLINK_KEY
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.defs import UpdateResult
+from fetchdep.util.io import path_remove
+from fetchdep.util.log import err
+from fetchdep.util.log import note
+from fetchdep.util.log import verbose
+from fetchdep.util.tree import copy_tree
+from io import open  # noqa: A004
+import os
+
+
+def fetch(opts):
+    """
+    support fetching from local path sources
+
+    With provided fetch options (``FetchOptions``), the fetch stage
+    will be processed. The contents of the local path are populated into the
+    target directory using reflinks (when supported by the filesystem),
+    hardlinks (when explicitly allowed) or a parallel copy.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        ``True`` if the fetch stage is completed; ``False`` otherwise
+    """
+
+    assert opts
+    name = opts.name
+    site = opts.site
+    target_dir = opts.target_dir
+
+    if not os.path.isdir(site):
+        err('unable to fetch package; local path does not exist: {}', site)
+        return False
+
+    note('fetching {}...', name)
+
+    hardlink = bool(opts.ext.get(CONFIG_HARDLINK_KEY))
+    try:
+        copy_tree(site, target_dir, hardlink=hardlink)
+    except (IOError, OSError) as e:
+        err('unable to copy local path: {}\n'
+            '    {}', site, e)
+        path_remove(target_dir)
+        return False
+
+    return True
+
+
+def discover(opts):
+    """
+    support discovering configurations from local path sources
+
+    With provided fetch options (``FetchOptions``), any fetchdep
+    configuration provided by the local path is read directly.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    site = opts.site
+
+    if not os.path.isdir(site):
+        return None
+
+    configs = {}
+    for cfg_name in SUPPORTED_CONFIG_NAMES:
+        cfg = os.path.join(site, cfg_name)
+        if not os.path.isfile(cfg):
+            continue
+
+        try:
+            with open(cfg, encoding='utf_8') as f:
+                configs[cfg_name] = f.read()
+        except (IOError, OSError):
+            return None
+
+    return configs
+
+
+def update(opts):
+    """
+    support updating existing local path sources
+
+    A populated local path is never updated.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    verbose('local paths are not updated: {}', opts.name)
+    return UpdateResult.UNCHANGED
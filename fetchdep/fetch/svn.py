@@ -2,9 +2,28 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.defs import CONFIG_REVISION_KEY
+from fetchdep.defs import SUPPORTED_CONFIG_NAMES
+from fetchdep.defs import UpdateResult
 from fetchdep.tool.svn import SVN
+from fetchdep.util.io import makedirs
+from fetchdep.util.io import path_remove
 from fetchdep.util.log import err
 from fetchdep.util.log import note
+from fetchdep.util.log import verbose
+import os
+import posixpath
+import tempfile
+
+try:
+    from urllib.parse import unquote
+    from urllib.parse import urlparse
+except ImportError:
+    from urllib import unquote
+    from urlparse import urlparse
+
+# maximum number of dependencies to checkout in a single svn invocation
+SVN_MAX_BATCH = 32
 
 
 def fetch(opts):
@@ -32,8 +51,263 @@ def fetch(opts):
 
     note('fetching {}...', name)
 
-    if not SVN.execute(['checkout', site, target_dir]):
+    if not SVN.execute(['checkout'] + _revision_args(opts) +
+            [site, target_dir]):
         err('unable to checkout module')
         return False
 
     return True
+
+
+def discover(opts):
+    """
+    support discovering configurations from svn sources
+
+    With provided fetch options (``FetchOptions``), any fetchdep
+    configuration provided by the site is acquired directly from the
+    repository without performing a checkout.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        site's configurations could not be discovered
+    """
+
+    assert opts
+    site = opts.site
+
+    if not SVN.exists():
+        return None
+
+    rv, out = SVN.execute_rv(*(['list', '--non-interactive'] +
+        _revision_args(opts) + [site]))
+    if rv != 0:
+        return None
+
+    configs = {}
+    entries = out.splitlines()
+    for cfg_name in SUPPORTED_CONFIG_NAMES:
+        if cfg_name not in entries:
+            continue
+
+        rv, content = SVN.execute_output(*(['cat', '--non-interactive'] +
+            _revision_args(opts) + [site.rstrip('/') + '/' + cfg_name]))
+        if rv != 0:
+            return None
+
+        configs[cfg_name] = content
+
+    return configs
+
+
+def update(opts):
+    """
+    support updating existing svn sources
+
+    With provided fetch options (``FetchOptions``), an existing working copy
+    will be updated. Before updating, the last changed revision of the
+    working copy is compared with the repository's; if both revisions match,
+    no update is performed. A working copy pinned to a revision is updated to
+    the configured revision.
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the update result (``UpdateResult``)
+    """
+
+    assert opts
+    name = opts.name
+    target_dir = opts.target_dir
+
+    if not SVN.exists():
+        err('unable to update package; svn is not installed')
+        return UpdateResult.FAILED
+
+    # compare the last changed revision of the working copy against the
+    # repository, to avoid an update when nothing has changed (requires
+    # svn v1.9+; otherwise, an update is always performed)
+    if SVN.supports('show-item'):
+        rv, url = SVN.execute_rv('info', '--show-item', 'url', target_dir)
+        if opts.revision:
+            _, local_rev = SVN.execute_rv('info', '--show-item', 'revision',
+                target_dir)
+            if local_rev and local_rev == opts.revision:
+                verbose('already at configured revision: {}', name)
+                return UpdateResult.UNCHANGED
+        elif rv == 0 and url:
+            _, local_rev = SVN.execute_rv('info', '--show-item',
+                'last-changed-revision', target_dir)
+            _, remote_rev = SVN.execute_rv('info', '--show-item',
+                'last-changed-revision', url)
+            if local_rev and local_rev == remote_rev:
+                verbose('already up-to-date: {}', name)
+                return UpdateResult.UNCHANGED
+
+    note('updating {}...', name)
+
+    if not SVN.execute(['update'] + _revision_args(opts) + [target_dir]):
+        err('unable to update module')
+        return UpdateResult.FAILED
+
+    return UpdateResult.UPDATED
+
+
+def fetch_batch(opts_list):
+    """
+    support fetching multiple svn sources from a single repository server
+
+    With a provided list of fetch options (``FetchOptions``), the fetch stage
+    will be processed for each entry. Entries are checked out using a single
+    svn invocation (where possible), which avoids starting a new process and
+    authenticating for every dependency. If a batched checkout fails, each
+    entry of the batch is fetched individually to provide an accurate result
+    for each dependency.
+
+    Args:
+        opts_list: list of fetch options
+
+    Returns:
+        list of results for each fetch option entry; ``True`` if the fetch
+        stage is completed; ``False`` otherwise
+    """
+
+    assert opts_list
+
+    if not SVN.exists():
+        err('unable to fetch package; svn is not installed')
+        return [False] * len(opts_list)
+
+    # svn checks out each url into a directory named after the url's basename;
+    # split the batch into rounds where each round has unique names
+    results = [None] * len(opts_list)
+    rounds = []
+    for idx, opts in enumerate(opts_list):
+        basename = _url_basename(opts.site)
+        if not basename:
+            results[idx] = fetch(opts)
+            continue
+
+        for round_ in rounds:
+            if basename not in round_:
+                round_[basename] = idx
+                break
+        else:
+            rounds.append({basename: idx})
+
+    for round_ in rounds:
+        indexes = sorted(round_.values())
+        entries = [(_url_basename(opts_list[idx].site), opts_list[idx])
+            for idx in indexes]
+
+        round_results = None
+        if len(entries) > 1:
+            for _, opts in entries:
+                note('fetching {}...', opts.name)
+
+            round_results = _checkout_batch(entries)
+
+        if round_results is None:
+            round_results = [fetch(opts) for _, opts in entries]
+
+        for idx, result in zip(indexes, round_results):
+            results[idx] = result
+
+    return results
+
+
+def batch_key(dep):
+    """
+    return the batch key for a svn dependency
+
+    Provides a key used to group svn dependencies which can be checked out
+    using a single svn invocation. Dependencies are grouped by their
+    repository server and configured revision.
+
+    Args:
+        dep: the dependency
+
+    Returns:
+        the batch key
+    """
+
+    parsed = urlparse(dep.site)
+    revision = dep.ext.get(CONFIG_REVISION_KEY)
+    return (parsed.scheme.lower(), parsed.netloc.lower(),
+        str(revision) if revision is not None else None)
+
+
+def _checkout_batch(entries):
+    """
+    checkout multiple svn sources with a single svn invocation
+
+    Args:
+        entries: list of 2-tuples (checkout basename, fetch options)
+
+    Returns:
+        list of results for each entry; ``None`` if the batched checkout failed
+    """
+
+    # checkout all entries into an interim container, to be moved into their
+    # respective target directories once completed
+    container_dir = os.path.dirname(entries[0][1].target_dir)
+    if not makedirs(container_dir):
+        return None
+
+    interim_dir = tempfile.mkdtemp(prefix='.fetchdep-svn-', dir=container_dir)
+    try:
+        sites = [opts.site for _, opts in entries]
+        revision_args = _revision_args(entries[0][1])
+        if not SVN.execute(['checkout'] + revision_args + sites +
+                [interim_dir]):
+            verbose('batched checkout failed; checking out individually')
+            return None
+
+        results = []
+        for basename, opts in entries:
+            checkout_dir = os.path.join(interim_dir, basename)
+            try:
+                os.rename(checkout_dir, opts.target_dir)
+                results.append(True)
+            except OSError as e:
+                err('unable to move checkout into place: {}\n'
+                    '    {}', opts.target_dir, e)
+                results.append(False)
+
+        return results
+    finally:
+        path_remove(interim_dir)
+
+
+def _revision_args(opts):
+    """
+    build the svn arguments to acquire a configured revision (if any)
+
+    Args:
+        opts: fetch options
+
+    Returns:
+        the arguments (if any)
+    """
+
+    if opts.revision:
+        return ['--revision', opts.revision]
+
+    return []
+
+
+def _url_basename(url):
+    """
+    return the basename of a url
+
+    Args:
+        url: the url
+
+    Returns:
+        the basename
+    """
+    path = urlparse(url).path.rstrip('/')
+    return unquote(posixpath.basename(path))
@@ -2,6 +2,9 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.defs import DEFAULT_CACHE_MAX_SIZE
+from fetchdep.util.log import warn
+from fetchdep.util.string import parse_size
 import multiprocessing
 import os
 
@@ -19,34 +22,48 @@ class FetchdepEngineOptions:
     Attributes:
         all_tags: include all dependencies that have tags
         assume_yes: automatically answer yes for any question
+        cache_dir: directory to hold cached content shared between workspaces
+        cache_max_size: maximum size (in bytes) of the cache directory
         conf_point: fetchdep configuration
         debug: whether debug messages are shown
         dry_run: perform a dry-run of what will be fetched
         dump_state: whether to only dump the running state
+        events_file: file to write machine-readable events of a run into
+        live_output: relay output of parallel fetches as it is generated
         no_color_out: whether colored messages are shown
         parallel: number of calculated jobs to allow at a given time
+        progress: show an aggregated progress display while fetching
         recursive: allow fetching dependency's dependencies
         required: require that the default configuration exists
         skip_missing: continue even if a dependency cannot be fetched
         tags: desired tags to include
         target_dir: the context directory for a run
+        timings: report the time spent in each phase of a run
+        update: refresh existing dependencies
         verbose: whether verbose messages are shown
         work_dir: directory container to clone sources
     """
     def __init__(self, args=None):
         self.all_tags = False
         self.assume_yes = None
+        self.cache_dir = None
+        self.cache_max_size = DEFAULT_CACHE_MAX_SIZE
         self.conf_point = None
         self.debug = False
         self.dry_run = False
         self.dump_state = False
+        self.events_file = None
+        self.live_output = False
         self.no_color_out = False
         self.parallel = 1
+        self.progress = False
         self.recursive = False
         self.required = False
         self.skip_missing = False
         self.tags = []
         self.target_dir = None
+        self.timings = False
+        self.update = False
         self.verbose = False
         self.work_dir = None
 
@@ -72,15 +89,25 @@ class FetchdepEngineOptions:
         if args.work_dir:
             self.work_dir = os.path.abspath(args.work_dir)
 
+        if args.cache_dir:
+            self.cache_dir = os.path.abspath(args.cache_dir)
+
+        if args.events_file:
+            self.events_file = os.path.abspath(args.events_file)
+
         self.all_tags = args.all_tags
         self.conf_point = args.config
         self.debug = args.debug
         self.dry_run = args.dry_run
         self.dump_state = args.state
+        self.live_output = args.live_output
         self.no_color_out = args.nocolorout
+        self.progress = args.progress
         self.recursive = args.recursive
         self.required = args.required
         self.skip_missing = args.skip_missing
+        self.timings = args.timings
+        self.update = args.update
         self.verbose = args.verbose
 
         if args.tag:
@@ -113,6 +140,17 @@ class FetchdepEngineOptions:
         if os.getenv('FETCHDEP_VERBOSE'):
             self.verbose = True
 
+        cache_dir = os.getenv('FETCHDEP_CACHE_DIR')
+        if cache_dir and not self.cache_dir:
+            self.cache_dir = os.path.abspath(cache_dir)
+
+        cache_max_size = os.getenv('FETCHDEP_CACHE_MAX_SIZE')
+        if cache_max_size:
+            try:
+                self.cache_max_size = parse_size(cache_max_size)
+            except ValueError:
+                warn('ignoring invalid cache size: {}', cache_max_size)
+
     def _finalize_options(self):
         """
         finalize all engine options for use
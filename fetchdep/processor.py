@@ -3,29 +3,64 @@
 # Copyright fetchdep
 
 from fetchdep.config import find_configuration
+from fetchdep.defs import CONFIG_BRANCH_KEY
+from fetchdep.defs import CONFIG_REVISION_KEY
+from fetchdep.defs import CONFIG_TAG_KEY
+from fetchdep.defs import UpdateResult
+from fetchdep.defs import WORKTREES_DIR_NAME
+from fetchdep.events import disk_usage
+from fetchdep.fetch import FetchBatchRequest
 from fetchdep.fetch import FetchOptions
+from fetchdep.progress import PROGRESS_RENDER_INTERVAL
+from fetchdep.progress import ProgressOutput
+from fetchdep.staging import commit_staging
+from fetchdep.staging import staging_dirs
+from fetchdep.timings import monotonic
+from fetchdep.tool import seed_tools
 from fetchdep.util.io import redirect_output
 from fetchdep.util.log import fetchdep_log_configuration
+from fetchdep.util.log import fetchdep_log_flush_configuration
+from fetchdep.util.log import flush_pending
+from fetchdep.util.log import flush_stdout
+from fetchdep.util.log import is_verbose
 from fetchdep.util.log import log
+from fetchdep.util.spool import SpooledOutput
 from multiprocessing import Event
 from multiprocessing import Lock
 from multiprocessing import Queue
 from multiprocessing import Value
+import multiprocessing
 import os
+import re
 import signal
 import sys
+import time
 
 try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO
 
+# minimum interval (in seconds) between relayed progress updates of a fetch
+LIVE_OUTPUT_INTERVAL = 0.5
+
+# pattern used to split live output into lines and progress updates
+LIVE_OUTPUT_PATTERN = re.compile(r'([^\r\n]*)(\r\n|\n|\r)')
+
+# amount of trailing output relayed for a successful parallel fetch
+PARALLEL_OUTPUT_TAIL = 64 * 1024
+
 
 class ProcessState:
     def __init__(self):
+        self.completed = Value('i', 0)
+        self.consumed = 0
         self.detected = Queue()
+        self.events = Queue()
         self.failure = Value('b', False)  # noqa: FBT003
         self.log_debug = False
+        self.log_flush = None
+        self.log_fsync = False
         self.log_nocolor = False
         self.log_verbose = False
         self.stderr = None
@@ -34,23 +69,62 @@ class ProcessState:
         self.mtx = Lock()
         self.pending = Value('i', 0)
         self.signal = Event()
+        self.timings = Queue()
+        self.tools = {}
+        self.unchanged = Value('i', 0)
+        self.updated = Value('i', 0)
 
     def queued(self):
         with self.mtx:
             self.pending.value += 1
 
-    def complete(self, result):
+    def complete(self, result, update_result=None):
         with self.mtx:
+            # track the outcome of an update request (if any)
+            if update_result == UpdateResult.UPDATED:
+                self.updated.value += 1
+            elif update_result == UpdateResult.UNCHANGED:
+                self.unchanged.value += 1
+
             # share information back to parent (if any)
             self.detected.put(result)
+            self.completed.value += 1
             self.pending.value -= 1
 
         # notify that a specific dependency has completed its work
         self.signal.set()
 
+    def drain_events(self, events=None, renderer=None):
+        while not self.events.empty():
+            event, fields = self.events.get_nowait()
+            if renderer and event == 'progress':
+                renderer.update(fields['name'], fields)
+            if events:
+                events.emit(event, **fields)
+
+    def drain_timings(self, timings):
+        while not self.timings.empty():
+            phase, duration = self.timings.get_nowait()
+            timings.record(phase, duration)
+
+    def event(self, event, **fields):
+        # events are stamped when they occur (instead of when relayed)
+        fields['time'] = time.time()
+        self.events.put((event, fields))
+
     def msg(self, message):
         self.msgs.put(message)
 
+        # notify that output is available to be relayed
+        self.signal.set()
+
+    def progress_update(self, name, state):
+        # progress is relayed with other events, to keep their order
+        self.event('progress', name=name, **state)
+
+        # notify that progress is available to be rendered
+        self.signal.set()
+
     def failed(self):
         with self.mtx:
             # indicate we have had an issue
@@ -60,25 +134,62 @@ class ProcessState:
         # notify that a specific dependency has completed its work
         self.signal.set()
 
-    def wait(self):
+    def timing(self, phase, duration):
+        self.timings.put((phase, duration))
+
+    def wait(self, renderer=None, events=None, timings=None):
         while True:
-            # wait for a dependency to be processed
-            self.signal.wait()
+            # wait for a dependency to be processed (or messages to relay);
+            # clearing the signal before checking the state, to ensure any
+            # following event will wake this wait -- if progress is waiting to
+            # be rendered, wake up in time to render it
+            timeout = None
+            if renderer and renderer.pending():
+                timeout = PROGRESS_RENDER_INTERVAL
+
+            # flush any messages held by the flush policy before blocking
+            flush_pending()
+            self.signal.wait(timeout)
+            self.signal.clear()
+
+            self.drain_events(events, renderer=renderer)
 
-            # dump any messages generates from the process
+            if timings:
+                self.drain_timings(timings)
+
+            # dump any messages generates from the process, using a single
+            # write for all available messages
+            messages = []
             while not self.msgs.empty():
-                print(self.msgs.get_nowait())
+                message = self.msgs.get_nowait()
+                messages.append(message)
+                if not message.endswith('\n'):
+                    messages.append('\n')
+
+            if messages:
+                if renderer:
+                    renderer.clear()
+                sys.stdout.write(''.join(messages))
+                sys.stdout.flush()
+
+            if renderer:
+                renderer.render()
 
             with self.mtx:
-                # return a new dependency (if any)
-                while not self.detected.empty():
-                    new_dep = self.detected.get_nowait()
+                # return a new dependency (if any); results are consumed
+                # based on the number of completed requests, since a queue may
+                # not immediately report content which has just been put
+                while self.consumed < self.completed.value:
+                    new_dep = self.detected.get()
+                    self.consumed += 1
                     if new_dep:
                         return new_dep
 
                 # if no more dependencies to be fetched or a failure has been
                 # detected, we are done waiting
                 if self.pending.value <= 0 or self.failure.value:
+                    if renderer:
+                        renderer.render(force=True)
                     return None
 
 
@@ -91,12 +202,77 @@ def process_initialization(state):
     fetchdep_log_configuration(
         state.log_debug, state.log_nocolor, state.log_verbose)
 
+    if state.log_flush:
+        fetchdep_log_flush_configuration(state.log_flush, state.log_fsync)
+
+    # use host tools detected by the parent, avoiding each worker from
+    # probing host tools on its first request
+    seed_tools(state.tools)
+
+
+def discover(req, opts):
+    """
+    discover the configurations provided by a dependency
+
+    Invokes a discovery request for a dependency, acquiring any fetchdep
+    configurations provided by the dependency's site without fetching the
+    dependency itself.
+
+    Args:
+        req: the discovery request
+        opts: engine options
+
+    Returns:
+        dictionary of configuration names to their content; ``None`` if the
+        dependency's configurations could not be discovered
+    """
+
+    return req.fetcher(_build_fetch_options(req, opts))
+
 
 def process(req, opts):
-    fetch_opts = FetchOptions()
-    fetch_opts.name = req.dep.name
-    fetch_opts.site = req.dep.site
-    fetch_opts.target_dir = req.target_dir
+    # a request may be a batch of requests, served by a single fetch call
+    if isinstance(req, FetchBatchRequest):
+        reqs = req.requests
+
+        def invoke(fetch_opts_list):
+            return req.fetcher(fetch_opts_list)
+    else:
+        reqs = [req]
+
+        def invoke(fetch_opts_list):
+            return [req.fetcher(fetch_opts_list[0])]
+
+    # fetch requests populate staging directories which are atomically moved
+    # into their target directories once completed, ensuring an interrupted
+    # fetch never leaves a partial target directory behind
+    def fetcher(fetch_opts_list):
+        if reqs[0].update:
+            return invoke(fetch_opts_list)
+
+        target_dirs = [entry.target_dir for entry in reqs]
+        with staging_dirs(target_dirs) as staged_dirs:
+            if None in staged_dirs:
+                return [False] * len(reqs)
+
+            for fetch_opts, staged_dir in zip(fetch_opts_list, staged_dirs):
+                fetch_opts.target_dir = staged_dir
+
+            results = invoke(fetch_opts_list)
+
+            return [_commit(fetch_opts, result, staged_dir, target_dir)
+                for fetch_opts, result, staged_dir, target_dir
+                in zip(fetch_opts_list, results, staged_dirs, target_dirs)]
+
+    fetch_opts_list = [_build_fetch_options(entry, opts) for entry in reqs]
+
+    names = ', '.join(entry.dep.name for entry in reqs)
+
+    start = monotonic()
+    if opts.events_file:
+        for entry in reqs:
+            process_state.event('started', name=entry.dep.name,
+                update=entry.update)
 
     new_target = StringIO()
     try:
@@ -110,31 +286,273 @@ def process(req, opts):
             sys.stdout = new_target
 
         if opts.dry_run:
-            log('[dry-run] perform fetch of site ({}: {}): {}',
-                req.dep.name, req.dep.vcs, req.dep.site)
-            fetched = True
+            results = []
+            for entry in reqs:
+                if entry.update:
+                    log('[dry-run] perform update of site ({}: {}): {}',
+                        entry.dep.name, entry.dep.vcs, entry.dep.site)
+                    results.append(UpdateResult.UNCHANGED)
+                else:
+                    log('[dry-run] perform fetch of site ({}: {}): {}',
+                        entry.dep.name, entry.dep.vcs, entry.dep.site)
+                    results.append(True)
+        elif opts.progress:
+            # report the progress of the fetch to the parent process, which
+            # renders the progress of all fetches; the output of the fetch is
+            # spooled and only relayed (through the parent) if it fails
+            vcs = reqs[0].dep.vcs
+            with SpooledOutput() as spool:
+                with ProgressOutput(names, vcs, spool,
+                        process_state.progress_update) as progress:
+                    with redirect_output(progress):
+                        results = fetcher(fetch_opts_list)
+
+                if not all(_succeeded(entry, result)
+                        for entry, result in zip(reqs, results)):
+                    output = StringIO()
+                    output.write('[progress] output: {}\n'.format(names))
+                    spool.relay(output)
+                    process_state.msg(output.getvalue())
+        elif opts.parallel > 1 and opts.live_output:
+            with process_state.mtx:
+                log('[parallel] started: {}', names)
+
+            # relay output to the parent process as it is generated
+            with _LiveOutput(names, process_state.msg) as live:
+                with redirect_output(live):
+                    results = fetcher(fetch_opts_list)
         elif opts.parallel > 1:
             with process_state.mtx:
-                log('[parallel] started: {}', req.dep.name)
+                log('[parallel] started: {}', names)
 
-            with redirect_output() as stream:
-                fetched = req.fetcher(fetch_opts)
+            # spool the output of the fetch (which may be large) to be
+            # relayed once completed; the complete output is only relayed
+            # for a failed fetch (or when verbose)
+            with SpooledOutput() as spool:
+                with redirect_output(spool):
+                    results = fetcher(fetch_opts_list)
 
-            with process_state.mtx:
-                log('[parallel] output: {}', req.dep.name)
-                log(stream.getvalue())
+                limit = PARALLEL_OUTPUT_TAIL
+                if is_verbose() or not all(
+                        _succeeded(entry, result)
+                        for entry, result in zip(reqs, results)):
+                    limit = None
+
+                with process_state.mtx:
+                    log('[parallel] output: {}', names)
+                    spool.relay(sys.stdout, limit=limit)
+                    flush_stdout()
         else:
-            fetched = req.fetcher(fetch_opts)
+            results = fetcher(fetch_opts_list)
 
-        if fetched:
-            cfg = None
-            if opts.recursive and req.dep.recursive:
-                cfg = find_configuration(req.target_dir)
+        # report the results of each individual request; requests served
+        # together (a batch) are each reported an equal share of the batch's
+        # duration, so that durations across requests sum to the time spent
+        duration = (monotonic() - start) / len(reqs)
+        for entry, fetch_opts, result in zip(reqs, fetch_opts_list, results):
+            update_result = None
+            if entry.update:
+                update_result = result
 
-            process_state.complete(cfg)
-        else:
-            process_state.failed()
+            if opts.events_file:
+                process_state.event('finished',
+                    bytes=disk_usage(entry.target_dir),
+                    duration=duration,
+                    exit_code=0 if _succeeded(entry, result) else 1,
+                    name=entry.dep.name,
+                    result=update_result,
+                )
+
+            if opts.timings:
+                process_state.timing(
+                    'update' if entry.update else 'fetch', duration)
+
+                # include any steps measured by the handler (e.g. submodules)
+                for phase, durations in fetch_opts.timings.phases.items():
+                    for phase_duration in durations:
+                        process_state.timing(phase, phase_duration)
+
+            if _succeeded(entry, result):
+                cfg = None
+                if opts.recursive and entry.dep.recursive:
+                    cfg = find_configuration(entry.target_dir)
+
+                process_state.complete(cfg, update_result=update_result)
+            else:
+                process_state.failed()
     finally:
+        # the worker may now idle; flush any messages held by the flush policy
+        flush_pending()
+
         messages = new_target.getvalue()
         if messages:
             process_state.msg(messages)
+
+
+class _LiveOutput(object):
+    def __init__(self, name, send, interval=LIVE_OUTPUT_INTERVAL):
+        """
+        a file-like writer which relays output lines prefixed with a name
+
+        Written output is split into lines, where each line is prefixed with
+        the provided name (e.g. ``[name] line``) and relayed using the ``send``
+        callback. All complete lines of a write are relayed together. Progress
+        updates (lines ending with only a carriage return) are rate-limited,
+        where only the most recent update is relayed at most once per
+        ``interval`` seconds. A write ending with a carriage return is only
+        considered a progress update once the next write is known to not
+        start with a new line (completing a carriage return-new line pair).
+
+        Args:
+            name: the name to prefix lines with
+            send: the callback to relay lines with
+            interval (optional): minimum interval between progress updates
+        """
+        self._interval = interval
+        self._last_progress = 0
+        self._pending = ''
+        self._prefix = '[{}] '.format(name)
+        self._send = send
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._pending:
+            self._send(self._prefix + self._pending.rstrip() + '\n')
+            self._pending = ''
+
+    def flush(self):
+        pass
+
+    def write(self, data):
+        buf = self._pending + data
+
+        # a trailing carriage return may be followed by a new line in the
+        # next write; hold it back until the line's ending is known
+        limit = len(buf)
+        if buf.endswith('\r'):
+            limit -= 1
+
+        lines = []
+        progress = None
+        end = 0
+        for match in LIVE_OUTPUT_PATTERN.finditer(buf, 0, limit):
+            end = match.end()
+            if match.group(2) == '\r':
+                progress = match.group(1)
+            else:
+                lines.append(match.group(1))
+                progress = None
+
+        self._pending = buf[end:]
+
+        output = ''.join(self._prefix + line.rstrip() + '\n' for line in lines)
+
+        now = time.time()
+        if progress and now - self._last_progress >= self._interval:
+            output += self._prefix + progress.rstrip() + '\n'
+            self._last_progress = now
+
+        if output:
+            self._send(output)
+
+
+def _build_fetch_options(req, opts):
+    """
+    build fetch options for a request
+
+    Args:
+        req: the fetch request
+        opts: engine options
+
+    Returns:
+        the fetch options
+    """
+
+    fetch_opts = FetchOptions()
+    fetch_opts.branch = _ext_string(req.dep.ext, CONFIG_BRANCH_KEY)
+    fetch_opts.cache_dir = opts.cache_dir
+    fetch_opts.commit_dir = req.target_dir
+    fetch_opts.ext = dict(req.dep.ext)
+    # share the available processors across all parallel fetches
+    parallel = opts.parallel or 1
+    fetch_opts.jobs = max(multiprocessing.cpu_count() // parallel, 1)
+    fetch_opts.name = req.dep.name
+    fetch_opts.revision = _ext_string(req.dep.ext, CONFIG_REVISION_KEY)
+    fetch_opts.site = req.dep.site
+    fetch_opts.source_dir = req.source_dir
+    fetch_opts.tag = _ext_string(req.dep.ext, CONFIG_TAG_KEY)
+    fetch_opts.target_dir = req.target_dir
+    if req.shared:
+        fetch_opts.worktrees_dir = os.path.join(opts.work_dir,
+            WORKTREES_DIR_NAME)
+    return fetch_opts
+
+
+def _commit(fetch_opts, result, staged_dir, target_dir):
+    """
+    commit the staged content of a fetch request
+
+    Args:
+        fetch_opts: the fetch options of the request
+        result: the result of the fetch
+        staged_dir: the staged target path
+        target_dir: the target directory
+
+    Returns:
+        whether the target directory is populated
+    """
+
+    if not result or not commit_staging(staged_dir, target_dir):
+        return False
+
+    # staged content which remains has been discarded (e.g. the target
+    # directory was populated by another process)
+    if fetch_opts.post_commit:
+        return fetch_opts.post_commit(not os.path.exists(staged_dir))
+
+    return True
+
+
+def _ext_string(ext, key):
+    """
+    return an extension option's value as a string
+
+    Configured values may be interpreted as non-string types (e.g. a numeric
+    revision); values are normalized into a string.
+
+    Args:
+        ext: extension options
+        key: the option's key
+
+    Returns:
+        the string value; ``None`` if the option is not configured
+    """
+
+    value = ext.get(key)
+    if value is None:
+        return None
+
+    return str(value).strip() or None
+
+
+def _succeeded(req, result):
+    """
+    return whether the result of a request is successful
+
+    Args:
+        req: the fetch request
+        result: the result of the fetch/update
+
+    Returns:
+        whether the request has succeeded
+    """
+
+    if req.update:
+        return result != UpdateResult.FAILED
+
+    return bool(result)
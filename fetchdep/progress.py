@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.defs import SiteVcsType
+import re
+import sys
+import time
+
+try:
+    from shutil import get_terminal_size
+except ImportError:
+    get_terminal_size = None
+
+# minimum interval (in seconds) between progress events sent for a fetch
+PROGRESS_EVENT_INTERVAL = 0.2
+
+# minimum interval (in seconds) between rendering the progress display
+PROGRESS_RENDER_INTERVAL = 0.2
+
+# pattern used to split output into lines and progress updates
+PROGRESS_LINE_PATTERN = re.compile(r'([^\r\n]*)(\r\n|\n|\r)')
+
+# units used by git when reporting transferred bytes
+GIT_BYTE_UNITS = {
+    'bytes': 1,
+    'KiB': 1024,
+    'MiB': 1024 ** 2,
+    'GiB': 1024 ** 3,
+}
+
+# pattern used to parse git's progress output (e.g.
+# ``Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s``)
+GIT_PROGRESS_PATTERN = re.compile(
+    r'^(?:remote: )?(?P<phase>[A-Za-z][A-Za-z ]+?):\s+(?P<percent>\d+)%'
+    r'\s+\((?P<current>\d+)/(?P<total>\d+)\)'
+    r'(?:,\s+(?P<size>[\d.]+)\s+(?P<unit>bytes|KiB|MiB|GiB))?')
+
+# pattern used to parse mercurial's change summary (e.g.
+# ``added 3 changesets with 5 changes to 4 files``)
+HG_ADDED_PATTERN = re.compile(
+    r'^added (?P<changesets>\d+) changesets with \d+ changes to '
+    r'(?P<files>\d+) files')
+
+# pattern used to parse mercurial's phase output (e.g. ``adding manifests``)
+HG_PHASE_PATTERN = re.compile(
+    r'^(?P<phase>adding (?:changesets|manifests|file changes))$')
+
+# pattern used to parse mercurial's working directory summary (e.g.
+# ``4 files updated, 0 files merged, 0 files removed, 0 files unresolved``)
+HG_UPDATED_PATTERN = re.compile(r'^(?P<files>\d+) files updated,')
+
+# pattern used to parse svn's checked out/updated entries (e.g. ``A    file``)
+SVN_ENTRY_PATTERN = re.compile(r'^[ADGRU][ ADGRUC][ B][ C]? +\S')
+
+# pattern used to parse svn's completion (e.g. ``Checked out revision 5.``)
+SVN_REVISION_PATTERN = re.compile(
+    r'^(?:Checked out|Updated to|At) revision (?P<revision>\d+)\.')
+
+
+class ProgressParser(object):
+    def __init__(self, vcs):
+        """
+        a parser of version control progress output
+
+        Parses lines of output generated by a version control tool (git,
+        mercurial or svn) into a progress state. The state is a dictionary
+        which may hold the current ``phase`` of a fetch, a ``percent``
+        complete, the ``current``/``total`` number of items processed in the
+        phase, the number of ``bytes`` received and the number of ``files``
+        checked out.
+
+        Args:
+            vcs: the version control system type of the output
+
+        Attributes:
+            state: the current progress state
+        """
+        self.state = {}
+        self._parse = {
+            SiteVcsType.GIT: self._parse_git,
+            SiteVcsType.HG: self._parse_hg,
+            SiteVcsType.SVN: self._parse_svn,
+        }.get(vcs)
+
+    def feed(self, line):
+        """
+        feed a line of output into the parser
+
+        Args:
+            line: the line
+
+        Returns:
+            ``True`` if the line updated the progress state; ``False``
+            otherwise
+        """
+        if not self._parse:
+            return False
+
+        return self._parse(line.strip())
+
+    def _parse_git(self, line):
+        match = GIT_PROGRESS_PATTERN.match(line)
+        if not match:
+            return False
+
+        phase = match.group('phase').lower()
+        self.state['phase'] = phase
+        self.state['percent'] = int(match.group('percent'))
+        self.state['current'] = int(match.group('current'))
+        self.state['total'] = int(match.group('total'))
+
+        if match.group('size'):
+            self.state['bytes'] = int(float(match.group('size')) *
+                GIT_BYTE_UNITS[match.group('unit')])
+
+        if phase in ('checking out files', 'updating files'):
+            self.state['files'] = self.state['current']
+
+        return True
+
+    def _parse_hg(self, line):
+        match = HG_PHASE_PATTERN.match(line)
+        if match:
+            self.state['phase'] = match.group('phase')
+            return True
+
+        match = HG_ADDED_PATTERN.match(line)
+        if match:
+            self.state['phase'] = 'added changesets'
+            self.state['current'] = int(match.group('changesets'))
+            return True
+
+        match = HG_UPDATED_PATTERN.match(line)
+        if match:
+            self.state['phase'] = 'updating files'
+            self.state['files'] = int(match.group('files'))
+            self.state['percent'] = 100
+            return True
+
+        return False
+
+    def _parse_svn(self, line):
+        if SVN_ENTRY_PATTERN.match(line):
+            self.state['phase'] = 'checking out files'
+            self.state['files'] = self.state.get('files', 0) + 1
+            return True
+
+        match = SVN_REVISION_PATTERN.match(line)
+        if match:
+            self.state['phase'] = 'revision ' + match.group('revision')
+            self.state['percent'] = 100
+            return True
+
+        return False
+
+
+class ProgressOutput(object):
+    def __init__(self, name, vcs, target, send,
+            interval=PROGRESS_EVENT_INTERVAL):
+        """
+        a file-like writer which reports the progress of a fetch
+
+        Written output is forwarded into a target stream (e.g. a spool) while
+        being parsed for progress (see ``ProgressParser``). Progress states
+        are reported using the ``send`` callback (with the provided name), at
+        most once per ``interval`` seconds unless a fetch's phase changes. A
+        final state (with ``finished`` set) is reported when closed.
+
+        Args:
+            name: the name to report progress for
+            vcs: the version control system type of the output
+            target: the stream to forward output into
+            send: the callback to report progress with
+            interval (optional): minimum interval between reports
+        """
+        self._interval = interval
+        self._last_phase = None
+        self._last_sent = 0
+        self._name = name
+        self._parser = ProgressParser(vcs)
+        self._pending = ''
+        self._send = send
+        self._target = target
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._pending:
+            self._parser.feed(self._pending)
+            self._pending = ''
+
+        state = dict(self._parser.state)
+        state['finished'] = True
+        self._send(self._name, state)
+
+    def flush(self):
+        pass
+
+    def write(self, data):
+        self._target.write(data)
+
+        buf = self._pending + data
+        updated = False
+        end = 0
+        for match in PROGRESS_LINE_PATTERN.finditer(buf):
+            end = match.end()
+            if self._parser.feed(match.group(1)):
+                updated = True
+        self._pending = buf[end:]
+
+        if not updated:
+            return
+
+        state = self._parser.state
+        now = time.time()
+        if state.get('phase') != self._last_phase or \
+                now - self._last_sent >= self._interval:
+            self._last_phase = state.get('phase')
+            self._last_sent = now
+            self._send(self._name, dict(state))
+
+
+class ProgressRenderer(object):
+    def __init__(self, stream=None, interval=PROGRESS_RENDER_INTERVAL):
+        """
+        an aggregated progress display
+
+        Tracks the progress states of all in-flight fetches and renders a
+        status line for each fetch, followed by a line of totals. Rendering
+        is throttled to at most once per ``interval`` seconds, where the
+        previously rendered display is replaced. A display is only rendered
+        into a terminal.
+
+        Args:
+            stream (optional): the stream to render into (defaults to
+                standard output)
+            interval (optional): minimum interval between renders
+
+        Attributes:
+            active: progress states of in-flight fetches (by name)
+            finished: the number of finished fetches
+        """
+        self.active = {}
+        self.finished = 0
+        self._bytes = 0
+        self._dirty = False
+        self._interval = interval
+        self._last_render = 0
+        self._lines = 0
+        self._stream = stream if stream else sys.stdout
+
+        try:
+            self._enabled = self._stream.isatty()
+        except (AttributeError, ValueError):
+            self._enabled = False
+
+    def clear(self):
+        """
+        clear the rendered display (if any)
+
+        Should be invoked before writing other output into the stream, where
+        the display is restored on the next render.
+        """
+        if self._lines:
+            self._stream.write('\033[{}A\033[J'.format(self._lines))
+            self._stream.flush()
+            self._lines = 0
+            self._dirty = True
+
+    def pending(self):
+        """
+        return whether progress states are waiting to be rendered
+
+        Returns:
+            whether a render is pending
+        """
+        return self._enabled and self._dirty
+
+    def render(self, force=False):
+        """
+        render the display
+
+        Args:
+            force (optional): whether to ignore the render interval
+        """
+        if not self._enabled or not self._dirty:
+            return
+
+        now = time.time()
+        if not force and now - self._last_render < self._interval:
+            return
+
+        lines = [_format_state(name, self.active[name])
+            for name in sorted(self.active)]
+
+        # keep the display within the terminal
+        columns, rows = 80, 24
+        if get_terminal_size:
+            columns, rows = get_terminal_size()
+
+        if len(lines) > rows - 2:
+            hidden = len(lines) - (rows - 3)
+            lines = lines[:rows - 3]
+            lines.append('... ({} more)'.format(hidden))
+
+        total_bytes = self._bytes + sum(
+            state.get('bytes', 0) for state in self.active.values())
+        lines.append('[progress] active: {}, finished: {}, received: {}'
+            .format(len(self.active), self.finished, _format_size(total_bytes)))
+
+        lines = [line[:columns - 1] for line in lines]
+
+        output = ''
+        if self._lines:
+            output += '\033[{}A\033[J'.format(self._lines)
+        output += ''.join(line + '\n' for line in lines)
+
+        self._stream.write(output)
+        self._stream.flush()
+        self._dirty = False
+        self._last_render = now
+        self._lines = len(lines)
+
+    def update(self, name, state):
+        """
+        update the progress state of a fetch
+
+        Args:
+            name: the name of the fetch
+            state: the progress state
+        """
+        if state.get('finished'):
+            self.active.pop(name, None)
+            self.finished += 1
+            self._bytes += state.get('bytes', 0)
+        else:
+            self.active[name] = state
+
+        self._dirty = True
+
+
+def _format_size(size):
+    """
+    format a size (in bytes) for display
+
+    Args:
+        size: the size
+
+    Returns:
+        the formatted size
+    """
+
+    if size < 1024:  # noqa: PLR2004
+        return '{} B'.format(size)
+
+    for unit in ('KiB', 'MiB'):
+        size /= 1024.0
+        if size < 1024:  # noqa: PLR2004
+            return '{:.1f} {}'.format(size, unit)
+
+    return '{:.1f} GiB'.format(size / 1024.0)
+
+
+def _format_state(name, state):
+    """
+    format the progress state of a fetch for display
+
+    Args:
+        name: the name of the fetch
+        state: the progress state
+
+    Returns:
+        the formatted status line
+    """
+
+    parts = [state.get('phase', 'fetching')]
+    if 'percent' in state:
+        parts.append('{}%'.format(state['percent']))
+    if 'total' in state:
+        parts.append('({}/{})'.format(state.get('current', 0), state['total']))
+    if 'bytes' in state:
+        parts.append(_format_size(state['bytes']))
+    if 'files' in state:
+        parts.append('{} files'.format(state['files']))
+
+    return '{}: {}'.format(name, ' '.join(parts))
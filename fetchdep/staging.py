@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from contextlib import contextmanager
+from fetchdep.util.io import makedirs
+from fetchdep.util.io import path_remove
+from fetchdep.util.lock import file_lock
+from fetchdep.util.log import debug
+from fetchdep.util.log import err
+from fetchdep.util.log import verbose
+import os
+import tempfile
+import time
+
+# lock file held inside a staging directory while it is in use
+STAGING_LOCK_NAME = '.fetchdep-lock'
+
+# prefix of staging directories created alongside target directories
+STAGING_PREFIX = '.fetchdep-staging-'
+
+# age (in seconds) before a staging directory without a lock is stale
+STAGING_STALE_AGE = 60 * 60
+
+
+@contextmanager
+def staging_dir(target_dir):
+    """
+    prepare a staging directory for a target directory
+
+    Creates a staging directory alongside the provided target directory (on
+    the same filesystem), which a fetch-type handler can populate before the
+    content is committed into its target directory (``commit_staging``).
+    The staging directory is locked for the duration of the context to
+    prevent other fetchdep processes from garbage collecting it, and is
+    removed when the context ends.
+
+    Args:
+        target_dir: the target directory
+
+    Yields:
+        the staged target path (which does not exist yet); ``None`` if a
+        staging directory could not be prepared
+    """
+
+    container_dir = os.path.dirname(target_dir)
+    if not makedirs(container_dir):
+        yield None
+        return
+
+    try:
+        dir_ = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=container_dir)
+    except OSError as e:
+        err('unable to prepare staging directory: {}\n'
+            '    {}', container_dir, e)
+        yield None
+        return
+
+    try:
+        with file_lock(os.path.join(dir_, STAGING_LOCK_NAME)):
+            yield os.path.join(dir_, os.path.basename(target_dir))
+    finally:
+        path_remove(dir_)
+
+
+@contextmanager
+def staging_dirs(target_dirs):
+    """
+    prepare staging directories for multiple target directories
+
+    Args:
+        target_dirs: the target directories
+
+    Yields:
+        list of staged target paths (see ``staging_dir``)
+    """
+
+    if not target_dirs:
+        yield []
+        return
+
+    with staging_dir(target_dirs[0]) as first, \
+            staging_dirs(target_dirs[1:]) as remaining:
+        yield [first] + remaining
+
+
+def commit_staging(staged_dir, target_dir):
+    """
+    commit staged content into its target directory
+
+    Atomically moves staged content into its target directory. If the target
+    directory has been populated in the meantime (e.g. by a concurrent
+    fetchdep process), the staged content is discarded.
+
+    Args:
+        staged_dir: the staged target path
+        target_dir: the target directory
+
+    Returns:
+        whether the target directory is populated
+    """
+
+    if os.path.exists(target_dir):
+        verbose('target directory populated by another process: {}',
+            target_dir)
+        return True
+
+    try:
+        os.rename(staged_dir, target_dir)
+    except OSError as e:
+        if os.path.exists(target_dir):
+            return True
+
+        err('unable to move staged content into place: {}\n'
+            '    {}', target_dir, e)
+        return False
+
+    return True
+
+
+def prune_staging(work_dir):
+    """
+    remove stale staging directories from a working directory
+
+    Removes staging directories which are left behind from an interrupted
+    fetchdep process. Staging directories which are actively locked by
+    another process are left untouched.
+
+    Args:
+        work_dir: the working directory
+
+    Returns:
+        the number of staging directories removed
+    """
+
+    if not os.path.isdir(work_dir):
+        return 0
+
+    removed = 0
+    for name in sorted(os.listdir(work_dir)):
+        if not name.startswith(STAGING_PREFIX):
+            continue
+
+        dir_ = os.path.join(work_dir, name)
+        if not os.path.isdir(dir_):
+            continue
+
+        # a staging directory without a lock may have just been created by
+        # another process; only consider it stale after some time
+        lock_file = os.path.join(dir_, STAGING_LOCK_NAME)
+        if os.path.exists(lock_file):
+            with file_lock(lock_file, blocking=False) as locked:
+                stale = locked
+        else:
+            stale = time.time() - os.path.getmtime(dir_) > STAGING_STALE_AGE
+
+        if not stale:
+            debug('staging directory is in use: {}', dir_)
+            continue
+
+        verbose('removing stale staging directory: {}', dir_)
+        if path_remove(dir_):
+            removed += 1
+
+    return removed
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class Timings(object):
+    def __init__(self):
+        """
+        timing measurements of a run
+
+        Tracks the durations of the phases of a run (e.g. parsing
+        configurations or waiting on workers), where a phase may be measured
+        multiple times (e.g. the fetch of each dependency). Durations are
+        measured using a monotonic clock.
+
+        Attributes:
+            phases: durations recorded for each phase (in recorded order)
+        """
+        self.phases = OrderedDict()
+
+    @contextmanager
+    def measure(self, phase):
+        """
+        measure the duration of a phase for the duration of a context
+
+        Args:
+            phase: the phase
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.record(phase, monotonic() - start)
+
+    def record(self, phase, duration):
+        """
+        record the duration of a phase
+
+        Args:
+            phase: the phase
+            duration: the duration (in seconds)
+        """
+        self.phases.setdefault(phase, []).append(duration)
+
+    def report(self):
+        """
+        build a report of all recorded phases
+
+        Returns:
+            list of report lines
+        """
+        lines = ['{:<20} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+            'phase', 'count', 'total', 'min', 'median', 'p95', 'max')]
+
+        for phase, durations in self.phases.items():
+            durations = sorted(durations)
+            lines.append('{:<20} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+                phase,
+                len(durations),
+                _format_duration(sum(durations)),
+                _format_duration(durations[0]),
+                _format_duration(_percentile(durations, 50)),
+                _format_duration(_percentile(durations, 95)),
+                _format_duration(durations[-1]),
+            ))
+
+        return lines
+
+
+def _format_duration(duration):
+    """
+    format a duration for display
+
+    Args:
+        duration: the duration (in seconds)
+
+    Returns:
+        the formatted duration
+    """
+
+    if duration < 1:
+        return '{:.1f}ms'.format(duration * 1000)
+
+    return '{:.2f}s'.format(duration)
+
+
+def _percentile(values, percent):
+    """
+    return the percentile of sorted values (nearest-rank)
+
+    Args:
+        values: the sorted values
+        percent: the percentile
+
+    Returns:
+        the value at the percentile
+    """
+
+    rank = -(-percent * len(values) // 100)
+    return values[max(rank, 1) - 1]
@@ -2,12 +2,26 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.util.compat import compat_replace
 from fetchdep.util.io import execute
+from fetchdep.util.io import execute_output
+from fetchdep.util.io import find_executable
+from fetchdep.util.io import path_remove
 from fetchdep.util.log import debug
 from fetchdep.util.log import err
 from fetchdep.util.string import is_sequence_not_string
+from io import open  # noqa: A004
+from multiprocessing.pool import ThreadPool
+import json
 import os
 import re
+import tempfile
+
+# name of the file (in a cache directory) holding detected host tools
+TOOL_CACHE_NAME = 'tools.json'
+
+# pattern used to extract a version from a tool's version output
+TOOL_VERSION_PATTERN = re.compile(r'(\d+(?:\.\d+)+)')
 
 
 class FetchdepTool(object):
@@ -18,18 +32,22 @@ class FetchdepTool(object):
     existence of a host tool as well as the execution of a host tool.
 
     Attributes:
-        detected: tracking whether or not a tool is available on the host system
+        detected: tracking detection information (see ``probe``) of tools on
+            the host system
 
     Args:
         tool: the file name of the tool
         exists_args (optional): argument value to check for existence (no-op)
         env_sanitize (optional): environment variables to sanitize
         env_include (optional): environment variables to always include
+        capabilities (optional): capabilities mapped to the minimum version
+            of the tool which supports them
     """
     detected = {}
 
     def __init__(self, tool, exists_args=None, env_sanitize=None,
-            env_include=None):
+            env_include=None, capabilities=None):
+        self.capabilities = dict(capabilities) if capabilities else {}
         self.include = env_include
         self.sanitize = env_sanitize
 
@@ -42,7 +60,7 @@ class FetchdepTool(object):
         else:
             self.exists_args = ['--version']
 
-    def execute(self, args=None, cwd=None, quiet=False, env=None, poll=False,
+    def execute(self, args=None, cwd=None, quiet=False, env=None,
             capture=None):
         """
         execute the host tool with the provided arguments (if any)
@@ -54,7 +72,6 @@ class FetchdepTool(object):
             cwd (optional): working directory to use
             quiet (optional): whether or not to suppress output
             env (optional): environment variables to include
-            poll (optional): force polling stdin/stdout for output data
             capture (optional): list to capture output into
 
         Returns:
@@ -62,7 +79,7 @@ class FetchdepTool(object):
             the execution has failed
         """
 
-        rv = self._execute(args=args, cwd=cwd, quiet=quiet, env=env, poll=poll,
+        rv = self._execute(args=args, cwd=cwd, quiet=quiet, env=env,
             capture=capture)
         return (rv == 0)
 
@@ -88,7 +105,56 @@ class FetchdepTool(object):
             capture=out, quiet=True)
         return rv, '\n'.join(out)
 
-    def _execute(self, args=None, cwd=None, quiet=False, env=None, poll=False,
+    def execute_output(self, *args, **kwargs):
+        """
+        execute the host tool with the provided arguments (if any)
+
+        Runs the host tool described by ``args`` until completion. Unlike
+        ``execute_rv``, only the tool's standard output is returned and is
+        returned as-is (e.g. the content of a file printed by the tool),
+        where any warnings reported by the tool are not included.
+
+        Args:
+            *args (optional): arguments to add to the command
+            **cwd: working directory to use
+            **env: environment variables to include
+
+        Returns:
+            the return code and the standard output of the execution request
+        """
+
+        if not self.exists():
+            return 1, ''
+
+        final_args = self._invoked_tool() + list(args)
+        return execute_output(final_args, cwd=kwargs.get('cwd'),
+            env=self._build_env(kwargs.get('env')))
+
+    def _build_env(self, env=None):
+        """
+        build the environment used to execute the host tool
+
+        Args:
+            env (optional): environment variables to include
+
+        Returns:
+            the environment; ``None`` if the existing environment is used
+        """
+
+        final_env = None
+        if self.include or self.sanitize or env:
+            final_env = os.environ.copy()
+            if self.sanitize:
+                for key in self.sanitize:
+                    final_env.pop(key, None)
+            if self.include:
+                final_env.update(self.include)
+            if env:
+                final_env.update(env)
+
+        return final_env
+
+    def _execute(self, args=None, cwd=None, quiet=False, env=None,
             capture=None):
         """
         execute the host tool with the provided arguments (if any)
@@ -100,7 +166,6 @@ class FetchdepTool(object):
             cwd (optional): working directory to use
             quiet (optional): whether or not to suppress output
             env (optional): environment variables to include
-            poll (optional): force polling stdin/stdout for output data
             capture (optional): list to capture output into
 
         Returns:
@@ -114,23 +179,12 @@ class FetchdepTool(object):
                 + str(args))
             return 1
 
-        final_env = None
-        if self.include or self.sanitize or env:
-            final_env = os.environ.copy()
-            if self.sanitize:
-                for key in self.sanitize:
-                    final_env.pop(key, None)
-            if self.include:
-                final_env.update(self.include)
-            if env:
-                final_env.update(env)
-
         final_args = self._invoked_tool()
         if args:
             final_args.extend(args)
 
-        return execute(final_args, cwd=cwd, env=final_env, quiet=quiet,
-            poll=poll, capture=capture)
+        return execute(final_args, cwd=cwd, env=self._build_env(env),
+            quiet=quiet, capture=capture)
 
     def _invoked_tool(self):
         """
@@ -154,14 +208,227 @@ class FetchdepTool(object):
         Returns:
             ``True``, if the tool exists; ``False`` otherwise
         """
-        if self.tool in FetchdepTool.detected:
-            return FetchdepTool.detected[self.tool]
+        return self.probe()['exists']
+
+    def supports(self, capability):
+        """
+        return whether the host tool supports a capability
+
+        Returns whether the installed tool's version is new enough to support
+        a capability registered for the tool (e.g. ``partial-clone`` for git).
+        Unknown capabilities (or tools with an unknown version) are considered
+        unsupported.
+
+        Args:
+            capability: the capability
+
+        Returns:
+            ``True``, if the capability is supported; ``False`` otherwise
+        """
+        required = self.capabilities.get(capability)
+        if required is None:
+            debug('unknown capability for {}: {}', self.tool, capability)
+            return False
+
+        version = self.version()
+        if not version:
+            return False
+
+        return version >= tuple(required)
+
+    def version(self):
+        """
+        return the version of the host tool
+
+        Returns:
+            the version tuple (e.g. ``(2, 39, 5)``); ``None`` if the tool does
+            not exist or its version is unknown
+        """
+        info = self.probe()
+        if not info['exists'] or not info.get('version_info'):
+            return None
+
+        return tuple(info['version_info'])
+
+    def host_tools(self):
+        """
+        return the host tools used by this tool
+
+        Provides the list of host tools which may be invoked when using this
+        tool (e.g. a tool which can route commands through another tool).
+
+        Returns:
+            list of host tools
+        """
+        return [self]
+
+    def probe(self, cache=None):
+        """
+        probe the host tool
+
+        Detects whether the tool is available on the host, along with the
+        tool's resolved path and version. Detection results are tracked for
+        the remainder of the process (or can be seeded using ``seed_tools``).
 
-        if execute([self.tool] + self.exists_args, quiet=True) == 0:
+        Args:
+            cache (optional): previously detected information (keyed by path)
+                to reuse if the tool has not been modified
+
+        Returns:
+            dictionary of detection information (``exists``, ``mtime``,
+            ``path``, ``version`` and ``version_info``)
+        """
+        info = FetchdepTool.detected.get(self.tool)
+        if info is not None:
+            return info
+
+        path = find_executable(self.tool)
+        mtime = None
+        if path:
+            try:
+                mtime = os.path.getmtime(os.path.realpath(path))
+            except OSError:
+                pass
+
+        cached = cache.get(path) if cache and path else None
+        if cached and mtime is not None and cached.get('mtime') == mtime \
+                and 'version_info' in cached:
+            debug('{} tool information loaded from cache', self.tool)
+            info = dict(cached)
+        else:
+            out = []
+            rv = execute([self.tool] + self.exists_args, quiet=True,
+                capture=out)
+
+            version = None
+            version_info = None
+            if rv == 0:
+                version = next((line.strip() for line in out if line.strip()),
+                    None)
+
+                match = TOOL_VERSION_PATTERN.search(version or '')
+                if match:
+                    version_info = [int(v) for v in match.group(1).split('.')]
+
+            info = {
+                'exists': rv == 0,
+                'mtime': mtime,
+                'path': path,
+                'version': version,
+                'version_info': version_info,
+            }
+
+        if info['exists']:
             debug('{} tool is detected on this system', self.tool)
-            FetchdepTool.detected[self.tool] = True
         else:
             debug('{} tool is not detected on this system', self.tool)
-            FetchdepTool.detected[self.tool] = False
 
-        return FetchdepTool.detected[self.tool]
+        FetchdepTool.detected[self.tool] = info
+        return info
+
+
+def probe_tools(tools, cache_dir=None):
+    """
+    probe multiple host tools
+
+    Probes each of the provided host tools (in parallel) and returns the
+    detection information of each tool, which can be shared with other
+    processes (see ``seed_tools``). If a cache directory is provided,
+    detection information is persisted in the cache and reused by future
+    probes until a tool is modified.
+
+    Args:
+        tools: the host tools to probe
+        cache_dir (optional): cache directory to persist information into
+
+    Returns:
+        dictionary of detection information for each tool
+    """
+
+    targets = {}
+    for tool in tools:
+        for host_tool in tool.host_tools():
+            targets.setdefault(host_tool.tool, host_tool)
+
+    if not targets:
+        return {}
+
+    cache = _load_tool_cache(cache_dir) if cache_dir else {}
+
+    pool = ThreadPool(len(targets))
+    try:
+        infos = pool.map(lambda tool: tool.probe(cache=cache),
+            targets.values())
+    finally:
+        pool.close()
+        pool.join()
+
+    if cache_dir:
+        new_cache = dict(cache)
+        for info in infos:
+            if info['exists'] and info['path'] and info['mtime'] is not None:
+                new_cache[info['path']] = info
+
+        if new_cache != cache:
+            _save_tool_cache(cache_dir, new_cache)
+
+    return {key: FetchdepTool.detected[key] for key in targets}
+
+
+def seed_tools(detected):
+    """
+    seed the detection information of host tools
+
+    Registers detection information (from ``probe_tools``) for host tools,
+    allowing a process to use host tools without probing them itself.
+
+    Args:
+        detected: dictionary of detection information for each tool
+    """
+    FetchdepTool.detected.update(detected)
+
+
+def _load_tool_cache(cache_dir):
+    """
+    load detected host tool information from a cache directory
+
+    Args:
+        cache_dir: the cache directory
+
+    Returns:
+        dictionary of detection information keyed by tool path
+    """
+
+    cache_file = os.path.join(cache_dir, TOOL_CACHE_NAME)
+    try:
+        with open(cache_file, encoding='utf_8') as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_tool_cache(cache_dir, cache):
+    """
+    save detected host tool information into a cache directory
+
+    Args:
+        cache_dir: the cache directory
+        cache: dictionary of detection information keyed by tool path
+    """
+
+    cache_file = os.path.join(cache_dir, TOOL_CACHE_NAME)
+    try:
+        fd, tmp_file = tempfile.mkstemp(prefix='.tmp-', dir=cache_dir)
+    except (IOError, OSError) as e:
+        debug('unable to save tool cache: {}', e)
+        return
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        compat_replace(tmp_file, cache_file)
+    except (IOError, OSError) as e:
+        debug('unable to save tool cache: {}', e)
+        path_remove(tmp_file, quiet=True)
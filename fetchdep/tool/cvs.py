@@ -16,5 +16,12 @@ CVS_SANITIZE_ENV_KEYS = [
     'CVS_SERVER',
 ]
 
+# capabilities of cvs mapped to the minimum version supporting them
+CVS_CAPABILITIES = {
+    # listing remote modules (`rls`)
+    'rls': (1, 12),
+}
+
 # cvs host tool helper
-CVS = FetchdepTool(CVS_COMMAND, env_sanitize=CVS_SANITIZE_ENV_KEYS)
+CVS = FetchdepTool(CVS_COMMAND, env_sanitize=CVS_SANITIZE_ENV_KEYS,
+    capabilities=CVS_CAPABILITIES)
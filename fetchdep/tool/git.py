@@ -17,5 +17,22 @@ GIT_SANITIZE_ENV_KEYS = [
     'GIT_WORK_TREE',
 ]
 
+# capabilities of git mapped to the minimum version supporting them
+GIT_CAPABILITIES = {
+    # parallel checkout (`checkout.workers`)
+    'checkout-workers': (2, 32),
+    # partial clones (`--filter`)
+    'partial-clone': (2, 19),
+    # cone-mode sparse checkouts (`sparse-checkout set --cone`)
+    'sparse-checkout': (2, 35),
+    # parallel submodule updates (`submodule update --jobs`)
+    'submodule-jobs': (2, 9),
+    # repository worktrees (`worktree add`)
+    'worktree': (2, 15),
+    # repairing moved worktrees (`worktree repair`)
+    'worktree-repair': (2, 29),
+}
+
 # git host tool helper
-GIT = FetchdepTool(GIT_COMMAND, env_sanitize=GIT_SANITIZE_ENV_KEYS)
+GIT = FetchdepTool(GIT_COMMAND, env_sanitize=GIT_SANITIZE_ENV_KEYS,
+    capabilities=GIT_CAPABILITIES)
@@ -3,15 +3,84 @@
 # Copyright fetchdep
 
 from fetchdep.tool import FetchdepTool
+from fetchdep.util.log import debug
+import os
 
 # executable used to run mercurial commands
 HG_COMMAND = 'hg'
 
+# executable used to run mercurial commands through a command server
+CHG_COMMAND = 'chg'
+
 # dictionary of environment entries append to the environment dictionary
 HG_EXTEND_ENV = {
     # hg is most likely a python script; ensure output is unbuffered
     'PYTHONUNBUFFERED': '1',
 }
 
+# capabilities of mercurial mapped to the minimum version supporting them
+HG_CAPABILITIES = {
+    # streaming clones (`clone --stream`)
+    'stream-clone': (4, 4),
+}
+
+
+class HgTool(FetchdepTool):
+    """
+    mercurial host tool
+
+    Provides a mercurial host tool which can optionally route all commands
+    through ``chg`` (mercurial's command server client). Since ``hg`` is a
+    Python-based application, the start-up cost of each invocation can
+    dominate fetches of small repositories. When enabled (by setting the
+    ``FETCHDEP_HG_BACKEND`` environment variable to ``chg``) and ``chg`` is
+    available on the host, commands are issued through a persistent command
+    server instead. If ``chg`` cannot be found, ``hg`` is used.
+    """
+    def __init__(self):
+        super(HgTool, self).__init__(HG_COMMAND, env_include=HG_EXTEND_ENV,
+            capabilities=HG_CAPABILITIES)
+
+        self.chg = None
+        if os.environ.get('FETCHDEP_HG_BACKEND', '').lower() == CHG_COMMAND:
+            self.chg = FetchdepTool(CHG_COMMAND, env_include=HG_EXTEND_ENV)
+
+    def exists(self):
+        if self._use_chg():
+            return True
+
+        return super(HgTool, self).exists()
+
+    def host_tools(self):
+        tools = super(HgTool, self).host_tools()
+        if self.chg:
+            tools.append(self.chg)
+
+        return tools
+
+    def _invoked_tool(self):
+        if self._use_chg():
+            return [self.chg.tool]
+
+        return super(HgTool, self)._invoked_tool()
+
+    def _use_chg(self):
+        """
+        return whether commands are routed through chg
+
+        Returns:
+            ``True``, if chg is enabled and available; ``False`` otherwise
+        """
+        if not self.chg:
+            return False
+
+        if not self.chg.exists():
+            debug('chg backend requested but not available; using hg')
+            self.chg = None
+            return False
+
+        return True
+
+
 # mercurial host tool helper
-HG = FetchdepTool(HG_COMMAND, env_include=HG_EXTEND_ENV)
+HG = HgTool()
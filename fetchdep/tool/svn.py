@@ -7,5 +7,11 @@ from fetchdep.tool import FetchdepTool
 # executable used to run svn commands
 SVN_COMMAND = 'svn'
 
+# capabilities of svn mapped to the minimum version supporting them
+SVN_CAPABILITIES = {
+    # querying specific information items (`info --show-item`)
+    'show-item': (1, 9),
+}
+
 # svn host tool helper
-SVN = FetchdepTool(SVN_COMMAND)
+SVN = FetchdepTool(SVN_COMMAND, capabilities=SVN_CAPABILITIES)
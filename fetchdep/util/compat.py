@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+import os
 import sys
 
 try:
@@ -10,6 +11,37 @@ except NameError:
     compat_input = input  # pylint: disable=W0127
 
 
+def compat_replace(src, dst):
+    """
+    rename a file, replacing any existing destination file
+
+    Uses ``os.replace`` when available. Python 2.7 does not provide
+    ``os.replace``, where ``os.rename`` cannot replace an existing file on
+    Windows; in this case, the existing destination file is removed before
+    the rename is attempted again.
+
+    Args:
+        src: the file to rename
+        dst: the destination path
+
+    Raises:
+        OSError: when the file could not be renamed
+    """
+
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+
+    try:
+        os.rename(src, dst)
+    except OSError:
+        if not os.path.isfile(dst):
+            raise
+
+        os.remove(dst)
+        os.rename(src, dst)
+
+
 def make_unicode(value):
     """
     resolve a tag value
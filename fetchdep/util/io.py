@@ -5,11 +5,15 @@
 from contextlib import contextmanager
 from fetchdep.util.log import debug
 from fetchdep.util.log import err
+from fetchdep.util.log import flush_pending
 from fetchdep.util.log import is_verbose
 from fetchdep.util.log import verbose
+import codecs
 import errno
 import os
 import re
+import shutil
+import stat
 import subprocess
 import sys
 import unicodedata
@@ -24,6 +28,13 @@ try:
 except ImportError:
     from pipes import quote
 
+# size of each chunk read from an executed process's output
+EXECUTE_CHUNK_SIZE = 64 * 1024
+
+# pattern used to split an executed process's output into lines (matching
+# python's universal newlines)
+EXECUTE_NEWLINE_PATTERN = re.compile(r'\r\n|\r|\n')
+
 # invalid characters for a directory name
 INVALID_DIRNAME_CHARS = r'["*/:\'<>\?\\|]'
 
@@ -57,7 +68,7 @@ RESTRICTED_DIRNAMES = [
 
 
 def execute(args, cwd=None, env=None, env_update=None, quiet=None,
-        poll=False, capture=None):
+        capture=None):
     """
     execute the provided command/arguments
 
@@ -80,11 +91,12 @@ def execute(args, cwd=None, env=None, env_update=None, quiet=None,
     provided, ``env_update`` will be updated the options based off of ``env``
     instead of the original environment of the caller.
 
-    In special cases, an executing process may not provide carriage returns/new
-    lines to simple output processing. This can lead the output of a process to
-    be undesirably buffered. To workaround this issue, the execution call can
-    instead poll for output results by using the ``poll`` option with a value
-    of ``True``. By default, polling is disabled with a value of ``False``.
+    The output of an executing process is relayed in chunks as soon as it is
+    available (including output which is not terminated by a new line, such
+    as carriage return-driven progress). When output is neither captured nor
+    suppressed and standard output has not been redirected (e.g. a serial
+    fetch), the process writes directly into this process's standard output
+    instead, avoiding any relaying of its output.
 
     A caller may wish to capture the provided output from a process for
     examination. If a list is provided in the call argument ``capture``, the
@@ -97,8 +109,6 @@ def execute(args, cwd=None, env=None, env_update=None, quiet=None,
         env_update (optional): environment variables to append for the process
         quiet (optional): whether or not to suppress output (defaults to
             ``False``)
-        poll (optional): force polling stdin/stdout for output data (defaults to
-            ``False``)
         capture (optional): list to capture output into
 
     Returns:
@@ -147,53 +157,39 @@ def execute(args, cwd=None, env=None, env_update=None, quiet=None,
             verbose('invoking: ' + cmd_str)
             sys.stdout.flush()
 
+        # the command may run for some time; flush any messages held by the
+        # flush policy before running it
+        flush_pending()
+
         try:
-            # check if this execution should poll (for carriage returns and new
-            # lines); note if quiet mode is enabled, do not attempt to poll
-            # since none of the output will be printed anyways.
-            if poll and not quiet:
-                debug('will poll process for output')
-                bufsize = 0
-                universal_newlines = False
-            else:
-                bufsize = 1
-                universal_newlines = True
-
-            proc = subprocess.Popen(
-                args,
-                bufsize=bufsize,
-                cwd=cwd,
-                env=final_env,
-                stderr=subprocess.STDOUT,
-                stdout=subprocess.PIPE,
-                universal_newlines=universal_newlines,
-            )
-
-            if bufsize == 0:
-                line = bytearray()
-                while True:
-                    c = proc.stdout.read(1)
-                    if not c and proc.poll() is not None:
-                        break
-                    line += c
-                    if c in (b'\r', b'\n'):
-                        decoded_line = line.decode('utf_8')
-                        if c == b'\n' and capture is not None:
-                            capture.append(decoded_line)
-                        if not quiet:
-                            sys.stdout.write(decoded_line)
-                            sys.stdout.flush()
-                        del line[:]
-            else:
-                for line in iter(proc.stdout.readline, ''):
-                    if capture is not None or not quiet:
-                        line = line.rstrip()
-                        if capture is not None:
-                            capture.append(line)
-                        if not quiet:
-                            print(line)
-                            sys.stdout.flush()
-            proc.communicate()
+            # if no output is wanted, do not bother reading it; likewise, if
+            # output would be relayed as-is into a non-redirected standard
+            # output, let the process inherit it
+            stdout = subprocess.PIPE
+            if quiet and capture is None:
+                stdout = open(os.devnull, 'wb')  # noqa: SIM115
+            elif not quiet and capture is None and _is_stdout_inheritable():
+                sys.stdout.flush()
+                stdout = None
+
+            try:
+                proc = subprocess.Popen(
+                    args,
+                    cwd=cwd,
+                    env=final_env,
+                    stderr=subprocess.STDOUT,
+                    stdout=stdout,
+                )
+            finally:
+                if stdout not in (None, subprocess.PIPE):
+                    stdout.close()
+
+            if proc.stdout:
+                try:
+                    _pump_output(proc.stdout, quiet, capture)
+                finally:
+                    proc.stdout.close()
+            proc.wait()
 
             rv = proc.returncode
         except OSError as e:
@@ -213,6 +209,93 @@ def execute(args, cwd=None, env=None, env_update=None, quiet=None,
     return rv
 
 
+def execute_output(args, cwd=None, env=None):
+    """
+    execute the provided command/arguments and return its output
+
+    Runs the command described by ``args`` until completion, returning the
+    command's return code along with its standard output. Unlike
+    ``execute``, the output is returned as-is (e.g. the content of a file
+    printed by a command) and does not include the command's error output,
+    which is only reported as a debug message.
+
+    Args:
+        args: the list of arguments to execute
+        cwd (optional): working directory to use
+        env (optional): environment variables to use for the process
+
+    Returns:
+        the return code and the standard output of the execution request
+    """
+
+    args = [arg if arg is not None else '' for arg in args]
+    if sys.platform != 'win32':
+        args = prepend_shebang_interpreter(args)
+
+    if is_verbose():
+        debug('(wd) {}', cwd if cwd else os.getcwd())
+        verbose('invoking: ' + _cmd_args_to_str(args))
+        sys.stdout.flush()
+
+    try:
+        proc = subprocess.Popen(
+            args,
+            cwd=cwd,
+            env=env,
+            stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        out, errs = proc.communicate()
+    except OSError as e:
+        debug('unable to execute command: {}\n'
+            '    {}', _cmd_args_to_str(args), e)
+        return 1, ''
+
+    if errs:
+        debug('command error output: {}',
+            errs.decode('utf_8', 'replace').rstrip())
+
+    # python 2.7 returns output as-is
+    if not isinstance(out, str):
+        out = out.decode('utf_8', 'replace')
+
+    return proc.returncode, out
+
+
+def find_executable(name):
+    """
+    find the path of an executable
+
+    Searches for the provided executable in the system's path. If the
+    provided name is already a path, the path is returned if it is an
+    executable.
+
+    Args:
+        name: the executable's name (or path)
+
+    Returns:
+        the executable's path; ``None`` if the executable cannot be found
+    """
+
+    def is_executable(path):
+        return os.path.isfile(path) and os.access(path, os.X_OK)
+
+    if os.path.dirname(name):
+        return name if is_executable(name) else None
+
+    exts = ['']
+    if sys.platform == 'win32':
+        exts.extend(os.environ.get('PATHEXT', '').split(os.pathsep))
+
+    for path in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        for ext in exts:
+            candidate = os.path.join(path, name + ext)
+            if is_executable(candidate):
+                return candidate
+
+    return None
+
+
 def makedirs(dir_, quiet=False):
     """
     ensure the provided directory exists
@@ -243,6 +326,56 @@ def makedirs(dir_, quiet=False):
     return True
 
 
+def path_remove(path, quiet=False):
+    """
+    remove the provided path
+
+    Attempts to remove the provided path if it exists. The path value can either
+    be a directory or a specific file. If the provided path does not exist, this
+    method has no effect. Read-only entries (e.g. Git object files) will have
+    their permissions adjusted to allow removal. If an error has been detected,
+    an error message will be output to standard error (unless ``quiet`` is set
+    to ``True``).
+
+    Args:
+        path: the path to remove
+        quiet (optional): whether or not to suppress output (defaults to
+            ``False``)
+
+    Returns:
+        ``True`` if the path was removed or does not exist; ``False`` if the
+        path could not be removed from the system
+    """
+
+    def onerror(func, entry, exc_info):
+        # if an entry could not be removed, try adding write permissions
+        # and retry the removal
+        if not isinstance(exc_info[1], OSError):
+            raise exc_info[1]
+
+        try:
+            parent = os.path.dirname(entry)
+            os.chmod(parent, os.stat(parent).st_mode | stat.S_IWUSR)
+            os.chmod(entry, os.stat(entry).st_mode | stat.S_IWUSR)
+        except OSError:
+            pass
+        func(entry)
+
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, onerror=onerror)
+        elif os.path.lexists(path):
+            os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            if not quiet:
+                err('unable to remove path: {}\n'
+                    '    {}', path, e)
+            return False
+
+    return True
+
+
 def prepend_shebang_interpreter(args):
     """
     prepend interpreter program (if any) to argument list
@@ -373,3 +506,103 @@ def _cmd_args_to_str(args):
         cmd_str = cmd_str.strip()
 
     return cmd_str
+
+
+def _is_stdout_inheritable():
+    """
+    return whether standard output can be inherited by an executed process
+
+    Returns:
+        ``True`` if standard output has not been redirected and is backed by a
+        file descriptor; ``False`` otherwise
+    """
+
+    if sys.stdout is None or sys.stdout is not sys.__stdout__:
+        return False
+
+    try:
+        sys.stdout.fileno()
+    except (AttributeError, IOError, OSError, ValueError):
+        return False
+
+    return True
+
+
+def _pump_output(stream, quiet, capture):
+    """
+    relay the output of an executed process
+
+    Reads a process's output in large chunks (returning as soon as any output
+    is available) instead of line-by-line. Each chunk is written to standard
+    output using a single write, preserving any carriage returns used by
+    progress output. When standard output provides a binary buffer, chunks
+    are written as-is into the buffer, avoiding the new line translation of
+    a text stream (e.g. a process's CRLF line endings gaining an additional
+    carriage return on Windows). If a capture list is provided, the output is
+    split into lines (where carriage returns, new lines or both end a line)
+    with trailing whitespace removed.
+
+    Args:
+        stream: the output stream of the process
+        quiet: whether or not to suppress output
+        capture: list to capture output into (if any)
+    """
+
+    # python 2.7 relays raw output as-is
+    decoder = None
+    if sys.version_info[0] >= 3:  # noqa: PLR2004
+        decoder = codecs.getincrementaldecoder('utf_8')(errors='replace')
+
+    # write raw output into standard output's buffer (if any); flushing any
+    # text already written to keep the output ordered
+    raw = None
+    if not quiet:
+        raw = getattr(sys.stdout, 'buffer', None)
+        if raw:
+            sys.stdout.flush()
+
+    fd = stream.fileno()
+    last = ''
+    pending = ''
+    while True:
+        try:
+            data = os.read(fd, EXECUTE_CHUNK_SIZE)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+
+        text = decoder.decode(data, final=not data) if decoder else data
+        if raw and data:
+            raw.write(data)
+            raw.flush()
+        elif text and not quiet:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        if text and not quiet:
+            last = text[-1]
+
+        if capture is not None:
+            buf = pending + text
+
+            # a trailing carriage return may be followed by a new line in the
+            # next chunk; hold it back to avoid capturing an empty line
+            tail = ''
+            if data and buf.endswith('\r'):
+                buf, tail = buf[:-1], '\r'
+
+            lines = EXECUTE_NEWLINE_PATTERN.split(buf)
+            pending = lines.pop() + tail
+            capture.extend(line.rstrip() for line in lines)
+
+            if not data and pending:
+                capture.append(pending.rstrip())
+
+        if not data:
+            break
+
+    # ensure any following output starts on a new line
+    if last and last != '\n':
+        sys.stdout.write('\n')
+        sys.stdout.flush()
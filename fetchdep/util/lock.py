@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from contextlib import contextmanager
+import errno
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# interval (in seconds) to wait between lock attempts (when polling)
+LOCK_POLL_INTERVAL = 0.1
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    acquire an exclusive lock on a file for the duration of a context
+
+    Provides a context-supported lock using the provided file path. The lock
+    is held on a file handle opened for the duration of the context, allowing
+    multiple fetchdep processes to coordinate access to a shared resource. The
+    lock file will be created if it does not already exist; however, the file
+    is never removed (to avoid races with other lock holders).
+
+    When ``blocking`` is disabled and the lock is held by another process, the
+    context will yield ``False`` and the caller should not touch the guarded
+    resource.
+
+    Args:
+        path: the lock file
+        blocking (optional): whether to wait for the lock (defaults to
+            ``True``)
+
+    Yields:
+        whether the lock was acquired
+    """
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        locked = _lock(fd, blocking)
+        try:
+            yield locked
+        finally:
+            if locked:
+                _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _lock(fd, blocking):
+    """
+    lock a file descriptor
+
+    Args:
+        fd: the file descriptor
+        blocking: whether to wait for the lock
+
+    Returns:
+        whether the lock was acquired
+    """
+
+    if fcntl:
+        flags = fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(fd, flags)
+        except (IOError, OSError) as e:
+            if e.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+            return False
+
+        return True
+
+    if msvcrt:
+        # msvcrt's blocking lock will only retry for a limited amount of time;
+        # instead, poll a non-blocking lock until the lock is acquired
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except (IOError, OSError):  # noqa: PERF203
+                if not blocking:
+                    return False
+                time.sleep(LOCK_POLL_INTERVAL)
+            else:
+                return True
+
+    # no locking support on this platform; assume single access
+    return True
+
+
+def _unlock(fd):
+    """
+    unlock a file descriptor
+
+    Args:
+        fd: the file descriptor
+    """
+
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
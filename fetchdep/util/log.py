@@ -7,14 +7,46 @@ from __future__ import unicode_literals
 from fetchdep.util.compat import make_unicode
 import os
 import sys
+import time
+
+#: flush logged messages once the process exits
+LOG_FLUSH_EXIT = 'exit'
+
+#: flush logged messages at most once every interval
+LOG_FLUSH_INTERVAL = 'interval'
+
+#: flush logged messages after every message
+LOG_FLUSH_LINE = 'line'
+
+#: supported flush policies for logged messages
+LOG_FLUSH_POLICIES = (
+    LOG_FLUSH_EXIT,
+    LOG_FLUSH_INTERVAL,
+    LOG_FLUSH_LINE,
+)
+
+#: interval (in seconds) between flushes when using the interval policy
+LOG_FLUSH_INTERVAL_TIME = 1.0
 
 
 #: flag to track the enablement of debug messages
 FETCHDEP_LOG_DEBUG_FLAG = False
 
+#: flush policy used for logged messages
+FETCHDEP_LOG_FLUSH_POLICY = LOG_FLUSH_LINE
+
+#: flag to track the enablement of synchronizing flushes to disk
+FETCHDEP_LOG_FSYNC_FLAG = False
+
+#: time of the last flush (for the interval policy)
+FETCHDEP_LOG_LAST_FLUSH = 0
+
 #: flag to track the disablement of colorized messages
 FETCHDEP_LOG_NOCOLOR_FLAG = False
 
+#: flag to track messages waiting to be flushed (for the interval policy)
+FETCHDEP_LOG_PENDING_FLAG = False
+
 #: flag to track the enablement of verbose messages
 FETCHDEP_LOG_VERBOSE_FLAG = False
 
@@ -31,7 +63,7 @@ def log(msg, *args):
             generating a formatted message
     """
     __log('', '', msg, sys.stdout, *args)
-    flush_stdout()
+    __flush(sys.stdout)
 
 
 def debug(msg, *args):
@@ -62,37 +94,60 @@ def err(msg, *args):
         *args: an arbitrary set of positional and keyword arguments used when
             generating a formatted message
     """
-    flush_stdout()
+    __flush(sys.stdout)
     __log('(error) ', '\033[1;31m', msg, sys.stderr, *args)
-    flush_stderr()
+    __flush(sys.stderr)
 
 
 def flush_stderr():
     """
     force a flush of stderr
 
-    Forces a flush of the stderr stream for both the application and operating
-    systen.
+    Forces a flush of the stderr stream for the application. If configured
+    (``FETCHDEP_LOG_FSYNC``), the stream is also synchronized by the operating
+    system.
     """
-    sys.stderr.flush()
-    try:
-        os.fsync(sys.stderr.fileno())
-    except (AttributeError, OSError):
-        pass
+    __sync(sys.stderr)
 
 
 def flush_stdout():
     """
     force a flush of stdout
 
-    Forces a flush of the stdout stream for both the application and operating
-    systen.
+    Forces a flush of the stdout stream for the application. If configured
+    (``FETCHDEP_LOG_FSYNC``), the stream is also synchronized by the operating
+    system.
+    """
+    __sync(sys.stdout)
+
+
+def flush_pending():
+    """
+    flush any logged messages waiting on the flush interval
+
+    With the interval policy, messages logged since the last flush are
+    flushed immediately. This is invoked before a process may block for a
+    period of time (e.g. waiting on workers or running a command), ensuring
+    recently logged messages are not held until another message is logged.
     """
-    sys.stdout.flush()
-    try:
-        os.fsync(sys.stdout.fileno())
-    except (AttributeError, OSError):
-        pass
+    global FETCHDEP_LOG_LAST_FLUSH
+    global FETCHDEP_LOG_PENDING_FLAG
+
+    if FETCHDEP_LOG_PENDING_FLAG:
+        FETCHDEP_LOG_LAST_FLUSH = time.time()
+        FETCHDEP_LOG_PENDING_FLAG = False
+        __sync(sys.stdout)
+        __sync(sys.stderr)
+
+
+def flush_policy():
+    """
+    report the flush policy used for logged messages
+
+    Returns:
+        the flush policy (e.g. ``LOG_FLUSH_LINE``)
+    """
+    return FETCHDEP_LOG_FLUSH_POLICY
 
 
 def hint(msg, *args):
@@ -108,7 +163,7 @@ def hint(msg, *args):
             generating a formatted message
     """
     __log('', '\033[1;36m', msg, sys.stdout, *args)
-    flush_stdout()
+    __flush(sys.stdout)
 
 
 def is_debug():
@@ -126,6 +181,16 @@ def is_debug():
     return FETCHDEP_LOG_DEBUG_FLAG
 
 
+def is_fsync():
+    """
+    report if the instance synchronizes flushed messages to disk
+
+    Returns:
+        whether flushed messages are synchronized
+    """
+    return FETCHDEP_LOG_FSYNC_FLAG
+
+
 def is_nocolor():
     """
     report if the instance is configured with nocolor messaging
@@ -167,7 +232,7 @@ def note(msg, *args):
             generating a formatted message
     """
     __log('', '\033[7m', msg, sys.stdout, *args)
-    flush_stdout()
+    __flush(sys.stdout)
 
 
 def success(msg, *args):
@@ -183,7 +248,7 @@ def success(msg, *args):
             generating a formatted message
     """
     __log('(success) ', '\033[1;32m', msg, sys.stdout, *args)
-    flush_stdout()
+    __flush(sys.stdout)
 
 
 def verbose(msg, *args):
@@ -215,9 +280,39 @@ def warn(msg, *args):
         *args: an arbitrary set of positional and keyword arguments used when
             generating a formatted message
     """
-    flush_stdout()
+    __flush(sys.stdout)
     __log('(warn) ', '\033[1;35m', msg, sys.stderr, *args)
-    flush_stderr()
+    __flush(sys.stderr)
+
+
+def __flush(file):
+    """
+    utility flush method
+
+    Flushes a stream after a logged message, based on the configured flush
+    policy. With the line policy, the stream is flushed after every message.
+    With the interval policy, both standard streams are flushed at most once
+    every interval (where messages held back are flushed before a process
+    blocks; see ``flush_pending``). With the exit policy, streams are only
+    flushed when buffers are full or when the process exits.
+
+    Args:
+        file: the file to flush
+    """
+    global FETCHDEP_LOG_LAST_FLUSH
+    global FETCHDEP_LOG_PENDING_FLAG
+
+    if FETCHDEP_LOG_FLUSH_POLICY == LOG_FLUSH_LINE:
+        __sync(file)
+    elif FETCHDEP_LOG_FLUSH_POLICY == LOG_FLUSH_INTERVAL:
+        now = time.time()
+        if now - FETCHDEP_LOG_LAST_FLUSH >= LOG_FLUSH_INTERVAL_TIME:
+            FETCHDEP_LOG_LAST_FLUSH = now
+            FETCHDEP_LOG_PENDING_FLAG = False
+            __sync(sys.stdout)
+            __sync(sys.stderr)
+        else:
+            FETCHDEP_LOG_PENDING_FLAG = True
 
 
 def __log(prefix, color, msg, file, *args):
@@ -247,6 +342,25 @@ def __log(prefix, color, msg, file, *args):
     print('{}{}{}{}'.format(color, prefix, msg, post), file=file)
 
 
+def __sync(file):
+    """
+    utility sync method
+
+    Flushes a stream, additionally synchronizing the stream to disk if
+    configured.
+
+    Args:
+        file: the file to flush
+    """
+    file.flush()
+
+    if FETCHDEP_LOG_FSYNC_FLAG:
+        try:
+            os.fsync(file.fileno())
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
 def fetchdep_log_configuration(debug_, nocolor, verbose_):
     """
     configure the global logging state of the running instance
@@ -267,3 +381,31 @@ def fetchdep_log_configuration(debug_, nocolor, verbose_):
     FETCHDEP_LOG_DEBUG_FLAG = debug_
     FETCHDEP_LOG_NOCOLOR_FLAG = nocolor
     FETCHDEP_LOG_VERBOSE_FLAG = verbose_
+
+
+def fetchdep_log_flush_configuration(policy, fsync):
+    """
+    configure how logged messages are flushed for the running instance
+
+    Adjusts the running instance's flush policy for logged messages (e.g. to
+    avoid flushing every message when output is redirected to a file) and
+    whether flushed messages are synchronized to disk.
+
+    Args:
+        policy: the flush policy (``LOG_FLUSH_EXIT``, ``LOG_FLUSH_INTERVAL``
+            or ``LOG_FLUSH_LINE``)
+        fsync: toggle the synchronization of flushed messages
+
+    Returns:
+        ``True`` if the configuration is applied; ``False`` if the policy is
+        not supported
+    """
+    global FETCHDEP_LOG_FLUSH_POLICY
+    global FETCHDEP_LOG_FSYNC_FLAG
+
+    if policy not in LOG_FLUSH_POLICIES:
+        return False
+
+    FETCHDEP_LOG_FLUSH_POLICY = policy
+    FETCHDEP_LOG_FSYNC_FLAG = fsync
+    return True
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+import codecs
+import os
+import sys
+import tempfile
+
+# size of each chunk relayed from a spool
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# amount of output held in memory before a spool is moved to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+class SpooledOutput(object):
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        """
+        a file-like writer which spools output to a temporary file
+
+        Output written to the spool is held in memory until it exceeds
+        ``max_memory``, after which all output is moved into a temporary file.
+        This allows (possibly large) output of a process to be collected
+        without growing a process's memory. Spooled output can be relayed
+        (in chunks) into another stream using ``relay``.
+
+        Args:
+            max_memory (optional): amount of output to hold in memory
+
+        Attributes:
+            size: the amount of output spooled (in bytes)
+        """
+        self._file = tempfile.SpooledTemporaryFile(  # noqa: SIM115
+            max_size=max_memory)
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def flush(self):
+        pass
+
+    def relay(self, target, limit=None):
+        """
+        relay spooled output into another stream
+
+        Writes the spooled output into the provided target stream. If a
+        ``limit`` is provided, only the trailing output (up to ``limit``
+        bytes, starting at a new line) is relayed, prefixed with a note of
+        the amount of output omitted.
+
+        Args:
+            target: the stream to write to
+            limit (optional): the maximum amount of output to relay
+        """
+
+        offset = 0
+        if limit is not None and self.size > limit:
+            offset = self.size - limit
+
+        self._file.seek(offset)
+
+        # start the trailing output on a new line
+        if offset:
+            self._file.readline()
+            omitted = self._file.tell()
+            target.write('... ({} bytes of output omitted)\n'.format(omitted))
+
+        # python 2.7 relays raw output as-is
+        decoder = None
+        if sys.version_info[0] >= 3:  # noqa: PLR2004
+            decoder = codecs.getincrementaldecoder('utf_8')(errors='replace')
+
+        last = ''
+        while True:
+            data = self._file.read(SPOOL_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data) if decoder else data
+            if text:
+                target.write(text)
+                last = text[-1]
+
+            if not data:
+                break
+
+        if last and last != '\n':
+            target.write('\n')
+
+        target.flush()
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf_8', 'replace')
+
+        self._file.write(data)
+        self.size += len(data)
@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+import re
+
 try:
     basestring  # noqa: B018  pylint: disable=E0601
 except NameError:
@@ -27,3 +29,31 @@ def is_sequence_not_string(obj):
         whether or not a non-string sequence
     """
     return isinstance(obj, Sequence) and not isinstance(obj, basestring)
+
+
+def parse_size(value):
+    """
+    parse a human-readable size value
+
+    Converts a size value (e.g. ``512``, ``100K``, ``20M`` or ``1.5G``) into
+    a number of bytes. Suffixes are treated as binary (1K equals 1024 bytes).
+
+    Args:
+        value: the size value to parse
+
+    Returns:
+        the size (in bytes)
+
+    Raises:
+        ValueError: when an invalid size is provided
+    """
+
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$', str(value),
+        re.IGNORECASE)
+    if not match:
+        msg = 'invalid size value'
+        raise ValueError(msg)
+
+    number, suffix = match.groups()
+    exponent = ' kmgt'.index(suffix.lower() or ' ')
+    return int(float(number) * (1024 ** exponent))
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.util.log import debug
+from multiprocessing.pool import ThreadPool
+import errno
+import multiprocessing
+import os
+import shutil
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# size of each chunk read when copying a file's contents
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# maximum number of threads used to copy files in parallel
+COPY_MAX_JOBS = 8
+
+# ioctl request to share a file's extents with another file (linux)
+FICLONE = 0x40049409
+
+# errors which indicate a link/clone is not supported for a given path
+UNSUPPORTED_LINK_ERRNOS = (
+    errno.EINVAL,
+    errno.EMLINK,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EPERM,
+    errno.EXDEV,
+)
+
+
+class CopyMode:
+    def __init__(self, hardlink, reflink):
+        """
+        copy mode for a tree copy
+
+        Tracks which copy methods are still considered usable for a tree copy.
+        When a method is detected as unsupported (e.g. the filesystem does not
+        support reflinks), the method is disabled for the remaining files.
+
+        Args:
+            hardlink: whether hardlinks are allowed
+            reflink: whether reflinks are allowed
+
+        Attributes:
+            hardlink: whether hardlinks are allowed
+            reflink: whether reflinks are allowed
+        """
+        self.hardlink = hardlink
+        self.reflink = reflink and fcntl is not None and \
+            sys.platform.startswith('linux')
+
+
+def copy_tree(src, dst, hardlink=False, reflink=True, jobs=None):
+    """
+    copy a directory tree
+
+    Copies the contents of the directory ``src`` into the directory ``dst``
+    (which will be created if it does not exist). Files are populated using
+    the cheapest available method: a hardlink (if ``hardlink`` is enabled),
+    a copy-on-write reflink (if supported by the filesystem) or a chunked
+    copy. Files are processed by a pool of threads. Symbolic links are
+    recreated as-is.
+
+    Args:
+        src: the source directory
+        dst: the destination directory
+        hardlink (optional): whether to hardlink files (defaults to ``False``)
+        reflink (optional): whether to reflink files (defaults to ``True``)
+        jobs (optional): number of threads to copy with
+
+    Raises:
+        IOError/OSError: if the tree could not be copied
+    """
+
+    mode = CopyMode(hardlink, reflink)
+
+    dirs = []
+    files = []
+    for root, dirnames, filenames in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        dst_root = os.path.normpath(os.path.join(dst, rel_root))
+        if not os.path.isdir(dst_root):
+            os.makedirs(dst_root)
+        dirs.append((root, dst_root))
+
+        # symbolic links (to directories or files) are recreated
+        for dirname in list(dirnames):
+            src_path = os.path.join(root, dirname)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path),
+                    os.path.join(dst_root, dirname))
+                dirnames.remove(dirname)
+
+        for filename in filenames:
+            src_path = os.path.join(root, filename)
+            dst_path = os.path.join(dst_root, filename)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+            else:
+                files.append((src_path, dst_path))
+
+    if jobs is None:
+        jobs = min(multiprocessing.cpu_count(), COPY_MAX_JOBS)
+
+    def copy_entry(entry):
+        _copy_file(entry[0], entry[1], mode)
+
+    if jobs > 1 and len(files) > 1:
+        pool = ThreadPool(min(jobs, len(files)))
+        try:
+            pool.map(copy_entry, files)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for entry in files:
+            copy_entry(entry)
+
+    # apply directory permissions/times after all contents are populated
+    for src_dir, dst_dir in reversed(dirs):
+        shutil.copystat(src_dir, dst_dir)
+
+
+def _copy_file(src, dst, mode):
+    """
+    copy a file
+
+    Args:
+        src: the source file
+        dst: the destination file
+        mode: the copy mode
+
+    Raises:
+        IOError/OSError: if the file could not be copied
+    """
+
+    if mode.hardlink:
+        try:
+            os.link(src, dst)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_LINK_ERRNOS:
+                raise
+
+            debug('hardlinks not supported; falling back to copies: {}', e)
+            mode.hardlink = False
+        else:
+            return
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        cloned = False
+        if mode.reflink:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                cloned = True
+            except (IOError, OSError) as e:
+                if e.errno not in UNSUPPORTED_LINK_ERRNOS:
+                    raise
+
+                debug('reflinks not supported; falling back to copies: {}', e)
+                mode.reflink = False
+
+        if not cloned:
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+
+    shutil.copystat(src, dst)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+#
+# This is a helper script used to compare the cost of relaying the output of
+# a process which prints many lines (e.g. a verbose svn checkout), between
+# fetchdep's chunked output pump and the previous line-by-line relay.
+#
+#  python scripts/bench-execute-output.py [--lines 200000] > /dev/null
+
+from __future__ import print_function
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetchdep.util.io import execute
+
+# script used to emulate a process printing many lines
+EMIT_SCRIPT = '''
+import sys
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+for idx in range({}):
+    out.write('A    trunk/src/module/file{{}}.c\\n'.format(idx).encode())
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--capture', action='store_true')
+    args = parser.parse_args()
+
+    cmd = [sys.executable, '-c', EMIT_SCRIPT.format(args.lines)]
+
+    results = []
+    for name, func in (('legacy', legacy_execute), ('chunked', execute)):
+        capture = [] if args.capture else None
+
+        start = time.time()
+        cpu_start = os.times()
+        func(cmd, quiet=False, capture=capture)
+        cpu_end = os.times()
+        duration = time.time() - start
+
+        cpu = (cpu_end[0] - cpu_start[0]) + (cpu_end[1] - cpu_start[1])
+        results.append((name, duration, cpu))
+
+    for name, duration, cpu in results:
+        sys.stderr.write('{:8} {:7.2f}s  {:10.0f} lines/s  cpu: {:6.2f}s\n'
+            .format(name, duration, args.lines / duration, cpu))
+
+    return 0
+
+
+def legacy_execute(args, quiet=False, capture=None):
+    proc = subprocess.Popen(
+        args,
+        bufsize=1,
+        stderr=subprocess.STDOUT,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    for line in iter(proc.stdout.readline, ''):
+        if capture is not None or not quiet:
+            line = line.rstrip()
+            if capture is not None:
+                capture.append(line)
+            if not quiet:
+                print(line)
+                sys.stdout.flush()
+    proc.communicate()
+
+    return proc.returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+#
+# This is a helper script used to compare the clone latency of small
+# Mercurial repositories when invoking `hg` directly against routing
+# commands through `chg` (Mercurial's command server client).
+#
+#  python scripts/bench-hg-clone.py [--count 200]
+
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200)
+    args = parser.parse_args()
+
+    backends = [backend for backend in ('hg', 'chg') if which(backend)]
+    if 'hg' not in backends:
+        print('hg is not available')
+        return 1
+
+    if 'chg' not in backends:
+        print('chg is not available; only benchmarking hg')
+
+    env = os.environ.copy()
+    env['HGPLAIN'] = '1'
+    env['PYTHONUNBUFFERED'] = '1'
+
+    base_dir = tempfile.mkdtemp(prefix='.fetchdep-bench-')
+    try:
+        print('preparing {} repositories...'.format(args.count))
+        repos = []
+        for idx in range(args.count):
+            repo = os.path.join(base_dir, 'repos', 'repo{}'.format(idx))
+            run(['hg', 'init', repo], env)
+            with open(os.path.join(repo, 'file'), 'w') as f:
+                f.write('{}\n'.format(idx))
+            run(['hg', '--cwd', repo, 'commit', '-A', '-m', 'init',
+                '-u', 'bench'], env)
+            repos.append(repo)
+
+        for backend in backends:
+            # warm up the backend (e.g. start chg's command server)
+            run([backend, '--version'], env)
+
+            clone_dir = os.path.join(base_dir, 'clones-' + backend)
+            durations = []
+            for idx, repo in enumerate(repos):
+                target = os.path.join(clone_dir, 'repo{}'.format(idx))
+
+                start = time.time()
+                run([backend, '--verbose', 'clone', repo, target], env)
+                durations.append(time.time() - start)
+
+            report(backend, durations)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    return 0
+
+
+def report(backend, durations):
+    durations = sorted(durations)
+    total = sum(durations)
+    print('{:4}  total: {:7.2f}s  mean: {:6.1f}ms  median: {:6.1f}ms  '
+        'max: {:6.1f}ms'.format(
+            backend,
+            total,
+            total / len(durations) * 1000,
+            durations[len(durations) // 2] * 1000,
+            durations[-1] * 1000,
+        ))
+
+
+def run(args, env):
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(args, env=env, stdout=devnull, stderr=devnull)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
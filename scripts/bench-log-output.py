@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+#
+# This is a helper script used to compare the rate of logged messages (with
+# output redirected to a file) between the supported log flush policies and
+# the previous behavior of synchronizing every message to disk.
+#
+#  python scripts/bench-log-output.py [--count 20000]
+
+from __future__ import print_function
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# script used to log messages with the configured flush policy
+LOG_SCRIPT = '''
+import sys
+from fetchdep.util.log import fetchdep_log_flush_configuration
+from fetchdep.util.log import log
+fetchdep_log_flush_configuration(sys.argv[1], sys.argv[2] == '1')
+for idx in range({}):
+    log('fetching dependency-{{}}...', idx)
+'''
+
+# flush configurations to compare (policy, fsync)
+CONFIGURATIONS = [
+    ('line', True),
+    ('line', False),
+    ('interval', False),
+    ('exit', False),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=20000)
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)))
+
+    script = LOG_SCRIPT.format(args.count)
+    for policy, fsync in CONFIGURATIONS:
+        with tempfile.TemporaryFile() as out:
+            start = time.time()
+            subprocess.check_call([sys.executable, '-c', script, policy,
+                '1' if fsync else '0'], env=env, stdout=out)
+            duration = time.time() - start
+
+        name = policy + (' (fsync)' if fsync else '')
+        print('{:16} {:7.2f}s  {:10.0f} messages/s'.format(
+            name, duration, args.count / duration))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
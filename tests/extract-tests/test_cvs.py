@@ -51,6 +51,54 @@ class TestToolCvs(FetchdepExtractTestCase):
             entries = engine.cfgdb.entries()
             self.assertEqual(set(entries), {'test'})
 
+    def test_cvs_batch(self):
+        modules = ['module-a', 'module-b', 'module-c']
+
+        # prepare a cvs repository
+        with interim_working_dir(self.repo_dir):
+            self._cvs('init')
+
+        # build multiple cvs modules (outside the repository path)
+        with generate_temp_dir() as tmpdir, interim_working_dir(tmpdir):
+            self._cvs('checkout', '.')
+            for module in modules:
+                makedirs(module)
+                self._cvs('add', module)
+
+                module_file = os.path.join(module, 'file')
+                with open(module_file, 'w') as f:
+                    f.write('test\n')
+                self._cvs('add', module_file)
+            self._cvs('commit', '-m', 'test')
+
+        # prepare the engine
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            # build a configuration which uses each module (exporting the
+            # last module)
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                for module in modules:
+                    f.write('  - name: test-{}\n'.format(module))
+                    f.write('    site: cvs+{} {}\n'.format(
+                        self.repo_dir, module))
+                f.write('    export: true\n')
+
+            # ensure the engine runs
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify each dependency has been acquired
+            for module in modules:
+                module_dir = os.path.join(work_dir, 'test-' + module)
+                self.assertTrue(os.path.isdir(module_dir))
+
+            # verify an exported module has no cvs metadata
+            cvs_dir = os.path.join(work_dir, 'test-' + modules[-1], 'CVS')
+            self.assertFalse(os.path.exists(cvs_dir))
+
     def _cvs(self, *args):
         # configure CVSROOT to the repository
         new_args = ('-d', self.repo_dir) + args
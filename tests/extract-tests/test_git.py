@@ -2,8 +2,13 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.cache import cache_entry_path
+from fetchdep.fetch import FetchOptions
+from fetchdep.fetch.git import fetch
 from fetchdep.util.io import execute
+from fetchdep.util.io import path_remove
 from tests import FetchdepExtractTestCase
+from tests import generate_temp_dir
 from tests import interim_working_dir
 from tests import prepare_testenv
 import os
@@ -39,6 +44,583 @@ class TestToolGit(FetchdepExtractTestCase):
             entries = engine.cfgdb.entries()
             self.assertEqual(set(entries), {'test'})
 
+    def test_git_cache(self):
+        # prepare a git repository
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+
+        with generate_temp_dir() as cache_dir:
+            site = 'file://{}'.format(self.repo_dir)
+
+            for _ in range(2):
+                config = {
+                    'cache_dir': cache_dir,
+                }
+
+                with prepare_testenv(config=config) as engine:
+                    work_dir = engine.opts.work_dir
+
+                    cfg = os.path.join(work_dir, 'fetchdep.yml')
+                    with open(cfg, 'w') as f:
+                        f.write('fetchdep:\n')
+                        f.write('  - name: test\n')
+                        f.write('    site: git+{}\n'.format(site))
+
+                    rv = engine.run()
+                    self.assertTrue(rv)
+
+                    # verify the clone does not depend on the cache
+                    alternates = os.path.join(work_dir, 'test', '.git',
+                        'objects', 'info', 'alternates')
+                    self.assertFalse(os.path.exists(alternates))
+
+                # verify a mirror has been populated in the cache
+                mirror_dir = cache_entry_path(cache_dir, 'git', site)
+                self.assertTrue(os.path.isdir(mirror_dir))
+
+    def test_git_discover(self):
+        # prepare a git repository which provides its own configuration
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+
+        repo_cfg = os.path.join(self.repo_dir, 'fetchdep.yml')
+        with open(repo_cfg, 'w') as f:
+            f.write('fetchdep:\n')
+            f.write('  - name: child\n')
+            f.write('    site: mkdir\n')
+        self._git('add', 'fetchdep.yml')
+        self._create_commit('initial commit')
+
+        # with a dry-run, the repository is never cloned; the child
+        # dependency can only be registered from a discovered configuration
+        config = {
+            'dry_run': True,
+            'recursive': True,
+        }
+
+        with prepare_testenv(config=config) as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: git+file://{}\n'.format(self.repo_dir))
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            entries = engine.cfgdb.entries()
+            self.assertEqual(set(entries), {'test', 'child'})
+            self.assertFalse(os.path.exists(os.path.join(work_dir, 'test')))
+
+    def test_git_revision(self):
+        # prepare a git repository with multiple commits
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        pinned_rev = self._create_commit('initial commit')
+        self._create_commit('second commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: git+file://{}\n'.format(self.repo_dir))
+                f.write('    revision: {}\n'.format(pinned_rev))
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify only the pinned revision has been fetched
+            clone_dir = os.path.join(work_dir, 'test')
+            clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+            self.assertEqual(clone_rev, pinned_rev)
+
+            commits = self._git('-C', clone_dir, 'rev-list', '--all')
+            self.assertEqual(commits, pinned_rev)
+
+    def test_git_branch(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        branch_rev = self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: git+file://{}\n'.format(self.repo_dir))
+                f.write('    branch: other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify only the configured branch has been fetched
+            clone_dir = os.path.join(work_dir, 'test')
+            clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+            self.assertEqual(clone_rev, branch_rev)
+
+            remote_refs = self._git('-C', clone_dir, 'branch', '--remotes',
+                '--format=%(refname:short)')
+            self.assertEqual(remote_refs, 'origin/other')
+
+    def test_git_worktrees(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        default_rev = self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        branch_rev = self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-default\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('  - name: test-other\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify a single repository is shared by both dependencies
+            worktrees_dir = os.path.join(work_dir, '.fetchdep-worktrees')
+            self.assertTrue(os.path.isdir(worktrees_dir))
+
+            expected = {
+                'test-default': default_rev,
+                'test-other': branch_rev,
+            }
+
+            for name, rev in expected.items():
+                clone_dir = os.path.join(work_dir, name)
+                self.assertTrue(os.path.isfile(
+                    os.path.join(clone_dir, '.git')))
+
+                clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+                self.assertEqual(clone_rev, rev)
+
+                # verify the shared repository tracks the worktree's final
+                # location (after being staged)
+                common_dir = self._git('-C', clone_dir, 'rev-parse',
+                    '--git-common-dir')
+                worktrees = self._git('-C', common_dir, 'worktree', 'list',
+                    '--porcelain')
+                self.assertIn('worktree {}'.format(clone_dir), worktrees)
+
+    def test_git_worktrees_refetch(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        default_rev = self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-default\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('  - name: test-other\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # remove a worktree dependency and ensure it can be fetched again
+            clone_dir = os.path.join(work_dir, 'test-default')
+            path_remove(clone_dir)
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+            self.assertEqual(clone_rev, default_rev)
+
+    def test_git_worktrees_discarded(self):
+        # prepare a git repository
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+
+        with generate_temp_dir() as work_dir:
+            opts = FetchOptions()
+            opts.name = 'test'
+            opts.site = 'file://{}'.format(self.repo_dir)
+            opts.commit_dir = os.path.join(work_dir, 'test')
+            opts.target_dir = os.path.join(work_dir, 'staged')
+            opts.worktrees_dir = os.path.join(work_dir, '.fetchdep-worktrees')
+
+            self.assertTrue(fetch(opts))
+            self.assertIsNotNone(opts.post_commit)
+
+            common_dir = self._git('-C', opts.target_dir, 'rev-parse',
+                '--git-common-dir')
+
+            # a discarded worktree should no longer be registered
+            post_commit = opts.post_commit
+            committed = False
+            self.assertTrue(post_commit(committed))  # pylint: disable=E1102
+
+            worktrees = self._git('-C', common_dir, 'worktree', 'list',
+                '--porcelain')
+            self.assertNotIn(opts.target_dir, worktrees)
+
+    def test_git_worktrees_duplicate(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        default_rev = self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-primary\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('  - name: test-duplicate\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('  - name: test-other\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify the duplicate does not share the primary's git state
+            primary_dir = os.path.join(work_dir, 'test-primary')
+            duplicate_dir = os.path.join(work_dir, 'test-duplicate')
+
+            primary_git_dir = self._git('-C', primary_dir, 'rev-parse',
+                '--absolute-git-dir')
+            duplicate_git_dir = self._git('-C', duplicate_dir, 'rev-parse',
+                '--absolute-git-dir')
+            self.assertNotEqual(primary_git_dir, duplicate_git_dir)
+
+            clone_rev = self._git('-C', duplicate_dir, 'rev-parse', 'HEAD')
+            self.assertEqual(clone_rev, default_rev)
+
+    def test_git_worktrees_same_branch(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        default_rev = self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            # two dependencies resolving to the same (default) branch, along
+            # with a dependency tracking another branch
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-default\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('  - name: test-explicit\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: test\n')
+                f.write('  - name: test-other\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            for name in ('test-default', 'test-explicit'):
+                clone_dir = os.path.join(work_dir, name)
+                clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+                self.assertEqual(clone_rev, default_rev)
+
+                branch = self._git('-C', clone_dir, 'symbolic-ref', '--short',
+                    'HEAD')
+                self.assertEqual(branch, 'test')
+
+    def test_git_sparse(self):
+        # prepare a git repository with multiple subdirectories
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._git('config', 'uploadpack.allowFilter', 'true')
+
+        for subdir in ['included', 'excluded']:
+            os.mkdir(os.path.join(self.repo_dir, subdir))
+            with open(os.path.join(self.repo_dir, subdir, 'file'), 'w') as f:
+                f.write(subdir)
+            self._git('add', subdir)
+        self._create_commit('initial commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: git+file://{}\n'.format(self.repo_dir))
+                f.write('    paths:\n')
+                f.write('      - included\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify only the configured path has been checked out
+            clone_dir = os.path.join(work_dir, 'test')
+            self.assertTrue(os.path.isfile(
+                os.path.join(clone_dir, 'included', 'file')))
+            self.assertFalse(os.path.exists(
+                os.path.join(clone_dir, 'excluded')))
+
+            # verify a partial clone was performed
+            promisor = self._git('-C', clone_dir, 'config',
+                'remote.origin.promisor')
+            self.assertEqual(promisor, 'true')
+
+    def test_git_submodules(self):
+        # allow submodules to be fetched from local repositories
+        os.environ['GIT_CONFIG_COUNT'] = '1'
+        os.environ['GIT_CONFIG_KEY_0'] = 'protocol.file.allow'
+        os.environ['GIT_CONFIG_VALUE_0'] = 'always'
+
+        with generate_temp_dir() as sub_dir:
+            # prepare a git repository to be used as a submodule
+            self._git('init', sub_dir)
+            self._git('-C', sub_dir, 'config', 'user.email', 'test@example.com')
+            self._git('-C', sub_dir, 'config', 'user.name', 'Unit Test')
+            self._git('-C', sub_dir, 'commit', '--allow-empty', '-m', 'sub')
+
+            # prepare a git repository which includes the submodule
+            self._git('init', self.repo_dir)
+            self._git('checkout', '-B', 'test')
+            self._git('config', 'user.email', 'test@example.com')
+            self._git('config', 'user.name', 'Unit Test')
+            self._git('submodule', 'add', 'file://{}'.format(sub_dir), 'sub')
+            self._create_commit('initial commit')
+
+            config = {
+                'timings': True,
+            }
+
+            for submodules in ['true', 'shallow']:
+                with prepare_testenv(config=config) as engine:
+                    work_dir = engine.opts.work_dir
+
+                    cfg = os.path.join(work_dir, 'fetchdep.yml')
+                    with open(cfg, 'w') as f:
+                        f.write('fetchdep:\n')
+                        f.write('  - name: test\n')
+                        f.write('    site: git+file://{}\n'.format(
+                            self.repo_dir))
+                        f.write('    submodules: {}\n'.format(submodules))
+
+                    rv = engine.run()
+                    self.assertTrue(rv)
+
+                    # verify the submodule has been initialized
+                    sub_git = os.path.join(work_dir, 'test', 'sub', '.git')
+                    self.assertTrue(os.path.exists(sub_git))
+
+                    # verify submodules are timed in their own phase
+                    phases = engine.timings.phases
+                    self.assertEqual(len(phases['submodules']), 1)
+                    self.assertLessEqual(phases['submodules'][0],
+                        phases['fetch'][0])
+
+    def test_git_update(self):
+        # prepare a git repository
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: git+file://{}\n'.format(self.repo_dir))
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # add a new commit to the upstream repository
+            new_rev = self._create_commit('second commit')
+
+            config = {
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            # update the existing clone (twice, to ensure an up-to-date
+            # clone is handled)
+            for _ in range(2):
+                with prepare_testenv(config=config) as update_engine:
+                    rv = update_engine.run()
+                    self.assertTrue(rv)
+
+                clone_dir = os.path.join(work_dir, 'test')
+                clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+                self.assertEqual(clone_rev, new_rev)
+
+    def test_git_update_branch(self):
+        # prepare a git repository with multiple branches
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+        self._git('checkout', '-B', 'other')
+        branch_rev = self._create_commit('branch commit')
+        self._git('checkout', 'test')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: test\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # configure a different branch
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    branch: other\n')
+
+            config = {
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            with prepare_testenv(config=config) as update_engine:
+                rv = update_engine.run()
+                self.assertTrue(rv)
+
+            # verify the clone has switched to the configured branch
+            clone_dir = os.path.join(work_dir, 'test')
+            clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+            self.assertEqual(clone_rev, branch_rev)
+
+            branch = self._git('-C', clone_dir, 'symbolic-ref', '--short',
+                'HEAD')
+            self.assertEqual(branch, 'other')
+
+            upstream = self._git('-C', clone_dir, 'rev-parse',
+                '--abbrev-ref', '@{upstream}')
+            self.assertEqual(upstream, 'origin/other')
+
+    def test_git_update_tag(self):
+        # prepare a git repository with multiple tags
+        self._git('init', self.repo_dir)
+        self._git('checkout', '-B', 'test')
+        self._git('config', 'user.email', 'test@example.com')
+        self._git('config', 'user.name', 'Unit Test')
+        self._create_commit('initial commit')
+        self._git('tag', 'v1')
+        v2_rev = self._create_commit('second commit')
+        self._git('tag', '-a', '-m', 'v2', 'v2')
+        self._create_commit('third commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+            site = 'git+file://{}'.format(self.repo_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    tag: v1\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # configure a newer tag
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: {}\n'.format(site))
+                f.write('    tag: v2\n')
+
+            config = {
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            # update the existing clone (twice, to ensure a clone already at
+            # the configured tag is handled)
+            for _ in range(2):
+                with prepare_testenv(config=config) as update_engine:
+                    rv = update_engine.run()
+                    self.assertTrue(rv)
+
+                clone_dir = os.path.join(work_dir, 'test')
+                clone_rev = self._git('-C', clone_dir, 'rev-parse', 'HEAD')
+                self.assertEqual(clone_rev, v2_rev)
+
     def _git(self, *args):
         with interim_working_dir(self.repo_dir):
             out = []
@@ -2,8 +2,10 @@
 # SPDX-License-Identifier: BSD-2-Clause
 # Copyright fetchdep
 
+from fetchdep.cache import cache_entry_path
 from fetchdep.util.io import execute
 from tests import FetchdepExtractTestCase
+from tests import generate_temp_dir
 from tests import interim_working_dir
 from tests import prepare_testenv
 import os
@@ -36,6 +38,109 @@ class TestToolMercurial(FetchdepExtractTestCase):
             entries = engine.cfgdb.entries()
             self.assertEqual(set(entries), {'test'})
 
+    def test_mercurial_cache(self):
+        # prepare a mercurial repository
+        self._hg('init', self.repo_dir)
+        self._create_commit('initial commit')
+
+        with generate_temp_dir() as cache_dir:
+            for _ in range(2):
+                config = {
+                    'cache_dir': cache_dir,
+                }
+
+                with prepare_testenv(config=config) as engine:
+                    work_dir = engine.opts.work_dir
+
+                    cfg = os.path.join(work_dir, 'fetchdep.yml')
+                    with open(cfg, 'w') as f:
+                        f.write('fetchdep:\n')
+                        f.write('  - name: test\n')
+                        f.write('    site: hg+{}\n'.format(self.repo_dir))
+
+                    rv = engine.run()
+                    self.assertTrue(rv)
+
+                    # verify the clone points back to the original site
+                    test_dir = os.path.join(work_dir, 'test')
+                    default_path = self._hg('paths', 'default', '--repository',
+                        test_dir)
+                    self.assertEqual(default_path.strip(), self.repo_dir)
+
+                # verify a pool has been populated in the cache
+                pool_dir = cache_entry_path(cache_dir, 'hg', self.repo_dir)
+                self.assertTrue(os.path.isdir(pool_dir))
+
+    def test_mercurial_update(self):
+        # prepare a mercurial repository
+        self._hg('init', self.repo_dir)
+        self._create_commit('initial commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: hg+{}\n'.format(self.repo_dir))
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # add a new commit to the upstream repository
+            with open(os.path.join(self.repo_dir, 'dummy'), 'w') as f:
+                f.write('update\n')
+            self._create_commit('second commit')
+            new_rev = self._hg('log', '--rev', 'tip', '--template', '{node}')
+
+            config = {
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            # update the existing clone (twice, to ensure an up-to-date
+            # clone is handled)
+            for _ in range(2):
+                with prepare_testenv(config=config) as update_engine:
+                    rv = update_engine.run()
+                    self.assertTrue(rv)
+
+                clone_dir = os.path.join(work_dir, 'test')
+                clone_rev = self._hg('--repository', clone_dir, 'log',
+                    '--rev', '.', '--template', '{node}')
+                self.assertEqual(clone_rev, new_rev)
+
+    def test_mercurial_revision(self):
+        # prepare a mercurial repository with multiple commits
+        self._hg('init', self.repo_dir)
+        self._create_commit('initial commit')
+        pinned_rev = self._hg('log', '--rev', 'tip', '--template', '{node}')
+
+        with open(os.path.join(self.repo_dir, 'dummy'), 'w') as f:
+            f.write('update\n')
+        self._create_commit('second commit')
+
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: hg+{}\n'.format(self.repo_dir))
+                f.write('    revision: {}\n'.format(pinned_rev))
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify only the pinned revision has been cloned
+            clone_dir = os.path.join(work_dir, 'test')
+            clone_revs = self._hg('--repository', clone_dir, 'log',
+                '--template', '{node}')
+            self.assertEqual(clone_revs, pinned_rev)
+
     def _hg(self, *args):
         with interim_working_dir(self.repo_dir):
             out = []
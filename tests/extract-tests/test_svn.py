@@ -39,6 +39,57 @@ class TestToolSvn(FetchdepExtractTestCase):
             entries = engine.cfgdb.entries()
             self.assertEqual(set(entries), {'test'})
 
+    def test_svn_batch(self):
+        # prepare a svn repository with multiple sibling paths
+        self._svnadmin('create', self.repo_dir)
+
+        # svn requires posix path
+        svn_path = '/' + self.repo_dir.replace(os.sep, posixpath.sep)
+        repo_url = 'file://{}'.format(svn_path)
+
+        modules = ['module-a', 'module-b', 'module-c']
+        self._svn('mkdir', '-m', 'test',
+            *['{}/{}'.format(repo_url, module) for module in modules])
+
+        config = {
+            'timings': True,
+        }
+
+        # prepare the engine
+        with prepare_testenv(config=config) as engine:
+            work_dir = engine.opts.work_dir
+
+            # build a configuration which uses each sibling path
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                for module in modules:
+                    f.write('  - name: test-{}\n'.format(module))
+                    f.write('    site: svn+{}/{}\n'.format(repo_url, module))
+
+            # ensure the engine runs
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # verify each dependency has its own working copy
+            for module in modules:
+                wc_dir = os.path.join(work_dir, 'test-' + module)
+                self.assertTrue(os.path.isdir(os.path.join(wc_dir, '.svn')))
+
+            # verify the batch's duration is only accounted for once
+            phases = engine.timings.phases
+            self.assertEqual(len(phases['fetch']), len(modules))
+            self.assertLessEqual(sum(phases['fetch']), phases['total'][0])
+
+    def _svn(self, *args):
+        out = []
+        if execute(['svn'] + list(args), capture=out) != 0:
+            print(['svn'] + list(args))
+            print('\n'.join(out))
+            msg = 'failed to issue svn command'
+            raise AssertionError(msg)
+        return '\n'.join(out)
+
     def _svnadmin(self, *args):
         with interim_working_dir(self.repo_dir):
             out = []
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.cache import cache_entry_lock
+from fetchdep.cache import cache_entry_path
+from fetchdep.cache import prune_cache
+from fetchdep.util.io import makedirs
+from tests import FetchdepTestCase
+from tests import prepare_workdir
+import os
+
+
+class TestCache(FetchdepTestCase):
+    def test_cache_entry_path(self):
+        with prepare_workdir() as cache_dir:
+            entry1 = cache_entry_path(cache_dir, 'git', 'https://a.git')
+            entry2 = cache_entry_path(cache_dir, 'git', 'https://b.git')
+            entry3 = cache_entry_path(cache_dir, 'hg', 'https://a.git')
+
+            self.assertNotEqual(entry1, entry2)
+            self.assertNotEqual(entry1, entry3)
+            self.assertEqual(entry1,
+                cache_entry_path(cache_dir, 'git', 'https://a.git'))
+
+    def test_cache_prune_lru(self):
+        with prepare_workdir() as cache_dir:
+            entries = []
+            for idx in range(3):
+                entry = self._build_entry(cache_dir, 'site{}'.format(idx))
+                os.utime(entry, (1000 + idx, 1000 + idx))
+                entries.append(entry)
+
+            # within limits; nothing to prune
+            self.assertEqual(prune_cache(cache_dir, 3000), 0)
+            self.assertTrue(all(os.path.exists(e) for e in entries))
+
+            # oldest entry should be removed first
+            self.assertEqual(prune_cache(cache_dir, 2500), 1)
+            self.assertFalse(os.path.exists(entries[0]))
+            self.assertTrue(os.path.exists(entries[1]))
+            self.assertTrue(os.path.exists(entries[2]))
+
+    def test_cache_prune_locked(self):
+        with prepare_workdir() as cache_dir:
+            entry1 = self._build_entry(cache_dir, 'site1')
+            entry2 = self._build_entry(cache_dir, 'site2')
+            os.utime(entry1, (1000, 1000))
+            os.utime(entry2, (2000, 2000))
+
+            # an in-use entry should be skipped
+            with cache_entry_lock(entry1) as locked:
+                self.assertTrue(locked)
+                self.assertEqual(prune_cache(cache_dir, 1500), 1)
+
+            self.assertTrue(os.path.exists(entry1))
+            self.assertFalse(os.path.exists(entry2))
+
+    def _build_entry(self, cache_dir, site):
+        entry = cache_entry_path(cache_dir, 'test', site)
+        self.assertTrue(makedirs(entry))
+
+        with open(os.path.join(entry, 'data'), 'wb') as f:
+            f.write(b'0' * 1000)
+
+        return entry
@@ -11,6 +11,12 @@ import os
 
 
 class TestConfigVcs(FetchdepTestCase):
+    def test_config_vcs_archive(self):
+        expected = (
+            SiteVcsType.ARCHIVE,
+        )
+        self._verify_type('vcs-archive', expected)
+
     def test_config_vcs_cvs(self):
         expected = (
             SiteVcsType.CVS,
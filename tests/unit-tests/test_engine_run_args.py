@@ -5,6 +5,7 @@
 from tests import FetchdepTestCase
 from tests import prepare_testenv
 from tests import prepare_workdir
+from tests import redirect_stdout
 import os
 
 
@@ -83,6 +84,32 @@ class TestEngineRunArgs(FetchdepTestCase):
         with prepare_testenv(config=config) as engine:
             self.assertTrue(engine.opts.no_color_out)
 
+    def test_engine_run_args_live_output(self):
+        config = {
+            'live_output': True,
+            'parallel': 2,
+        }
+
+        with prepare_testenv(config=config) as engine:
+            self.assertTrue(engine.opts.live_output)
+
+            cfg = os.path.join(engine.opts.work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test01\n')
+                f.write('    site: mkdir\n')
+                f.write('  - name: test02\n')
+                f.write('    site: mkdir\n')
+
+            # output of each fetch should be relayed with its name
+            with redirect_stdout() as stream:
+                rv = engine.run()
+            self.assertTrue(rv)
+
+            lines = stream.getvalue().splitlines()
+            self.assertTrue(any(line.startswith('[test01] ') for line in lines))
+            self.assertTrue(any(line.startswith('[test02] ') for line in lines))
+
     def test_engine_run_args_parallel(self):
         config = {
             'parallel': 2,
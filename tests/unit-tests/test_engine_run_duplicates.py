@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.dependency import build_dependency
+from fetchdep.dependency import dependency_site_key
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+import os
+
+
+class TestEngineRunDuplicates(FetchdepTestCase):
+    def test_engine_run_duplicates(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-a\n')
+                f.write('    site: mkdir sub\n')
+                f.write('  - name: test-b\n')
+                f.write('    site: mkdir sub\n')
+                f.write('  - name: test-c\n')
+                f.write('    site: mkdir other\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            self.assertIsNone(engine.cfgdb.primary('test-a'))
+            self.assertEqual(engine.cfgdb.primary('test-b'), 'test-a')
+            self.assertIsNone(engine.cfgdb.primary('test-c'))
+
+            # the duplicate should be populated with the same content
+            for name in ('test-a', 'test-b', 'test-c'):
+                dep_cfg = os.path.join(work_dir, name, 'fetchdep.yml')
+                self.assertTrue(os.path.isfile(dep_cfg))
+
+    def test_engine_run_duplicates_state(self):
+        with prepare_testenv(config={'state': True}) as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-a\n')
+                f.write('    site: mkdir\n')
+                f.write('  - name: test-b\n')
+                f.write('    site: mkdir\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            self.assertFalse(os.path.exists(os.path.join(work_dir, 'test-a')))
+            self.assertFalse(os.path.exists(os.path.join(work_dir, 'test-b')))
+
+    def test_dependency_site_key(self):
+        dep1 = self._build('git+HTTPS://Example.com/team/repo.git/')
+        dep2 = self._build('git+https://example.com/team/repo')
+        dep3 = self._build('git+https://example.com/team/other')
+        dep4 = self._build('hg+https://example.com/team/repo')
+
+        self.assertEqual(dependency_site_key(dep1), dependency_site_key(dep2))
+        self.assertNotEqual(dependency_site_key(dep1),
+            dependency_site_key(dep3))
+        self.assertNotEqual(dependency_site_key(dep1),
+            dependency_site_key(dep4))
+
+    def _build(self, site):
+        return build_dependency(None, 'test', site, tags=None, recursive=True)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+from tests import prepare_workdir
+import json
+import os
+
+
+class TestEngineRunEvents(FetchdepTestCase):
+    def test_engine_run_events(self):
+        with prepare_workdir() as events_dir:
+            events_file = os.path.join(events_dir, 'events.json')
+
+            config = {
+                'events_file': events_file,
+            }
+
+            with prepare_testenv(config=config) as engine:
+                cfg = os.path.join(engine.opts.work_dir, 'fetchdep.yml')
+                with open(cfg, 'w') as f:
+                    f.write('fetchdep:\n')
+                    f.write('  - name: test01\n')
+                    f.write('    site: mkdir\n')
+                    f.write('  - name: test02\n')
+                    f.write('    site: mkdir+other\n')
+
+                rv = engine.run()
+                self.assertTrue(rv)
+
+            with open(events_file) as f:
+                records = [json.loads(line) for line in f]
+
+            events = [record['event'] for record in records]
+            self.assertEqual(events[0], 'config_loaded')
+            self.assertEqual(events.count('discovered'), 2)
+            self.assertEqual(events.count('queued'), 2)
+            self.assertEqual(events.count('started'), 2)
+            self.assertEqual(events.count('finished'), 2)
+            self.assertEqual(events[-1], 'summary')
+
+            finished = [r for r in records if r['event'] == 'finished']
+            for record in finished:
+                self.assertEqual(record['exit_code'], 0)
+                self.assertIn('duration', record)
+                self.assertIn('bytes', record)
+
+            # events are recorded in order, stamped when they occurred
+            for name in ('test01', 'test02'):
+                named = [r for r in records if r.get('name') == name]
+                self.assertEqual(
+                    [r['event'] for r in named if r['event'] != 'progress'],
+                    ['discovered', 'queued', 'started', 'finished'])
+
+                times = [r['time'] for r in named]
+                self.assertEqual(times, sorted(times))
+
+            summary = records[-1]
+            self.assertTrue(summary['success'])
+            self.assertEqual(summary['dependencies'], 2)
+            self.assertEqual(summary['finished'], 2)
+            self.assertEqual(summary['failed'], 0)
@@ -55,6 +55,40 @@ class TestEngineRunRecursive(FetchdepTestCase):
             entries = engine.cfgdb.entries()
             self.assertEqual(set(entries), set(expected))
 
+    def test_engine_run_recursive_discovery(self):
+        expected = [
+            'recursive',
+            'fetchdep-a',
+            'fetchdep-b',
+            'fetchdep-c',
+            'fetchdep-d',
+            'fetchdep-e',
+            'fetchdep-f',
+            'fetchdep-g',
+        ]
+
+        cfg_path = fetch_unittest_assets_dir('recursive', 'fetchdep.yml')
+        self.assertTrue(os.path.exists(cfg_path))
+
+        # with a dry-run, no dependencies are fetched; all dependencies are
+        # expected to be registered from discovered configurations
+        config = {
+            'config': cfg_path,
+            'dry_run': True,
+            'recursive': True,
+        }
+
+        with prepare_testenv(config=config) as engine:
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            entries = engine.cfgdb.entries()
+            self.assertEqual(set(entries), set(expected))
+
+            for entry in expected:
+                target_dir = os.path.join(engine.opts.work_dir, entry)
+                self.assertFalse(os.path.exists(target_dir))
+
     def test_engine_run_recursive_restricted(self):
         expected = [
             'recursive-1',
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+import os
+
+
+class TestEngineRunUpdate(FetchdepTestCase):
+    def test_engine_run_update(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test-a\n')
+                f.write('    site: mkdir\n')
+                f.write('  - name: test-b\n')
+                f.write('    site: mkdir\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            # add a new dependency to verify missing dependencies are still
+            # fetched alongside updates
+            with open(cfg, 'a') as f:
+                f.write('  - name: test-c\n')
+                f.write('    site: mkdir\n')
+
+            config = {
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            with prepare_testenv(config=config) as update_engine:
+                rv = update_engine.run()
+                self.assertTrue(rv)
+
+                entries = update_engine.cfgdb.entries()
+                self.assertEqual(set(entries), {'test-a', 'test-b', 'test-c'})
+
+            for name in ('test-a', 'test-b', 'test-c'):
+                self.assertTrue(os.path.isdir(os.path.join(work_dir, name)))
+
+    def test_engine_run_update_dry_run(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: mkdir\n')
+
+            os.mkdir(os.path.join(work_dir, 'test'))
+
+            config = {
+                'dry_run': True,
+                'target': work_dir,
+                'update': True,
+                'work_dir': work_dir,
+            }
+
+            with prepare_testenv(config=config) as update_engine:
+                rv = update_engine.run()
+                self.assertTrue(rv)
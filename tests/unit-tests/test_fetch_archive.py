@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from contextlib import contextmanager
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+from tests import prepare_workdir
+from threading import Thread
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+try:
+    from http.server import HTTPServer
+    from http.server import SimpleHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+
+class TestFetchArchive(FetchdepTestCase):
+    def test_fetch_archive_tar(self):
+        with prepare_workdir() as archive_dir:
+            archive = os.path.join(archive_dir, 'example-1.0.tar.gz')
+            with tarfile.open(archive, 'w:gz') as tar:
+                self._add_tar_file(tar, 'example-1.0/README', b'readme\n')
+                self._add_tar_file(tar, 'example-1.0/src/main.c', b'main\n')
+
+            site = 'file:' + pathname2url(archive)
+            sha256 = self._sha256(archive)
+            with self._fetch(site, sha256=sha256) as (rv, target_dir):
+                self.assertTrue(rv)
+
+                # the single top-level directory should be stripped
+                self.assertTrue(os.path.isfile(
+                    os.path.join(target_dir, 'README')))
+                self.assertTrue(os.path.isfile(
+                    os.path.join(target_dir, 'src', 'main.c')))
+
+    def test_fetch_archive_zip(self):
+        with prepare_workdir() as archive_dir:
+            archive = os.path.join(archive_dir, 'example.zip')
+            with zipfile.ZipFile(archive, 'w') as zip_:
+                zip_.writestr('README', b'readme\n')
+                zip_.writestr('LICENSE', b'license\n')
+
+            site = 'file:' + pathname2url(archive)
+            sha256 = self._sha256(archive)
+            with self._fetch(site, sha256=sha256) as (rv, target_dir):
+                self.assertTrue(rv)
+
+                self.assertTrue(os.path.isfile(
+                    os.path.join(target_dir, 'README')))
+                self.assertTrue(os.path.isfile(
+                    os.path.join(target_dir, 'LICENSE')))
+
+    def test_fetch_archive_checksum_mismatch(self):
+        with prepare_workdir() as archive_dir:
+            archive = os.path.join(archive_dir, 'example.tar')
+            with tarfile.open(archive, 'w') as tar:
+                self._add_tar_file(tar, 'README', b'readme\n')
+
+            site = 'file:' + pathname2url(archive)
+            with self._fetch(site, sha256='f' * 64) as (rv, target_dir):
+                self.assertFalse(rv)
+                self.assertFalse(os.path.exists(target_dir))
+
+    def test_fetch_archive_http(self):
+        with prepare_workdir() as archive_dir:
+            archive = os.path.join(archive_dir, 'example.tar.gz')
+            with tarfile.open(archive, 'w:gz') as tar:
+                self._add_tar_file(tar, 'README', b'readme\n')
+                self._add_tar_file(tar, 'LICENSE', b'license\n')
+
+            sha256 = self._sha256(archive)
+            with serve_directory(archive_dir) as base_url:
+                site = base_url + '/example.tar.gz'
+                with self._fetch(site, sha256=sha256) as (rv, target_dir):
+                    self.assertTrue(rv)
+
+                    self.assertTrue(os.path.isfile(
+                        os.path.join(target_dir, 'README')))
+
+    def test_fetch_archive_unsafe_member(self):
+        with prepare_workdir() as archive_dir:
+            archive = os.path.join(archive_dir, 'example.tar')
+            with tarfile.open(archive, 'w') as tar:
+                self._add_tar_file(tar, '../escape', b'escape\n')
+
+            site = 'file:' + pathname2url(archive)
+            with self._fetch(site) as (rv, _):
+                self.assertFalse(rv)
+                self.assertFalse(os.path.exists(
+                    os.path.join(archive_dir, 'escape')))
+
+    def _add_tar_file(self, tar, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+    @contextmanager
+    def _fetch(self, site, sha256=None):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: archive+{}\n'.format(site))
+                if sha256:
+                    f.write('    sha256: {}\n'.format(sha256))
+
+            rv = engine.run()
+            yield rv, os.path.join(work_dir, 'test')
+
+    def _sha256(self, path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+
+@contextmanager
+def serve_directory(dir_):
+    """
+    serve a directory over http for the duration of a context
+
+    Args:
+        dir_: the directory to serve
+
+    Yields:
+        the base url of the server
+    """
+
+    class Handler(SimpleHTTPRequestHandler):
+        def translate_path(self, path):
+            return os.path.join(dir_, os.path.basename(path))
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.dependency import build_dependency
+from fetchdep.fetch import FetchBatchRequest
+from fetchdep.fetch import FetchRequest
+from fetchdep.fetch import batch_fetch_requests
+from fetchdep.fetch import prepare_fetch_request
+from fetchdep.opts import FetchdepEngineOptions
+from tests import FetchdepTestCase
+
+
+class TestFetchBatch(FetchdepTestCase):
+    def test_fetch_batch_cvs_grouping(self):
+        root1 = ':pserver:anonymous@cvs.example.org:/cvsroot'
+        root2 = ':pserver:anonymous@cvs.example.com:/cvsroot'
+        sites = [
+            'cvs+{} module-a'.format(root1),
+            'cvs+{} module-b'.format(root1),
+            'cvs+{} module-c'.format(root2),
+            'cvs+{} module-d'.format(root1),
+            'cvs+{} module-e'.format(root1),
+        ]
+
+        reqs = self._build_requests(sites)
+
+        # an exported module cannot share a checkout session
+        reqs[4].dep.ext['export'] = True
+
+        final_reqs = batch_fetch_requests(reqs, 1)
+        self.assertEqual(len(final_reqs), 3)
+
+        batches = [r for r in final_reqs if isinstance(r, FetchBatchRequest)]
+        self.assertEqual(len(batches), 1)
+        names = [r.dep.name for r in batches[0].requests]
+        self.assertEqual(names, ['dep0', 'dep1', 'dep3'])
+
+    def test_fetch_batch_svn_grouping(self):
+        sites = [
+            'svn+https://svn.example.com/repo/trunk/a',
+            'svn+https://svn.example.com/repo/trunk/b',
+            'svn+https://svn.example.org/repo/trunk/c',
+            'svn+https://svn.example.com/repo/trunk/d',
+            'https://example.com/e.git',
+        ]
+
+        reqs = self._build_requests(sites)
+        final_reqs = batch_fetch_requests(reqs, 1)
+
+        # expecting: the git request, a batch of a/b/d and a single c request
+        self.assertEqual(len(final_reqs), 3)
+
+        batches = [r for r in final_reqs if isinstance(r, FetchBatchRequest)]
+        self.assertEqual(len(batches), 1)
+        names = [r.dep.name for r in batches[0].requests]
+        self.assertEqual(names, ['dep0', 'dep1', 'dep3'])
+
+        singles = [r.dep.name for r in final_reqs
+            if isinstance(r, FetchRequest)]
+        self.assertEqual(sorted(singles), ['dep2', 'dep4'])
+
+    def test_fetch_batch_svn_parallel(self):
+        sites = ['svn+https://svn.example.com/repo/{}'.format(idx)
+            for idx in range(8)]
+
+        reqs = self._build_requests(sites)
+
+        # batches should be split to allow each job to be used
+        final_reqs = batch_fetch_requests(reqs, 4)
+        self.assertEqual(len(final_reqs), 4)
+        for req in final_reqs:
+            self.assertTrue(isinstance(req, FetchBatchRequest))
+            self.assertEqual(len(req.requests), 2)
+
+        # no batching if there is a job for each request
+        final_reqs = batch_fetch_requests(reqs, 8)
+        self.assertEqual(len(final_reqs), 8)
+        for req in final_reqs:
+            self.assertTrue(isinstance(req, FetchRequest))
+
+    def _build_requests(self, sites):
+        opts = FetchdepEngineOptions()
+
+        reqs = []
+        for idx, site in enumerate(sites):
+            name = 'dep{}'.format(idx)
+            dep = build_dependency('test', name, site, tags=None,
+                recursive=True)
+            reqs.append(prepare_fetch_request(dep, opts))
+
+        return reqs
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.util.tree import copy_tree
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+from tests import prepare_workdir
+import os
+import sys
+import unittest
+
+
+class TestFetchPath(FetchdepTestCase):
+    def test_fetch_path(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            # prepare a local tree alongside the configuration
+            src_dir = os.path.join(work_dir, 'vendor', 'sdk')
+            self._build_tree(src_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: path+vendor/sdk\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            target_dir = os.path.join(work_dir, 'test')
+            self._verify_tree(target_dir)
+
+            # a copy should not share files with its source
+            self.assertFalse(os.path.samefile(
+                os.path.join(src_dir, 'README'),
+                os.path.join(target_dir, 'README')))
+
+    def test_fetch_path_hardlink(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            src_dir = os.path.join(work_dir, 'vendor')
+            self._build_tree(src_dir)
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: path+{}\n'.format(src_dir))
+                f.write('    hardlink: true\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            target_dir = os.path.join(work_dir, 'test')
+            self._verify_tree(target_dir)
+
+            self.assertTrue(os.path.samefile(
+                os.path.join(src_dir, 'README'),
+                os.path.join(target_dir, 'README')))
+
+    def test_fetch_path_missing(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: path+missing\n')
+
+            rv = engine.run()
+            self.assertFalse(rv)
+
+    def test_copy_tree_parallel(self):
+        with prepare_workdir() as work_dir:
+            src_dir = os.path.join(work_dir, 'src')
+            dst_dir = os.path.join(work_dir, 'dst')
+            self._build_tree(src_dir)
+
+            copy_tree(src_dir, dst_dir, reflink=False, jobs=4)
+            self._verify_tree(dst_dir)
+
+    @unittest.skipIf(sys.platform == 'win32', 'symlinks not supported')
+    def test_copy_tree_symlink(self):
+        with prepare_workdir() as work_dir:
+            src_dir = os.path.join(work_dir, 'src')
+            dst_dir = os.path.join(work_dir, 'dst')
+            self._build_tree(src_dir)
+            os.symlink('README', os.path.join(src_dir, 'link'))
+
+            copy_tree(src_dir, dst_dir)
+            self._verify_tree(dst_dir)
+
+            link = os.path.join(dst_dir, 'link')
+            self.assertTrue(os.path.islink(link))
+            self.assertEqual(os.readlink(link), 'README')
+
+    def _build_tree(self, dir_):
+        os.makedirs(os.path.join(dir_, 'include', 'sdk'))
+        with open(os.path.join(dir_, 'README'), 'w') as f:
+            f.write('readme\n')
+        for idx in range(8):
+            header = os.path.join(dir_, 'include', 'sdk', 'h{}.h'.format(idx))
+            with open(header, 'w') as f:
+                f.write('#define H{} {}\n'.format(idx, idx))
+
+    def _verify_tree(self, dir_):
+        with open(os.path.join(dir_, 'README')) as f:
+            self.assertEqual(f.read(), 'readme\n')
+        for idx in range(8):
+            header = os.path.join(dir_, 'include', 'sdk', 'h{}.h'.format(idx))
+            with open(header) as f:
+                self.assertEqual(f.read(), '#define H{} {}\n'.format(idx, idx))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.processor import _LiveOutput
+from tests import FetchdepTestCase
+
+
+class TestProcessorLiveOutput(FetchdepTestCase):
+    def test_processor_live_output_lines(self):
+        relayed = []
+        with _LiveOutput('test', relayed.append, interval=60) as output:
+            output.write('first\nsec')
+            output.write('ond  \r\nthird')
+
+        self.assertEqual(''.join(relayed),
+            '[test] first\n[test] second\n[test] third\n')
+
+    def test_processor_live_output_progress(self):
+        relayed = []
+        with _LiveOutput('test', relayed.append, interval=60) as output:
+            # only the first progress update is relayed within an interval
+            output.write('progress 0%\rprogress 50%\r')
+            output.write('progress 100%\r')
+            output.write('done\n')
+
+        self.assertEqual(''.join(relayed),
+            '[test] progress 0%\n[test] done\n')
+
+    def test_processor_live_output_split_crlf(self):
+        relayed = []
+        with _LiveOutput('test', relayed.append, interval=60) as output:
+            # a carriage return-new line pair split across writes should be
+            # relayed as a line (not a rate-limited progress update)
+            output.write('progress 50%\r')
+            output.write('second\r')
+            output.write('\nthird\n')
+
+        self.assertEqual(''.join(relayed),
+            '[test] progress 50%\n[test] second\n[test] third\n')
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.defs import SiteVcsType
+from fetchdep.progress import ProgressOutput
+from fetchdep.progress import ProgressParser
+from fetchdep.progress import ProgressRenderer
+from tests import FetchdepTestCase
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TerminalStream(StringIO):
+    def isatty(self):
+        return True
+
+
+class TestProgress(FetchdepTestCase):
+    def test_progress_parse_git(self):
+        parser = ProgressParser(SiteVcsType.GIT)
+        self.assertFalse(parser.feed("Cloning into 'example'..."))
+
+        self.assertTrue(parser.feed(
+            'Receiving objects:  45% (450/1000), 1.50 MiB | 2.00 MiB/s'))
+        self.assertEqual(parser.state, {
+            'bytes': 1572864,
+            'current': 450,
+            'percent': 45,
+            'phase': 'receiving objects',
+            'total': 1000,
+        })
+
+        self.assertTrue(parser.feed('Updating files: 100% (20/20), done.'))
+        self.assertEqual(parser.state['phase'], 'updating files')
+        self.assertEqual(parser.state['files'], 20)
+
+    def test_progress_parse_hg(self):
+        parser = ProgressParser(SiteVcsType.HG)
+        self.assertTrue(parser.feed('adding manifests'))
+        self.assertEqual(parser.state['phase'], 'adding manifests')
+
+        self.assertTrue(parser.feed(
+            'added 3 changesets with 5 changes to 4 files'))
+        self.assertEqual(parser.state['current'], 3)
+
+        self.assertTrue(parser.feed('4 files updated, 0 files merged, '
+            '0 files removed, 0 files unresolved'))
+        self.assertEqual(parser.state['files'], 4)
+        self.assertEqual(parser.state['percent'], 100)
+
+    def test_progress_parse_svn(self):
+        parser = ProgressParser(SiteVcsType.SVN)
+        self.assertTrue(parser.feed('A    example/file1'))
+        self.assertTrue(parser.feed('A    example/file2'))
+        self.assertEqual(parser.state['files'], 2)
+
+        self.assertTrue(parser.feed('Checked out revision 5.'))
+        self.assertEqual(parser.state['phase'], 'revision 5')
+
+    def test_progress_output(self):
+        events = []
+
+        def send(name, state):
+            events.append((name, state))
+
+        target = StringIO()
+        with ProgressOutput('test', SiteVcsType.GIT, target, send) as out:
+            out.write('Receiving objects:  50% (1/2)\rReceiving ')
+            out.write('objects: 100% (2/2), 10 bytes | 1 KiB/s, done.\n')
+
+        # all output should be forwarded
+        self.assertTrue(target.getvalue().endswith('done.\n'))
+
+        # the phase change is reported, followed by a final state
+        self.assertEqual(events[0][0], 'test')
+        self.assertEqual(events[0][1]['percent'], 50)
+        self.assertTrue(events[-1][1]['finished'])
+        self.assertEqual(events[-1][1]['bytes'], 10)
+
+    def test_progress_render(self):
+        stream = TerminalStream()
+        renderer = ProgressRenderer(stream=stream)
+        renderer.update('test01', {'phase': 'receiving objects', 'percent': 5})
+        renderer.update('test02', {'phase': 'checking out files', 'files': 9})
+        renderer.render(force=True)
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'test01: receiving objects 5%')
+        self.assertEqual(lines[1], 'test02: checking out files 9 files')
+        self.assertIn('active: 2, finished: 0', lines[2])
+
+        # a finished fetch is removed from the display
+        renderer.update('test01', {'finished': True, 'bytes': 2048})
+        self.assertTrue(renderer.pending())
+        renderer.render(force=True)
+        self.assertIn('active: 1, finished: 1, received: 2.0 KiB',
+            stream.getvalue().splitlines()[-1])
+
+    def test_progress_render_disabled(self):
+        stream = StringIO()
+        renderer = ProgressRenderer(stream=stream)
+        renderer.update('test', {'phase': 'receiving objects'})
+        renderer.render(force=True)
+        self.assertEqual(stream.getvalue(), '')
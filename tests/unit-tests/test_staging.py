@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.staging import STAGING_PREFIX
+from fetchdep.staging import commit_staging
+from fetchdep.staging import prune_staging
+from fetchdep.staging import staging_dir
+from fetchdep.util.io import makedirs
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+from tests import prepare_workdir
+import os
+
+
+class TestStaging(FetchdepTestCase):
+    def test_staging_commit(self):
+        with prepare_workdir() as work_dir:
+            target_dir = os.path.join(work_dir, 'test')
+
+            with staging_dir(target_dir) as staged_dir:
+                self.assertIsNotNone(staged_dir)
+                self.assertTrue(makedirs(staged_dir))
+                self.assertFalse(os.path.exists(target_dir))
+
+                self.assertTrue(commit_staging(staged_dir, target_dir))
+                self.assertTrue(os.path.isdir(target_dir))
+
+            # only the target directory should remain
+            self.assertEqual(os.listdir(work_dir), ['test'])
+
+    def test_staging_prune(self):
+        with prepare_workdir() as work_dir:
+            # a staging directory left behind from an interrupted run
+            stale_dir = os.path.join(work_dir, STAGING_PREFIX + 'stale')
+            self.assertTrue(makedirs(stale_dir))
+            with open(os.path.join(stale_dir, '.fetchdep-lock'), 'w'):
+                pass
+
+            # a staging directory which is in use
+            target_dir = os.path.join(work_dir, 'test')
+            with staging_dir(target_dir) as staged_dir:
+                self.assertIsNotNone(staged_dir)
+                active_dir = os.path.dirname(staged_dir)
+
+                self.assertEqual(prune_staging(work_dir), 1)
+                self.assertFalse(os.path.exists(stale_dir))
+                self.assertTrue(os.path.exists(active_dir))
+
+    def test_staging_engine_cleanup(self):
+        with prepare_testenv() as engine:
+            work_dir = engine.opts.work_dir
+
+            cfg = os.path.join(work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test\n')
+                f.write('    site: mkdir\n')
+
+            rv = engine.run()
+            self.assertTrue(rv)
+
+            self.assertTrue(os.path.isdir(os.path.join(work_dir, 'test')))
+            for name in os.listdir(work_dir):
+                self.assertFalse(name.startswith(STAGING_PREFIX))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.timings import Timings
+from tests import FetchdepTestCase
+from tests import prepare_testenv
+from tests import redirect_stdout
+import os
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestTimings(FetchdepTestCase):
+    def test_timings_measure(self):
+        timings = Timings()
+
+        with timings.measure('phase'):
+            pass
+
+        self.assertEqual(list(timings.phases.keys()), ['phase'])
+        self.assertEqual(len(timings.phases['phase']), 1)
+        self.assertGreaterEqual(timings.phases['phase'][0], 0)
+
+    def test_timings_report(self):
+        timings = Timings()
+        for idx in range(1, 21):
+            timings.record('fetch', idx / 10.0)
+        timings.record('total', 0.05)
+
+        lines = timings.report()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0].split(), [
+            'phase', 'count', 'total', 'min', 'median', 'p95', 'max'])
+        self.assertEqual(lines[1].split(), [
+            'fetch', '20', '21.00s', '100.0ms', '1.00s', '1.90s', '2.00s'])
+        self.assertEqual(lines[2].split(), [
+            'total', '1', '50.0ms', '50.0ms', '50.0ms', '50.0ms', '50.0ms'])
+
+    def test_timings_run(self):
+        config = {
+            'timings': True,
+        }
+
+        with prepare_testenv(config=config) as engine:
+            cfg = os.path.join(engine.opts.work_dir, 'fetchdep.yml')
+            with open(cfg, 'w') as f:
+                f.write('fetchdep:\n')
+                f.write('  - name: test01\n')
+                f.write('    site: mkdir\n')
+                f.write('  - name: test02\n')
+                f.write('    site: mkdir+other\n')
+
+            stream = StringIO()
+            with redirect_stdout(stream):
+                rv = engine.run()
+            self.assertTrue(rv)
+
+            phases = engine.timings.phases
+            self.assertEqual(len(phases['fetch']), 2)
+            self.assertEqual(len(phases['total']), 1)
+            for phase in ('config-parse', 'configuration', 'pool-start',
+                    'queue-submit', 'tool-probe', 'wait'):
+                self.assertIn(phase, phases)
+
+            output = stream.getvalue()
+            self.assertIn('timings:', output)
+            self.assertIn('fetch', output)
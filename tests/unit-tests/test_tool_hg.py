@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.tool.hg import HgTool
+from tests import FetchdepTestCase
+from tests import prepare_workdir
+import os
+import stat
+import sys
+import unittest
+
+
+@unittest.skipIf(sys.platform == 'win32', 'requires posix scripts')
+class TestToolHg(FetchdepTestCase):
+    def test_tool_hg_chg_default(self):
+        # chg should not be used unless explicitly requested
+        tool = HgTool()
+        self.assertIsNone(tool.chg)
+
+    def test_tool_hg_chg_enabled(self):
+        with prepare_workdir() as work_dir:
+            chg = os.path.join(work_dir, 'chg')
+            with open(chg, 'w') as f:
+                f.write('#!/bin/sh\necho fake-chg "$@"\n')
+            os.chmod(chg, os.stat(chg).st_mode | stat.S_IXUSR)
+
+            os.environ['FETCHDEP_CHG'] = chg
+            os.environ['FETCHDEP_HG_BACKEND'] = 'chg'
+
+            # commands should be routed through chg
+            tool = HgTool()
+            self.assertTrue(tool.exists())
+
+            rv, out = tool.execute_rv('status')
+            self.assertEqual(rv, 0)
+            self.assertEqual(out, 'fake-chg status')
+
+    def test_tool_hg_chg_missing(self):
+        with prepare_workdir() as work_dir:
+            chg = os.path.join(work_dir, 'missing-chg')
+
+            os.environ['FETCHDEP_CHG'] = chg
+            os.environ['FETCHDEP_HG_BACKEND'] = 'chg'
+
+            # a missing chg should fallback to hg
+            tool = HgTool()
+            tool.exists()
+            self.assertIsNone(tool.chg)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.tool import FetchdepTool
+from fetchdep.tool import probe_tools
+from fetchdep.tool import seed_tools
+from fetchdep.tool.git import GIT_CAPABILITIES
+from tests import FetchdepTestCase
+from tests import prepare_workdir
+import os
+import stat
+import sys
+import unittest
+
+
+@unittest.skipIf(sys.platform == 'win32', 'requires posix scripts')
+class TestToolProbe(FetchdepTestCase):
+    def test_tool_probe_capabilities(self):
+        with prepare_workdir() as work_dir:
+            script = self._create_tool(work_dir, 'git version 2.20.1')
+
+            tool = FetchdepTool(script, capabilities=GIT_CAPABILITIES)
+            self.assertEqual(tool.version(), (2, 20, 1))
+            self.assertTrue(tool.supports('partial-clone'))
+            self.assertTrue(tool.supports('worktree'))
+            self.assertFalse(tool.supports('checkout-workers'))
+            self.assertFalse(tool.supports('sparse-checkout'))
+            self.assertFalse(tool.supports('unknown-capability'))
+
+    def test_tool_probe_capabilities_unknown_version(self):
+        with prepare_workdir() as work_dir:
+            script = self._create_tool(work_dir, 'fake-tool (development)')
+
+            tool = FetchdepTool(script, capabilities=GIT_CAPABILITIES)
+            self.assertTrue(tool.exists())
+            self.assertIsNone(tool.version())
+            self.assertFalse(tool.supports('partial-clone'))
+
+    def test_tool_probe_detected(self):
+        with prepare_workdir() as work_dir:
+            script = self._create_tool(work_dir, 'fake-tool 1.2.3')
+
+            tool = FetchdepTool(script)
+            info = tool.probe()
+            self.assertTrue(info['exists'])
+            self.assertEqual(info['path'], script)
+            self.assertEqual(info['version'], 'fake-tool 1.2.3')
+            self.assertTrue(tool.exists())
+
+    def test_tool_probe_missing(self):
+        with prepare_workdir() as work_dir:
+            script = os.path.join(work_dir, 'missing-tool')
+
+            tool = FetchdepTool(script)
+            info = tool.probe()
+            self.assertFalse(info['exists'])
+            self.assertIsNone(info['path'])
+            self.assertFalse(tool.exists())
+
+    def test_tool_probe_cache(self):
+        with prepare_workdir() as work_dir:
+            cache_dir = os.path.join(work_dir, 'cache')
+            os.mkdir(cache_dir)
+
+            script = self._create_tool(work_dir, 'fake-tool 1.0')
+            tool = FetchdepTool(script)
+
+            detected = probe_tools([tool], cache_dir=cache_dir)
+            self.assertEqual(detected[script]['version'], 'fake-tool 1.0')
+
+            # an unmodified tool should be loaded from the cache
+            FetchdepTool.detected.pop(script)
+            mtime = os.path.getmtime(script)
+            self._create_tool(work_dir, 'fake-tool 2.0')
+            os.utime(script, (mtime, mtime))
+
+            detected = probe_tools([tool], cache_dir=cache_dir)
+            self.assertEqual(detected[script]['version'], 'fake-tool 1.0')
+
+            # a modified tool should be probed again
+            FetchdepTool.detected.pop(script)
+            os.utime(script, (mtime + 10, mtime + 10))
+
+            detected = probe_tools([tool], cache_dir=cache_dir)
+            self.assertEqual(detected[script]['version'], 'fake-tool 2.0')
+
+            # the refreshed probe should replace the existing cache
+            FetchdepTool.detected.pop(script)
+            self._create_tool(work_dir, 'fake-tool 3.0')
+            os.utime(script, (mtime + 10, mtime + 10))
+
+            detected = probe_tools([tool], cache_dir=cache_dir)
+            self.assertEqual(detected[script]['version'], 'fake-tool 2.0')
+
+    def test_tool_probe_seeded(self):
+        with prepare_workdir() as work_dir:
+            script = os.path.join(work_dir, 'seeded-tool')
+
+            # a worker should use the detection results of its parent
+            seed_tools({
+                script: {
+                    'exists': True,
+                    'mtime': None,
+                    'path': script,
+                    'version': 'seeded-tool 1.0',
+                },
+            })
+
+            tool = FetchdepTool(script)
+            self.assertTrue(tool.exists())
+            self.assertEqual(tool.probe()['version'], 'seeded-tool 1.0')
+
+    def _create_tool(self, work_dir, version):
+        script = os.path.join(work_dir, 'fake-tool')
+        with open(script, 'w') as f:
+            f.write('#!/bin/sh\necho "{}"\n'.format(version))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR)
+        return script
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.util.io import execute
+from fetchdep.util.io import execute_output
+from fetchdep.util.io import redirect_output
+from tests import FetchdepTestCase
+from tests import redirect_stdout
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# script which emits lines, carriage-return progress and an unterminated line
+OUTPUT_SCRIPT = '''
+import sys
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+out.write(b'first\\n')
+for i in range(3):
+    out.write('progress {}%\\r'.format(i * 50).encode())
+    out.flush()
+out.write(b'\\nsecond  \\r\\nthird\\n' + b'x' * 100000 + b'\\nlast')
+'''
+
+# script which emits crlf line endings
+CRLF_SCRIPT = '''
+import sys
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+out.write(b'first\\r\\nsecond\\r\\n')
+'''
+
+# script which emits content on stdout along with a warning on stderr
+STDERR_SCRIPT = '''
+import sys
+sys.stderr.write('warning: fetching missing objects\\n')
+sys.stderr.flush()
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+out.write(b'key: value  \\n\\n  nested: 1\\n')
+'''
+
+# script which runs a process reporting whether its output is a pipe
+PASSTHROUGH_SCRIPT = '''
+import sys
+from fetchdep.util.io import execute
+execute([sys.executable, '-c', \'\'\'
+import os
+import stat
+print(stat.S_ISFIFO(os.fstat(1).st_mode))
+\'\'\'])
+'''
+
+
+class TestUtilIoExecute(FetchdepTestCase):
+    def test_util_io_execute_capture(self):
+        out = []
+        rv = execute([sys.executable, '-c', OUTPUT_SCRIPT], capture=out)
+        self.assertEqual(rv, 0)
+        self.assertEqual(out, [
+            'first',
+            'progress 0%',
+            'progress 50%',
+            'progress 100%',
+            'second',
+            'third',
+            'x' * 100000,
+            'last',
+        ])
+
+    def test_util_io_execute_output(self):
+        with redirect_output() as stream:
+            rv = execute([sys.executable, '-c', OUTPUT_SCRIPT])
+        self.assertEqual(rv, 0)
+
+        # carriage returns should be relayed as-is
+        output = stream.getvalue()
+        self.assertIn('progress 0%\rprogress 50%\rprogress 100%\r\n', output)
+        self.assertTrue(output.endswith('\nlast\n'))
+
+    def test_util_io_execute_output_buffer(self):
+        # emulate a text stream which translates new lines (e.g. windows)
+        buf = io.BytesIO()
+        stream = io.TextIOWrapper(buf, encoding='utf_8', newline='\r\n')
+
+        with redirect_stdout(stream):
+            rv = execute([sys.executable, '-c', CRLF_SCRIPT])
+        self.assertEqual(rv, 0)
+
+        # output should be written as-is into the stream's buffer
+        stream.flush()
+        self.assertEqual(buf.getvalue(), b'first\r\nsecond\r\n')
+
+    def test_util_io_execute_output_only(self):
+        rv, out = execute_output([sys.executable, '-c', STDERR_SCRIPT])
+        self.assertEqual(rv, 0)
+
+        # only standard output should be returned, as-is
+        self.assertEqual(out, 'key: value  \n\n  nested: 1\n')
+
+    def test_util_io_execute_quiet(self):
+        with redirect_output() as stream:
+            rv = execute([sys.executable, '-c', 'raise SystemExit(3)'],
+                quiet=True)
+        self.assertEqual(rv, 3)
+        self.assertEqual(stream.getvalue(), '')
+
+    @unittest.skipIf(sys.platform == 'win32', 'requires posix descriptors')
+    def test_util_io_execute_passthrough(self):
+        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = root_dir
+
+        # a process should write directly into a non-redirected output
+        with tempfile.TemporaryFile() as out:
+            subprocess.check_call([sys.executable, '-c', PASSTHROUGH_SCRIPT],
+                env=env, stdout=out)
+            out.seek(0)
+            self.assertEqual(out.read().strip(), b'False')
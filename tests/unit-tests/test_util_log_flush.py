@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from fetchdep.util.log import LOG_FLUSH_EXIT
+from fetchdep.util.log import LOG_FLUSH_INTERVAL
+from fetchdep.util.log import LOG_FLUSH_LINE
+from fetchdep.util.log import fetchdep_log_flush_configuration
+from fetchdep.util.log import flush_pending
+from fetchdep.util.log import flush_policy
+from fetchdep.util.log import is_fsync
+from fetchdep.util.log import log
+from tests import FetchdepTestCase
+from tests import redirect_stdout
+
+
+class CountingStream(object):
+    def __init__(self):
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+    def write(self, data):
+        pass
+
+
+class TestUtilLogFlush(FetchdepTestCase):
+    def setUp(self):
+        self.policy = flush_policy()
+        self.fsync = is_fsync()
+
+    def tearDown(self):
+        fetchdep_log_flush_configuration(self.policy, self.fsync)
+
+    def test_util_log_flush_exit(self):
+        self.assertTrue(fetchdep_log_flush_configuration(
+            LOG_FLUSH_EXIT, fsync=False))
+        self.assertEqual(self._flushes(), 0)
+
+    def test_util_log_flush_interval(self):
+        self.assertTrue(fetchdep_log_flush_configuration(
+            LOG_FLUSH_INTERVAL, fsync=False))
+        self.assertLess(self._flushes(), 10)
+
+    def test_util_log_flush_interval_pending(self):
+        self.assertTrue(fetchdep_log_flush_configuration(
+            LOG_FLUSH_INTERVAL, fsync=False))
+
+        stream = CountingStream()
+        with redirect_stdout(stream):
+            # messages within an interval are held back
+            log('first message')
+            log('second message')
+            flushes = stream.flushes
+
+            # held messages are flushed on request (only once)
+            flush_pending()
+            self.assertEqual(stream.flushes, flushes + 1)
+
+            flush_pending()
+            self.assertEqual(stream.flushes, flushes + 1)
+
+    def test_util_log_flush_invalid(self):
+        self.assertFalse(fetchdep_log_flush_configuration(
+            'unknown', fsync=False))
+        self.assertEqual(flush_policy(), self.policy)
+
+    def test_util_log_flush_line(self):
+        self.assertTrue(fetchdep_log_flush_configuration(
+            LOG_FLUSH_LINE, fsync=False))
+        self.assertEqual(self._flushes(), 10)
+
+    def _flushes(self):
+        stream = CountingStream()
+        with redirect_stdout(stream):
+            for idx in range(10):
+                log('message {}', idx)
+        return stream.flushes
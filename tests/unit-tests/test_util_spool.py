@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: BSD-2-Clause
+# Copyright fetchdep
+
+from __future__ import unicode_literals
+from fetchdep.util.spool import SpooledOutput
+from tests import FetchdepTestCase
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestUtilSpool(FetchdepTestCase):
+    def test_util_spool_relay(self):
+        with SpooledOutput(max_memory=16) as spool:
+            for idx in range(100):
+                spool.write('line {} ✓\n'.format(idx))
+            spool.write('progress\r')
+
+            target = StringIO()
+            spool.relay(target)
+
+            output = target.getvalue()
+            self.assertTrue(output.startswith('line 0 ✓\nline 1 ✓\n'))
+            self.assertTrue(output.endswith('line 99 ✓\nprogress\r\n'))
+
+    def test_util_spool_relay_limit(self):
+        with SpooledOutput(max_memory=16) as spool:
+            for idx in range(100):
+                spool.write('line {}\n'.format(idx))
+
+            target = StringIO()
+            spool.relay(target, limit=20)
+
+            # only complete trailing lines should be relayed
+            lines = target.getvalue().splitlines()
+            self.assertTrue(lines[0].endswith('bytes of output omitted)'))
+            self.assertEqual(lines[1:], ['line 98', 'line 99'])
+
+    def test_util_spool_relay_within_limit(self):
+        with SpooledOutput() as spool:
+            spool.write('line\n')
+
+            target = StringIO()
+            spool.relay(target, limit=20)
+            self.assertEqual(target.getvalue(), 'line\n')